@@ -0,0 +1,115 @@
+"""
+Coordinate parsing benchmark.
+
+Parses a set of randomly generated coordinate strings in mixed formats
+(decimal, "13h57m12s +14d28m39s", "13:57:12 +14:28:39", "13 57 12 +14 28 39")
+with the original SkyCoord-based parser, with parse_coordinate() one string
+at a time, and with the batch parse_coordinates(), and checks that all three
+agree.
+
+Usage:
+
+    python -m benchmarks.coordinates
+    python -m benchmarks.coordinates --count 50000
+"""
+
+import argparse
+import time
+
+import astropy.units as u
+import numpy as np
+from astropy.coordinates import SkyCoord
+
+from src.database.coordinates import parse_coordinate, parse_coordinates
+
+# Largest allowed difference between parsers, in degrees
+TOLERANCE = 1e-9
+
+
+def legacy_parse(coords_str):
+    """
+    Parse a string with SkyCoord, as the parser used before src.database.coordinates did.
+
+    That parser rejected sexagesimal strings without unit letters ("13:57:12 +14:28:39"),
+    so these are given to SkyCoord with explicit hour/degree units.
+    """
+    coords_str = coords_str.strip()
+    if any(char in coords_str.lower() for char in ["h", "m", "s", "d", "°", "'", '"']):
+        skycoord = SkyCoord(coords_str, frame="icrs")
+        return skycoord.ra.deg, skycoord.dec.deg
+    parts = coords_str.split()
+    if len(parts) == 2 and ":" not in coords_str:
+        return float(parts[0]), float(parts[1])
+    skycoord = SkyCoord(coords_str, unit=(u.hourangle, u.deg), frame="icrs")
+    return skycoord.ra.deg, skycoord.dec.deg
+
+
+def _sexagesimal(value, decimals):
+    """Split a positive value into whole units, minutes and seconds rounded to some decimals."""
+    scale = 10**decimals
+    minutes, seconds = divmod(round(value * 3600 * scale), 60 * scale)
+    whole, minutes = divmod(minutes, 60)
+    return whole, minutes, seconds / scale
+
+
+def make_strings(count, seed=0):
+    """Generate coordinate strings in a mix of the supported formats."""
+    rng = np.random.default_rng(seed)
+    strings = []
+    for index, (ra, dec) in enumerate(zip(rng.uniform(0, 360, count), rng.uniform(-89.9, 89.9, count), strict=True)):
+        sign = "-" if dec < 0 else "+"
+        h, m, s = _sexagesimal(ra / 15, 3)
+        d, dm, ds = _sexagesimal(abs(dec), 2)
+        style = index % 4
+        if style == 0:
+            strings.append(f"{ra:.6f} {dec:.6f}")
+        elif style == 1:
+            strings.append(f"{h}h{m}m{s:.3f}s {sign}{d}d{dm}m{ds:.2f}s")
+        elif style == 2:
+            strings.append(f"{h:02d}:{m:02d}:{s:06.3f} {sign}{d:02d}:{dm:02d}:{ds:05.2f}")
+        else:
+            strings.append(f"{h:02d} {m:02d} {s:06.3f} {sign}{d:02d} {dm:02d} {ds:05.2f}")
+    return strings
+
+
+def _time(function):
+    """Run a function once and return (seconds, result)."""
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare coordinate string parsers.")
+    parser.add_argument("--count", type=int, default=10000, help="Number of coordinate strings")
+    parser.add_argument("--legacy-count", type=int, default=1000, help="Strings parsed with the SkyCoord parser")
+    args = parser.parse_args()
+
+    strings = make_strings(args.count)
+    legacy_strings = strings[: args.legacy_count]
+
+    legacy_seconds, legacy = _time(lambda: np.array([legacy_parse(value) for value in legacy_strings]))
+    single_seconds, single = _time(lambda: np.array([parse_coordinate(value) for value in strings]))
+    batch_seconds, (ra, dec, errors) = _time(lambda: parse_coordinates(strings))
+
+    failures = sum(error is not None for error in errors)
+    # RA differences near 0/360 wrap around
+    ra_difference = np.abs((single[: len(legacy), 0] - legacy[:, 0] + 180) % 360 - 180)
+    agreement = max(ra_difference.max(), np.abs(single[: len(legacy), 1] - legacy[:, 1]).max())
+    batch_agreement = np.nanmax(np.abs(np.column_stack([ra, dec]) - single))
+
+    print(f"{'parser':<22}{'strings':>10}{'seconds':>10}{'per string (µs)':>18}")
+    for name, count, seconds in (
+        ("SkyCoord (legacy)", len(legacy_strings), legacy_seconds),
+        ("parse_coordinate", len(strings), single_seconds),
+        ("parse_coordinates", len(strings), batch_seconds),
+    ):
+        print(f"{name:<22}{count:>10}{seconds:>10.3f}{seconds / max(count, 1) * 1e6:>18.1f}")
+    print(f"max difference from SkyCoord: {agreement:.2e} deg, batch vs single: {batch_agreement:.2e} deg")
+    print(f"batch parse errors: {failures}")
+    if agreement > TOLERANCE or batch_agreement > TOLERANCE or failures:
+        raise SystemExit("Parsers disagree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""
+Load test for the web application.
+
+Drives the real ASGI application with concurrent users sending a weighted
+mix of page and API requests (or replaying a recorded access log), and
+reports throughput, latency percentiles, error rate and the resident memory
+of every worker process.
+
+The application is either run in-process (httpx's ASGI transport, one
+process) or started as a local uvicorn server with N worker processes. It
+uses the database configured by the usual ASTRO_WEB_* environment variables,
+which is also sampled for source names and coordinates to request.
+
+Usage:
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --workers 4 --concurrency 32 --duration 60
+    python -m benchmarks.loadtest --mix "inventory:5,spectra:2,cone:1" --no-page-cache
+    python -m benchmarks.loadtest --replay access.log --json results.json
+    python -m benchmarks.loadtest --url http://localhost:8000
+
+Replay files are either access logs (uvicorn or combined log format; only
+the request line is used) or JSON lines like
+{"method": "POST", "path": "/api/search/cone", "data": {"coordinates": "209.3 14.5", ...}}.
+Logged POST requests have no form data, so data is generated for the known
+search endpoints and other POST requests are skipped.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import sys
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+ENDPOINTS = ("home", "browse", "plots", "search", "cone", "inventory", "spectra")
+DEFAULT_MIX = "home:1,browse:1,plots:1,search:1,cone:2,inventory:6,spectra:2"
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Seconds between memory samples of the worker processes
+MEMORY_SAMPLE_SECONDS = 0.5
+# Seconds to wait for a started uvicorn server to answer
+SERVER_START_SECONDS = 60
+
+_LOG_REQUEST = re.compile(r'"(GET|POST|HEAD) (\S+) HTTP/[\d.]+"')
+
+
+def parse_mix(mix):
+    """Parse "name:weight,..." into a dictionary of endpoint weights."""
+    weights = {}
+    for entry in mix.split(","):
+        name, _, weight = entry.strip().partition(":")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r} in mix; choose from {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def load_sample(limit):
+    """
+    Read a random sample of sources from the configured database.
+
+    Returns:
+        dict: "sources" as (name, ra, dec) tuples and "spectra" as names of sources with spectra
+    """
+    from sqlalchemy import func, select
+
+    from src.config import DEC_COLUMN, FOREIGN_KEY, PRIMARY_TABLE, RA_COLUMN, SOURCE_COLUMN
+    from src.database.connection import get_database
+
+    db = get_database()
+    sources = db.metadata.tables[PRIMARY_TABLE]
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            select(sources.c[SOURCE_COLUMN], sources.c[RA_COLUMN], sources.c[DEC_COLUMN])
+            .order_by(func.random())
+            .limit(limit)
+        ).all()
+        spectra = []
+        if "Spectra" in db.metadata.tables:
+            spectra_table = db.metadata.tables["Spectra"]
+            spectra = conn.execute(select(spectra_table.c[FOREIGN_KEY]).distinct().limit(limit)).scalars().all()
+
+    if not rows:
+        raise SystemExit(f"No rows in {PRIMARY_TABLE} to build requests from")
+    return {"sources": [tuple(row) for row in rows], "spectra": [str(name) for name in spectra]}
+
+
+def make_request(name, sample, rng):
+    """
+    Build a request for an endpoint of the mix.
+
+    Returns:
+        tuple: (endpoint name, method, path, form data or None)
+    """
+    source, ra, dec = rng.choice(sample["sources"])
+    if name == "home":
+        return name, "GET", "/", None
+    if name == "browse":
+        return name, "GET", "/browse", None
+    if name == "plots":
+        return name, "GET", "/plots", None
+    if name == "search":
+        return name, "POST", "/api/search", {"query": str(source)}
+    if name == "cone":
+        ra = rng.uniform(0, 360) if ra is None else ra
+        dec = rng.uniform(-90, 90) if dec is None else dec
+        coordinates = f"{ra:.5f} {dec:+.5f}"
+        radius = f"{rng.uniform(1, 60):.1f}"
+        form = {"coordinates": coordinates, "radius": radius, "radius_unit": "arcminutes"}
+        return name, "POST", "/api/search/cone", form
+    if name == "spectra" and sample["spectra"]:
+        return name, "GET", f"/source/{quote(rng.choice(sample['spectra']), safe='')}/spectra", None
+    if name == "spectra":
+        return name, "GET", f"/source/{quote(str(source), safe='')}/spectra", None
+    return name, "GET", f"/source/{quote(str(source), safe='')}", None
+
+
+def _endpoint_name(method, path):
+    """Classify a replayed request by endpoint for the report."""
+    if path == "/":
+        return "home"
+    if path.startswith("/browse"):
+        return "browse"
+    if path.startswith("/plots"):
+        return "plots"
+    if path.startswith(("/api/search/cone", "/search/cone-results")):
+        return "cone"
+    if path.startswith(("/api/search", "/search")):
+        return "search"
+    if path.startswith("/source/") and path.rstrip("/").endswith("/spectra"):
+        return "spectra"
+    if path.startswith(("/source/", "/api/inventory")):
+        return "inventory"
+    return "other"
+
+
+def load_replay(path, sample, rng):
+    """
+    Read the requests of an access log or JSON lines file.
+
+    Returns:
+        list: (endpoint name, method, path, form data or None) tuples in log order
+    """
+    requests = []
+    with open(path) as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                method, request_path, data = entry.get("method", "GET").upper(), entry["path"], entry.get("data")
+            else:
+                match = _LOG_REQUEST.search(line)
+                if match is None:
+                    continue
+                method, request_path, data = match[1], match[2], None
+
+            name = _endpoint_name(method, request_path)
+            if method == "POST" and data is None:
+                # Access logs do not record form data: generate it for the search endpoints
+                if name not in ("search", "cone") and not request_path.startswith("/api/inventory"):
+                    continue
+                if request_path.startswith("/api/inventory"):
+                    data = {"source": str(rng.choice(sample["sources"])[0])}
+                else:
+                    data = make_request(name, sample, rng)[3]
+            requests.append((name, method, request_path, data))
+
+    if not requests:
+        raise SystemExit(f"No replayable requests found in {path}")
+    return requests
+
+
+def _rss_mib(pid, field="VmRSS"):
+    """Read a memory field of /proc/<pid>/status in MiB, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _worker_pids(pid):
+    """Return the ids of the worker processes uvicorn spawned from a supervisor process (Linux)."""
+    workers = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so parse after its closing parenthesis
+                parent = int(f.read().rpartition(")")[2].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                command = f.read()
+        except OSError:
+            continue
+        # Skip helpers such as multiprocessing's resource tracker
+        if parent == pid and b"spawn_main" in command:
+            workers.append(int(entry))
+    return workers
+
+
+async def _sample_memory(pids, memory, stop):
+    """Record the starting and peak RSS of each process until stopped."""
+    while True:
+        for pid in pids:
+            rss = _rss_mib(pid)
+            if rss is None:
+                continue
+            entry = memory.setdefault(pid, {"start_mib": rss, "peak_mib": rss, "end_mib": rss})
+            entry["peak_mib"] = max(entry["peak_mib"], rss)
+            entry["end_mib"] = rss
+        if stop.is_set():
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), MEMORY_SAMPLE_SECONDS)
+        except TimeoutError:
+            pass
+
+
+async def _send(client, request):
+    """
+    Send one request.
+
+    Returns:
+        tuple: (endpoint name, status code, seconds, bytes, exception name); status 0 means the
+               request failed without a response (connection error, timeout)
+    """
+    name, method, path, data = request
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, data=data)
+        return name, response.status_code, time.perf_counter() - start, len(response.content), None
+    except Exception as e:
+        return name, 0, time.perf_counter() - start, 0, type(e).__name__
+
+
+async def run_load(client, next_request, concurrency, duration, max_requests, pids):
+    """
+    Run concurrent users in closed loop until the duration or request count is reached.
+
+    Args:
+        client (httpx.AsyncClient): Client for the application
+        next_request (callable): Returns the next (name, method, path, data) request
+        concurrency (int): Number of concurrent users
+        duration (float): Seconds to run
+        max_requests (int): Stop after this many requests (None for no limit)
+        pids (list): Worker process ids to sample memory for
+
+    Returns:
+        tuple: (results, elapsed seconds, memory per pid)
+    """
+    results = []
+    started = {"count": 0}
+    memory = {}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_memory(pids, memory, stop))
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def user():
+        while time.perf_counter() < deadline and (max_requests is None or started["count"] < max_requests):
+            started["count"] += 1
+            results.append(await _send(client, next_request()))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+    return results, elapsed, memory
+
+
+def summarize(results, elapsed, memory):
+    """
+    Compute throughput, latency percentiles and error rates, overall and per endpoint.
+
+    Returns:
+        dict: Report with "endpoints", "total", "status_codes" and "workers"
+    """
+
+    def stats(rows):
+        seconds = np.array([row[2] for row in rows]) * 1000
+        errors = sum(not 200 <= row[1] < 400 for row in rows)
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": errors / len(rows),
+            "throughput": len(rows) / elapsed,
+            **{f"p{p}_ms": float(np.percentile(seconds, p)) for p in PERCENTILES},
+            "max_ms": float(seconds.max()),
+            "bytes": sum(row[3] for row in rows),
+        }
+
+    by_endpoint = {}
+    for row in results:
+        by_endpoint.setdefault(row[0], []).append(row)
+    status_codes = {}
+    exceptions = {}
+    for row in results:
+        status_codes[str(row[1])] = status_codes.get(str(row[1]), 0) + 1
+        if row[4] is not None:
+            exceptions[row[4]] = exceptions.get(row[4], 0) + 1
+
+    return {
+        "elapsed_seconds": elapsed,
+        "endpoints": {name: stats(rows) for name, rows in sorted(by_endpoint.items())},
+        "total": stats(results) if results else None,
+        "status_codes": dict(sorted(status_codes.items())),
+        "exceptions": exceptions,
+        "workers": {str(pid): entry for pid, entry in memory.items()},
+    }
+
+
+def print_report(report):
+    """Print a report as tables."""
+    columns = ["p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    header = f"{'endpoint':<11}{'requests':>9}{'errors':>8}{'req/s':>9}"
+    print(header + "".join(f"{c[:-3] + ' ms':>10}" for c in columns))
+    rows = list(report["endpoints"].items()) + ([("total", report["total"])] if report["total"] else [])
+    for name, stats in rows:
+        print(
+            f"{name:<11}{stats['requests']:>9}{stats['error_rate']:>8.1%}{stats['throughput']:>9.1f}"
+            + "".join(f"{stats[c]:>10.1f}" for c in columns)
+        )
+    print(f"\nstatus codes: {', '.join(f'{code}: {count}' for code, count in report['status_codes'].items())}")
+    if report["exceptions"]:
+        print(f"failed requests: {', '.join(f'{name}: {count}' for name, count in report['exceptions'].items())}")
+    if report["workers"]:
+        print(f"\n{'worker pid':<12}{'start MiB':>11}{'peak MiB':>10}{'end MiB':>10}")
+        for pid, entry in report["workers"].items():
+            print(f"{pid:<12}{entry['start_mib']:>11.1f}{entry['peak_mib']:>10.1f}{entry['end_mib']:>10.1f}")
+
+
+def _free_port():
+    """Return an unused local TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_for_server(client, process):
+    """Wait until the server answers, failing if it exits first."""
+    while True:
+        if process.returncode is not None:
+            raise SystemExit(f"uvicorn exited with status {process.returncode}")
+        try:
+            await client.get("/")
+            return
+        except Exception:
+            await asyncio.sleep(0.5)
+
+
+async def run(args, next_request, warmup):
+    """Start the application in the selected mode, warm it up and run the load."""
+    import httpx
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async def measure(client, pids):
+        for request in warmup:
+            await _send(client, request)
+        return await run_load(client, next_request, args.concurrency, args.duration, args.requests, pids)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            return await measure(client, [])
+
+    if args.workers:
+        port = _free_port()
+        command = [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--workers", str(args.workers)]
+        process = await asyncio.create_subprocess_exec(*command, "--log-level", "warning", env=os.environ.copy())
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=timeout, limits=limits) as client:
+                try:
+                    async with asyncio.timeout(SERVER_START_SECONDS):
+                        await _wait_for_server(client, process)
+                except TimeoutError:
+                    raise SystemExit("uvicorn did not start in time") from None
+                # With several workers uvicorn supervises them from a parent process
+                pids = _worker_pids(process.pid) if args.workers > 1 else [process.pid]
+                return await measure(client, [pid for pid in pids if _rss_mib(pid) is not None])
+        finally:
+            if process.returncode is None:
+                process.terminate()
+            await asyncio.wait_for(process.wait(), 30)
+
+    from src.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            return await measure(client, [os.getpid()])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the application with a traffic mix or a replayed access log."
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--replay", help="Access log or JSON lines file to replay instead of the mix")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent users")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="Start uvicorn with this many workers (default: in-process)"
+    )
+    parser.add_argument("--url", help="Base URL of an already running server")
+    parser.add_argument("--timeout", type=float, default=120, help="Request timeout in seconds")
+    parser.add_argument("--sample-size", type=int, default=500, help="Sources sampled from the database")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the request sequence")
+    parser.add_argument("--no-page-cache", action="store_true", help="Disable the rendered page cache")
+    parser.add_argument(
+        "--no-warmup", action="store_true", help="Do not send one unmeasured request per endpoint first"
+    )
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.no_page_cache:
+        # Read by the in-process app and inherited by uvicorn workers
+        os.environ["ASTRO_WEB_PAGE_CACHE"] = "false"
+
+    rng = random.Random(args.seed)
+    sample = load_sample(args.sample_size)
+
+    if args.replay:
+        replay = load_replay(args.replay, sample, rng)
+        position = {"next": 0}
+
+        def next_request():
+            request = replay[position["next"] % len(replay)]
+            position["next"] += 1
+            return request
+
+        warmup = list({request[0]: request for request in replay}.values())
+    else:
+        weights = parse_mix(args.mix)
+        names, weight_values = list(weights), list(weights.values())
+
+        def next_request():
+            return make_request(rng.choices(names, weights=weight_values)[0], sample, rng)
+
+        warmup = [make_request(name, sample, rng) for name in names]
+
+    results, elapsed, memory = asyncio.run(run(args, next_request, [] if args.no_warmup else warmup))
+    report = summarize(results, elapsed, memory)
+    mode = args.url or (f"uvicorn, {args.workers} workers" if args.workers else "in-process")
+    print(f"{len(results)} requests in {elapsed:.1f} s ({mode}, concurrency {args.concurrency})\n")
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": mode, "concurrency": args.concurrency, **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
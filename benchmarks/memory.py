@@ -0,0 +1,125 @@
+"""
+Peak memory benchmark for large result pages.
+
+Each scenario runs in a fresh Python process against the application
+configured by the usual ASTRO_WEB_* environment variables. After one warm-up
+request the process's peak RSS is reset and the request is repeated; the
+reported value is the growth of peak RSS above the resident size before the
+measured request, i.e. the memory needed to serve it.
+
+The page cache is disabled so every request is rendered. Requires Linux
+(/proc/self/status) and httpx for the test client.
+
+Usage:
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --scenario browse --scenario cone --repeat 3
+    python -m benchmarks.memory --query "TWA 27" --coordinates "209.30 14.48" --radius 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCENARIOS = ("browse", "search", "cone")
+
+
+def _read_status(field):
+    """Read a memory field of /proc/self/status, in MiB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not available in /proc/self/status")
+
+
+def _reset_peak_rss():
+    """Reset the process's peak RSS (VmHWM) to its current RSS (Linux 4.0+)."""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _request(client, scenario, args):
+    """Send the request of a scenario and return (status code, transferred bytes)."""
+    if scenario == "browse":
+        method, url, data = "GET", "/browse", None
+    elif scenario == "search":
+        method, url, data = "POST", "/api/search", {"query": args.query}
+    else:
+        method, url = "POST", "/api/search/cone"
+        data = {"coordinates": args.coordinates, "radius": args.radius, "radius_unit": args.radius_unit}
+
+    # Count the compressed body without decoding it, so the client holds as little as possible
+    with client.stream(method, url, data=data) as response:
+        size = sum(len(chunk) for chunk in response.iter_raw())
+    return response.status_code, size
+
+
+def run_scenario(scenario, args):
+    """Measure one scenario in the current process and print the result as JSON."""
+    os.environ["ASTRO_WEB_PAGE_CACHE"] = "false"
+    from fastapi.testclient import TestClient
+
+    from src.main import app
+
+    with TestClient(app) as client:
+        _request(client, scenario, args)
+
+        peaks, times = [], []
+        for _ in range(args.repeat):
+            _reset_peak_rss()
+            before = _read_status("VmRSS")
+            start = time.perf_counter()
+            status, size = _request(client, scenario, args)
+            times.append(time.perf_counter() - start)
+            peaks.append(_read_status("VmHWM") - before)
+
+    print(
+        json.dumps(
+            {
+                "scenario": scenario,
+                "status": status,
+                "bytes": size,
+                "seconds": min(times),
+                "peak_rss_mib": max(peaks),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak RSS of large result pages.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (may be repeated)")
+    parser.add_argument("--repeat", type=int, default=3, help="Measured requests per scenario")
+    parser.add_argument("--query", default="2MASS", help="Name search query for the search scenario")
+    parser.add_argument("--coordinates", default="180 0", help="Cone search center")
+    parser.add_argument("--radius", default="10", help="Cone search radius")
+    parser.add_argument("--radius-unit", default="degrees", help="Cone search radius unit")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_scenario(args.scenario[0], args)
+        return
+
+    print(f"{'scenario':<10}{'status':>8}{'bytes':>12}{'seconds':>10}{'peak RSS (MiB)':>16}")
+    for scenario in args.scenario or SCENARIOS:
+        command = [sys.executable, "-m", "benchmarks.memory", "--child", "--scenario", scenario]
+        command += ["--repeat", str(args.repeat), "--query", args.query, "--coordinates", args.coordinates]
+        command += ["--radius", args.radius, "--radius-unit", args.radius_unit]
+        completed = subprocess.run(command, capture_output=True, text=True, check=False)
+        if completed.returncode != 0:
+            print(f"{scenario:<10} failed:\n{completed.stderr[-2000:]}")
+            continue
+        result = json.loads([line for line in completed.stdout.splitlines() if line.startswith("{")][-1])
+        print(
+            f"{result['scenario']:<10}{result['status']:>8}{result['bytes']:>12}"
+            f"{result['seconds']:>10.3f}{result['peak_rss_mib']:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,21 @@ load_dotenv()
 # Default to SQLite database in project root
 CONNECTION_STRING = os.getenv("ASTRO_WEB_DATABASE_URL", "sqlite:///SIMPLE.sqlite")
 
+# Read replicas: comma-separated "url|weight|role+role" entries (weight defaults to 1, role to "default").
+# Replicas with the "heavy" role serve browse, cone search and export reads; reads fall back to the primary.
+READ_REPLICAS = [
+    (url, float(weight or 1), tuple((roles or "default").split("+")))
+    for url, weight, roles in (
+        [*entry.strip().split("|"), "", ""][:3]
+        for entry in os.getenv("ASTRO_WEB_READ_REPLICAS", "").split(",")
+        if entry.strip()
+    )
+]
+# Native cone searches on PostgreSQL: "auto" detects q3c, pg_sphere or PostGIS; "none" always uses the generic path
+SPATIAL_BACKEND = os.getenv("ASTRO_WEB_SPATIAL_BACKEND", "auto").lower()
+# Seconds between replica health checks (0 disables checks)
+REPLICA_HEALTH_SECONDS = float(os.getenv("ASTRO_WEB_REPLICA_HEALTH_SECONDS", "30"))
+
 # Base URL for source detail pages - can be customized for different deployments
 ASTRO_WEB_SOURCE_URL_BASE = os.getenv("ASTRO_WEB_SOURCE_URL_BASE", "/source/")
 PRIMARY_TABLE = os.getenv("ASTRO_WEB_PRIMARY_TABLE", "Sources")
@@ -37,6 +52,113 @@ DEC_COLUMN = os.getenv("ASTRO_WEB_DEC_COLUMN", "dec")
 # Spectra URL column name
 SPECTRA_URL_COLUMN = os.getenv("ASTRO_WEB_SPECTRA_URL_COLUMN", "access_url")
 
+# Local directory for derived data (materialized views, caches, exports)
+CACHE_DIR = os.getenv("ASTRO_WEB_CACHE_DIR", "cache")
+
+# SQLite file holding the materialized browse view (built with `python -m src.database.browse_view`)
+BROWSE_VIEW_PATH = os.getenv("ASTRO_WEB_BROWSE_VIEW_PATH", os.path.join(CACHE_DIR, "browse_view.sqlite"))
+
+# Seconds between database change checks (0 disables polling)
+CHANGE_POLL_SECONDS = float(os.getenv("ASTRO_WEB_CHANGE_POLL_SECONDS", "60"))
+
+# Columnar catalog exports (Parquet/Arrow), one directory per database version
+EXPORT_DIR = os.getenv("ASTRO_WEB_EXPORT_DIR", os.path.join(CACHE_DIR, "exports"))
+EXPORT_KEEP_VERSIONS = int(os.getenv("ASTRO_WEB_EXPORT_KEEP_VERSIONS", "2"))
+# Seconds between checks for a new database version to export (0 disables scheduled exports)
+EXPORT_INTERVAL_SECONDS = float(os.getenv("ASTRO_WEB_EXPORT_INTERVAL_SECONDS", "0"))
+
+# Shared read-only catalog arrays (source names and positions) memory-mapped by every worker
+CATALOG_STORE_DIR = os.getenv("ASTRO_WEB_CATALOG_STORE_DIR", os.path.join(CACHE_DIR, "catalog_store"))
+# Seconds between checks for a new database version to write arrays for (0 disables the in-process loader)
+CATALOG_STORE_INTERVAL_SECONDS = float(os.getenv("ASTRO_WEB_CATALOG_STORE_INTERVAL_SECONDS", "0"))
+
+# Background jobs: job table and result files, worker processes per application process (0 runs jobs one at a
+# time in a thread of the application process, or only in `python -m src.database.jobs` when JOB_INLINE is false),
+# and hours a finished job's result stays downloadable
+JOB_DIR = os.getenv("ASTRO_WEB_JOB_DIR", os.path.join(CACHE_DIR, "jobs"))
+JOB_WORKERS = int(os.getenv("ASTRO_WEB_JOB_WORKERS", "0"))
+JOB_INLINE = os.getenv("ASTRO_WEB_JOB_INLINE", "true").lower() == "true"
+JOB_RESULT_TTL_HOURS = float(os.getenv("ASTRO_WEB_JOB_RESULT_TTL_HOURS", "24"))
+# Seconds between checks for queued jobs and job progress
+JOB_POLL_SECONDS = float(os.getenv("ASTRO_WEB_JOB_POLL_SECONDS", "1"))
+
+# Content-addressed spectrum thumbnails (built with `python -m src.visualizations.thumbnails`)
+THUMBNAIL_DIR = os.getenv("ASTRO_WEB_THUMBNAIL_DIR", os.path.join(CACHE_DIR, "thumbnails"))
+# Points kept in each decimated thumbnail
+THUMBNAIL_POINTS = int(os.getenv("ASTRO_WEB_THUMBNAIL_POINTS", "160"))
+# Seconds between checks for a new database version to render thumbnails for (0 disables scheduled rendering)
+THUMBNAIL_INTERVAL_SECONDS = float(os.getenv("ASTRO_WEB_THUMBNAIL_INTERVAL_SECONDS", "0"))
+
+# Parsed spectra kept in memory (least recently used are evicted) and spectrum prefetching
+SPECTRUM_CACHE_ENTRIES = int(os.getenv("ASTRO_WEB_SPECTRUM_CACHE_ENTRIES", "256"))
+SPECTRUM_ACCESS_PATH = os.getenv("ASTRO_WEB_SPECTRUM_ACCESS_PATH", os.path.join(CACHE_DIR, "spectrum_access.json"))
+# Seconds between prefetch passes over the Spectra table (0 disables the in-process prefetcher)
+PREFETCH_INTERVAL_SECONDS = float(os.getenv("ASTRO_WEB_PREFETCH_INTERVAL_SECONDS", "0"))
+PREFETCH_CONCURRENCY = int(os.getenv("ASTRO_WEB_PREFETCH_CONCURRENCY", "2"))
+# Average download rate of the prefetcher in KiB/s (0 is unlimited)
+PREFETCH_BANDWIDTH_KBPS = float(os.getenv("ASTRO_WEB_PREFETCH_BANDWIDTH_KBPS", "1024"))
+# Hours after which a source view counts half as much when ranking sources to prefetch
+PREFETCH_HALF_LIFE_HOURS = float(os.getenv("ASTRO_WEB_PREFETCH_HALF_LIFE_HOURS", "24"))
+
+# Spectra comparison: default grid points, normalization band in μm ("1.2-1.3"; empty for the median of
+# each spectrum, "none" to skip), spectra per comparison, cached resampled spectra and concurrent spectrum reads
+COMPARE_GRID_POINTS = int(os.getenv("ASTRO_WEB_COMPARE_GRID_POINTS", "1000"))
+COMPARE_NORM_BAND = os.getenv("ASTRO_WEB_COMPARE_NORM_BAND", "")
+COMPARE_MAX_SPECTRA = int(os.getenv("ASTRO_WEB_COMPARE_MAX_SPECTRA", "20"))
+COMPARE_CACHE_ENTRIES = int(os.getenv("ASTRO_WEB_COMPARE_CACHE_ENTRIES", "1024"))
+COMPARE_CONCURRENCY = int(os.getenv("ASTRO_WEB_COMPARE_CONCURRENCY", "4"))
+
+# Color-magnitude and parameter diagram tables (pivoted band magnitudes), one file per database version
+DIAGRAM_DIR = os.getenv("ASTRO_WEB_DIAGRAM_DIR", os.path.join(CACHE_DIR, "diagrams"))
+
+# Similar sources: default and maximum neighbours returned, measured features a source needs to be indexed
+# (and a neighbour must share with it), and KD-trees over feature groups kept in memory (least recently used are
+# evicted)
+SIMILAR_DEFAULT_K = int(os.getenv("ASTRO_WEB_SIMILAR_DEFAULT_K", "10"))
+SIMILAR_MAX_K = int(os.getenv("ASTRO_WEB_SIMILAR_MAX_K", "100"))
+SIMILAR_MIN_FEATURES = int(os.getenv("ASTRO_WEB_SIMILAR_MIN_FEATURES", "3"))
+SIMILAR_MAX_TREES = int(os.getenv("ASTRO_WEB_SIMILAR_MAX_TREES", "1024"))
+
+# Rendered page cache for inventory, spectra and search result pages
+PAGE_CACHE_ENABLED = os.getenv("ASTRO_WEB_PAGE_CACHE", "true").lower() == "true"
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("ASTRO_WEB_PAGE_CACHE_MAX_ENTRIES", "256"))
+PAGE_CACHE_TTL_SECONDS = float(os.getenv("ASTRO_WEB_PAGE_CACHE_TTL_SECONDS", "300"))
+PAGE_CACHE_STALE_SECONDS = float(os.getenv("ASTRO_WEB_PAGE_CACHE_STALE_SECONDS", "3600"))
+PAGE_CACHE_DIR = os.getenv("ASTRO_WEB_PAGE_CACHE_DIR", "")  # empty keeps the cache in memory only
+
+# Response compression (brotli requires the optional brotli package)
+COMPRESSION_MIN_SIZE = int(os.getenv("ASTRO_WEB_COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("ASTRO_WEB_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("ASTRO_WEB_BROTLI_QUALITY", "5"))
+
+# Admission control: concurrency limit and wait queue size per request cost pool
+ADMISSION_ENABLED = os.getenv("ASTRO_WEB_ADMISSION", "true").lower() == "true"
+ADMISSION_POOLS = {
+    pool: (int(concurrency), int(queue_size))
+    for pool, concurrency, queue_size in (
+        entry.split(":")
+        for entry in os.getenv("ASTRO_WEB_ADMISSION_POOLS", "cheap:16:64,heavy:4:16,bulk:2:4").split(",")
+    )
+}
+# Estimated result rows above which a request is heavy or bulk
+ADMISSION_HEAVY_ROWS = int(os.getenv("ASTRO_WEB_ADMISSION_HEAVY_ROWS", "1000"))
+ADMISSION_BULK_ROWS = int(os.getenv("ASTRO_WEB_ADMISSION_BULK_ROWS", "10000"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ASTRO_WEB_ADMISSION_RETRY_AFTER", "5"))
+
+# Per-endpoint query time limits in seconds ("name:seconds", 0 disables the limit)
+QUERY_TIMEOUTS = {
+    name: float(seconds)
+    for name, seconds in (
+        entry.split(":")
+        for entry in os.getenv(
+            "ASTRO_WEB_QUERY_TIMEOUTS", "inventory:15,spectra:60,compare:60,search:30,cone:30,browse:60"
+        ).split(",")
+    )
+}
+
+# Stream large result pages (browse, search results) to the browser as rows are read
+STREAM_HTML = os.getenv("ASTRO_WEB_STREAM_HTML", "true").lower() == "true"
+
 # Schema (for postgres and other databases)
 SCHEMA = os.getenv("ASTRO_WEB_SCHEMA", None)
 if SCHEMA is not None and SCHEMA == "":
@@ -72,6 +194,19 @@ else:
     LOOKUP_TABLES = default_lookup_tables
 
 
+def source_link(source):
+    """
+    Format a source identifier as a link to its source detail page.
+
+    Args:
+        source: Source identifier
+
+    Returns:
+        str: HTML anchor element
+    """
+    return f"<a href='{ASTRO_WEB_SOURCE_URL_BASE}{quote(str(source))}'>{source}</a>"
+
+
 def get_source_url(results):
     """
     Given a pandas DataFrame or list of dictionaries, convert the SOURCE_COLUMN to a complete URL for the source detail page.
@@ -91,9 +226,7 @@ def get_source_url(results):
         for record in results:
             new_record = record.copy()
             if SOURCE_COLUMN in new_record:
-                new_record[SOURCE_COLUMN] = (
-                    f"<a href='{ASTRO_WEB_SOURCE_URL_BASE}{quote(str(new_record[SOURCE_COLUMN]))}'>{new_record[SOURCE_COLUMN]}</a>"
-                )
+                new_record[SOURCE_COLUMN] = source_link(new_record[SOURCE_COLUMN])
             new_results.append(new_record)
         return new_results
 
@@ -101,9 +234,7 @@ def get_source_url(results):
     elif isinstance(results, pd.DataFrame):
         new_results = results.copy()
         if SOURCE_COLUMN in new_results.columns:
-            new_results[SOURCE_COLUMN] = new_results[SOURCE_COLUMN].apply(
-                lambda x: f"<a href='{ASTRO_WEB_SOURCE_URL_BASE}{quote(str(x))}'>{x}</a>"
-            )
+            new_results[SOURCE_COLUMN] = new_results[SOURCE_COLUMN].apply(source_link)
         return new_results
 
     # Fallback for other types
@@ -0,0 +1,453 @@
+"""
+Materialized browse view.
+
+This module builds a denormalized summary table with one row per source:
+the primary table columns plus per-table row counts for every data table
+that references the primary table, the adopted spectral type and the list
+of aliases. The view is stored in a separate SQLite file so list pages
+(browse, search results) can be served without fanning out to related tables.
+
+Build it with:
+
+    python -m src.database.browse_view                 # full rebuild
+    python -m src.database.browse_view --source NAME   # refresh selected sources
+"""
+
+import argparse
+import contextlib
+import fcntl
+import logging
+import os
+import threading
+
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, Text, create_engine, func, select
+from sqlalchemy.pool import NullPool
+
+from src.config import (
+    BROWSE_VIEW_PATH,
+    DEC_COLUMN,
+    FOREIGN_KEY,
+    LOOKUP_TABLES,
+    PRIMARY_DATATYPE,
+    PRIMARY_TABLE,
+    RA_COLUMN,
+    SOURCE_COLUMN,
+)
+from src.database.columnar import iter_records
+from src.database.connection import HEAVY_ROLE, PRIMARY_ROLE, get_database
+
+logger = logging.getLogger(__name__)
+
+BROWSE_VIEW_TABLE = "BrowseView"
+
+# Tables and columns used for the alias list and adopted spectral type
+NAMES_TABLE = "Names"
+NAMES_COLUMN = "other_name"
+SPECTRAL_TYPES_TABLE = "SpectralTypes"
+SPECTRAL_TYPE_COLUMN = "spectral_type_string"
+
+ALIASES_COLUMN = "aliases"
+ADOPTED_SPECTRAL_TYPE_COLUMN = "adopted_spectral_type"
+
+# Number of sources summarized per round trip to the database
+BATCH_SIZE = 500
+
+_lock = threading.Lock()
+# View file path -> engine, reflected view table and summary columns of the file last read
+_readers = {}
+
+
+def get_view_engine(path=BROWSE_VIEW_PATH):
+    """
+    Create an engine for the browse view SQLite file.
+
+    NullPool is used so every read opens the current file; a full rebuild
+    swaps the file in place and must not be hidden behind pooled connections.
+
+    Args:
+        path (str): Path to the browse view SQLite file
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine bound to the SQLite file
+    """
+    # Streamed reads may fetch rows from several worker threads
+    return create_engine(f"sqlite:///{path}", poolclass=NullPool, connect_args={"check_same_thread": False})
+
+
+def find_related_tables(db):
+    """
+    Find data tables that reference the primary table.
+
+    Relationships are taken from the reflected foreign keys. Tables without a
+    declared foreign key but with a FOREIGN_KEY column are also included, as
+    some SQLite databases are created without foreign key constraints.
+
+    Args:
+        db (Database): astrodbkit Database instance
+
+    Returns:
+        dict: Table name -> column referencing the primary table key
+    """
+    related = {}
+    for table_name, table in db.metadata.tables.items():
+        if table_name == PRIMARY_TABLE or table_name in LOOKUP_TABLES:
+            continue
+        for fk in table.foreign_keys:
+            if fk.column.table.name == PRIMARY_TABLE and fk.column.name == SOURCE_COLUMN:
+                related[table_name] = fk.parent
+                break
+        else:
+            if FOREIGN_KEY in table.columns:
+                related[table_name] = table.columns[FOREIGN_KEY]
+    return related
+
+
+def count_column_name(table_name):
+    """Return the name of the summary column counting rows of a related table."""
+    return f"{table_name.lower()}_count"
+
+
+def summary_column_names(related):
+    """
+    Return the names of the columns the browse view adds to the primary table columns.
+
+    Args:
+        related (dict): Output of find_related_tables
+
+    Returns:
+        set: Alias list, adopted spectral type and one row count column per related table
+    """
+    return {ALIASES_COLUMN, ADOPTED_SPECTRAL_TYPE_COLUMN, *(count_column_name(name) for name in related)}
+
+
+def _view_table(db, related):
+    """Define the browse view table from the primary table and related tables."""
+    metadata = MetaData()
+    columns = []
+    for column in db.metadata.tables[PRIMARY_TABLE].columns:
+        try:
+            column_type = column.type.as_generic()
+        except NotImplementedError:
+            column_type = String()
+        columns.append(Column(column.name, column_type, primary_key=column.name == SOURCE_COLUMN))
+
+    columns.append(Column(ALIASES_COLUMN, Text))
+    columns.append(Column(ADOPTED_SPECTRAL_TYPE_COLUMN, String))
+    for table_name in sorted(related):
+        columns.append(Column(count_column_name(table_name), Integer, nullable=False, default=0))
+
+    view = Table(BROWSE_VIEW_TABLE, metadata, *columns)
+    for column_name in (RA_COLUMN, DEC_COLUMN, ADOPTED_SPECTRAL_TYPE_COLUMN):
+        if column_name in view.columns:
+            Index(f"ix_browse_{column_name}", view.columns[column_name])
+    return view
+
+
+def _summarize(conn, db, related, batch):
+    """
+    Build browse view rows for a batch of sources.
+
+    Args:
+        conn: Open connection to the source database
+        db (Database): astrodbkit Database instance
+        related (dict): Output of find_related_tables
+        batch (list): Source identifiers to summarize
+
+    Returns:
+        list: List of dictionaries, one per source found in the primary table
+    """
+    primary = db.metadata.tables[PRIMARY_TABLE]
+    rows = {}
+    for record in conn.execute(select(primary).where(primary.c[SOURCE_COLUMN].in_(batch))).mappings():
+        row = dict(record)
+        row[ALIASES_COLUMN] = None
+        row[ADOPTED_SPECTRAL_TYPE_COLUMN] = None
+        for table_name in related:
+            row[count_column_name(table_name)] = 0
+        rows[row[SOURCE_COLUMN]] = row
+
+    for table_name, fk_column in related.items():
+        query = select(fk_column, func.count()).where(fk_column.in_(batch)).group_by(fk_column)
+        for source, count in conn.execute(query):
+            if source in rows:
+                rows[source][count_column_name(table_name)] = count
+
+    names = db.metadata.tables.get(NAMES_TABLE)
+    if NAMES_TABLE in related and NAMES_COLUMN in names.columns:
+        fk_column = related[NAMES_TABLE]
+        aliases = {}
+        query = select(fk_column, names.c[NAMES_COLUMN]).where(fk_column.in_(batch)).order_by(names.c[NAMES_COLUMN])
+        for source, alias in conn.execute(query):
+            if alias != source:
+                aliases.setdefault(source, []).append(alias)
+        for source, alias_list in aliases.items():
+            if source in rows:
+                rows[source][ALIASES_COLUMN] = ", ".join(alias_list)
+
+    spectral_types = db.metadata.tables.get(SPECTRAL_TYPES_TABLE)
+    if SPECTRAL_TYPES_TABLE in related and SPECTRAL_TYPE_COLUMN in spectral_types.columns:
+        fk_column = related[SPECTRAL_TYPES_TABLE]
+        query = select(fk_column, spectral_types.c[SPECTRAL_TYPE_COLUMN]).where(fk_column.in_(batch))
+        if "adopted" in spectral_types.columns:
+            query = query.where(spectral_types.c.adopted.is_(True))
+        for source, spectral_type in conn.execute(query):
+            if source in rows:
+                rows[source][ADOPTED_SPECTRAL_TYPE_COLUMN] = spectral_type
+
+    return list(rows.values())
+
+
+def _write_batches(db, related, view, view_engine, sources):
+    """Summarize sources in batches and upsert them into the browse view."""
+    written = 0
+    with db.engine.connect() as conn:
+        for start in range(0, len(sources), BATCH_SIZE):
+            batch = sources[start : start + BATCH_SIZE]
+            rows = _summarize(conn, db, related, batch)
+            with view_engine.begin() as view_conn:
+                view_conn.execute(view.delete().where(view.c[SOURCE_COLUMN].in_(batch)))
+                if rows:
+                    view_conn.execute(view.insert(), rows)
+            written += len(rows)
+    return written
+
+
+def _inode(path):
+    """Return the inode of a file, or None if it does not exist."""
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def _build_lock(path):
+    """
+    Hold an exclusive lock on the browse view across processes.
+
+    Every worker applies change events, so builds and refreshes of the same
+    view file are serialized instead of contending for the SQLite file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build_browse_view(sources=None, path=BROWSE_VIEW_PATH):
+    """
+    Build or refresh the materialized browse view.
+
+    A full build writes a new SQLite file next to the current one and swaps it
+    in atomically, so readers never see a partially built view. When sources
+    are given, only those rows are recomputed in the existing view. Builds
+    from several processes take turns; a full build is skipped when another
+    process finished one while this one waited.
+
+    Args:
+        sources (list): Optional source identifiers to refresh. None rebuilds everything.
+        path (str): Path to the browse view SQLite file
+
+    Returns:
+        int: Number of rows written
+    """
+    # A full build swaps in a new file, so a changed inode means another process rebuilt the view
+    requested = _inode(path)
+    with _build_lock(path):
+        if sources is None and requested is not None and _inode(path) not in (None, requested):
+            logger.info(f"Browse view at {path} was rebuilt by another process")
+            return 0
+        return _build(sources, path)
+
+
+def _build(sources, path):
+    """Build or refresh the browse view while holding the build lock."""
+    # Incremental refreshes follow change events from the primary, so read them from the
+    # primary; full rebuilds are bulk reads served by a heavy replica
+    incremental = sources is not None and os.path.exists(path)
+    db = get_database(PRIMARY_ROLE if incremental else HEAVY_ROLE)
+    related = find_related_tables(db)
+    view = _view_table(db, related)
+
+    if incremental:
+        return _write_batches(db, related, view, _reader(path)["engine"], list(sources))
+
+    build_path = f"{path}.build-{os.getpid()}"
+    if os.path.exists(build_path):
+        os.remove(build_path)
+    build_engine = get_view_engine(build_path)
+    view.metadata.create_all(build_engine)
+
+    key = db.metadata.tables[PRIMARY_TABLE].c[SOURCE_COLUMN]
+    with db.engine.connect() as conn:
+        all_sources = [row[0] for row in conn.execute(select(key).order_by(key))]
+    written = _write_batches(db, related, view, build_engine, all_sources)
+
+    build_engine.dispose()
+    os.replace(build_path, path)
+    _forget_reader(path)
+    logger.info(f"Built browse view with {written} rows at {path}")
+    return written
+
+
+def refresh_browse_view(change):
+    """
+    Apply a database change event to the browse view.
+
+    Only an existing view is refreshed: affected sources are recomputed in
+    place, or the view is rebuilt when the scope of the change is unknown.
+
+    Args:
+        change (dict): Change dictionary from src.database.changes
+    """
+    if not os.path.exists(BROWSE_VIEW_PATH):
+        return
+    if change["sources"] is None:
+        build_browse_view()
+    elif change["sources"]:
+        build_browse_view(sources=sorted(change["sources"]))
+
+
+def _reader(path):
+    """
+    Return the engine, reflected view table and summary columns of a browse view file.
+
+    They are kept per path and replaced when the file is swapped for a new build, by
+    this process or another one.
+    """
+    inode = _inode(path)
+    with _lock:
+        reader = _readers.get(path)
+    if reader is not None and reader["inode"] == inode:
+        return reader
+
+    engine = get_view_engine(path)
+    view = Table(BROWSE_VIEW_TABLE, MetaData(), autoload_with=engine)
+    summary_columns = summary_column_names(find_related_tables(get_database(HEAVY_ROLE)))
+    reader = {
+        "inode": inode,
+        "engine": engine,
+        "view": view,
+        "summary_columns": [column.name for column in view.columns if column.name in summary_columns],
+    }
+    with _lock:
+        previous = _readers.get(path)
+        _readers[path] = reader
+    if previous is not None:
+        previous["engine"].dispose()
+    return reader
+
+
+def _forget_reader(path):
+    """Dispose of the engine of a browse view file that was replaced."""
+    with _lock:
+        reader = _readers.pop(path, None)
+    if reader is not None:
+        reader["engine"].dispose()
+
+
+def _read_view(query_builder, path=BROWSE_VIEW_PATH):
+    """Run a query against the browse view table, returning (reader, rows) or None if the view is unavailable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        reader = _reader(path)
+        with reader["engine"].connect() as conn:
+            rows = [dict(row) for row in conn.execute(query_builder(reader["view"])).mappings()]
+        return reader, rows
+    except Exception:
+        logger.exception("Error reading browse view")
+        return None
+
+
+def iter_browse_view(path=BROWSE_VIEW_PATH):
+    """
+    Stream the rows of the materialized browse view from the database cursor.
+
+    The query runs when iteration starts and rows are fetched in batches, so
+    callers can start sending a page before all rows are read.
+
+    Args:
+        path (str): Path to the browse view SQLite file
+
+    Returns:
+        tuple: (columns, rows) where columns is a list of column names and rows
+               is a generator of dictionaries, or None if the view has not been built
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        reader = _reader(path)
+    except Exception:
+        logger.exception("Error reading browse view")
+        return None
+    engine, view = reader["engine"], reader["view"]
+
+    def rows():
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(select(view))
+            for row in result.mappings():
+                yield dict(row)
+
+    return [column.name for column in view.columns], rows()
+
+
+def get_browse_summaries(source_names, path=BROWSE_VIEW_PATH):
+    """
+    Retrieve the summary columns for a set of sources.
+
+    Args:
+        source_names (list): Source identifiers
+        path (str): Path to the browse view SQLite file
+
+    Returns:
+        dict: Source identifier -> dictionary of summary columns, or None if the view has not been built
+    """
+    result = _read_view(lambda view: select(view).where(view.c[SOURCE_COLUMN].in_(list(source_names))), path)
+    if result is None:
+        return None
+
+    reader, rows = result
+    return {row[SOURCE_COLUMN]: {name: row[name] for name in reader["summary_columns"]} for row in rows}
+
+
+def iter_with_browse_summaries(results):
+    """
+    Stream the rows of a result DataFrame with browse view summary columns appended.
+
+    Summary columns are None for sources missing from the view, so every row
+    has the same columns.
+
+    Args:
+        results (pandas.DataFrame): Query results containing SOURCE_COLUMN
+
+    Returns:
+        tuple: (columns, rows) where columns is a list of column names and rows
+               is a generator of dictionaries
+    """
+    summaries = None
+    if SOURCE_COLUMN in results.columns and len(results) > 0:
+        summaries = get_browse_summaries(results[SOURCE_COLUMN].tolist())
+    summary_columns = list(next(iter(summaries.values()))) if summaries else []
+    empty_summary = dict.fromkeys(summary_columns)
+
+    def rows():
+        for row in iter_records(results):
+            if summary_columns:
+                row.update(summaries.get(row[SOURCE_COLUMN], empty_summary))
+            yield row
+
+    return list(results.columns) + summary_columns, rows()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the materialized browse view.")
+    parser.add_argument("--source", action="append", help="Refresh only this source (may be repeated)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sources = [PRIMARY_DATATYPE(source) for source in args.source] if args.source else None
+    count = build_browse_view(sources=sources)
+    print(f"Wrote {count} rows to {BROWSE_VIEW_PATH}")
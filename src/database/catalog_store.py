@@ -0,0 +1,346 @@
+"""
+Shared read-only catalog arrays.
+
+Source identifiers and positions of the primary table are written as
+columnar NumPy arrays under a directory named after the database version.
+Every uvicorn worker memory-maps the same files read-only, so the operating
+system keeps one copy in the page cache however many workers read them,
+instead of each worker holding its own copy of the Sources table.
+
+A generation is written to a temporary directory, renamed into place and
+then published by atomically replacing the LATEST file. Workers notice the
+new LATEST file on their next read and map the new generation; readers of
+the previous generation keep their mapping until they are done with it.
+
+The scatter plot, cone search and source name autocompletion read from the
+current generation, and fall back to the database while none exists or
+while it is older than the database.
+
+Write the arrays for the current database version with:
+
+    python -m src.database.catalog_store
+
+or keep them up to date from a separate loader process, or inside the
+application with ASTRO_WEB_CATALOG_STORE_INTERVAL_SECONDS:
+
+    python -m src.database.catalog_store --interval 60
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from src.config import CATALOG_STORE_DIR, DEC_COLUMN, PRIMARY_TABLE, RA_COLUMN, SOURCE_COLUMN
+from src.database.changes import check_for_changes, get_database_version
+from src.database.connection import HEAVY_ROLE, get_database
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+
+# Generations kept on disk; older ones may still be mapped by workers that have not switched yet
+KEEP_GENERATIONS = 2
+
+# Arrays of a generation: positions in degrees (NaN when missing), UTF-8 source names
+# concatenated with their offsets, and row numbers in case-insensitive name order
+ARRAYS = ("ra", "dec", "name_bytes", "name_offsets", "name_order")
+
+_lock = threading.Lock()
+_current = {"mtime": None, "catalog": None}
+_stats = {"attached": 0, "cone_searches": 0, "autocompletes": 0}
+
+
+def _fetch_columns(db):
+    """Read the source names and positions of the primary table."""
+    table = db.metadata.tables[PRIMARY_TABLE]
+    names, ras, decs = [], [], []
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            select(table.c[SOURCE_COLUMN], table.c[RA_COLUMN], table.c[DEC_COLUMN])
+        )
+        for name, ra, dec in result:
+            names.append(str(name))
+            ras.append(np.nan if ra is None else float(ra))
+            decs.append(np.nan if dec is None else float(dec))
+    return names, np.array(ras, dtype=np.float64), np.array(decs, dtype=np.float64)
+
+
+def _write_arrays(build_dir, names, ras, decs):
+    """Write the arrays of one generation as .npy files."""
+    encoded = [name.encode() for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    arrays = {
+        "ra": ras,
+        "dec": decs,
+        "name_bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "name_offsets": offsets,
+        "name_order": np.array(sorted(range(len(names)), key=lambda row: names[row].casefold()), dtype=np.int64),
+    }
+    for array_name, values in arrays.items():
+        np.save(os.path.join(build_dir, f"{array_name}.npy"), values)
+
+
+def build_catalog_store(version=None):
+    """
+    Write the catalog arrays for a database version and publish them as the current generation.
+
+    Existing generations are reused. The arrays are written to a temporary
+    directory and renamed into place, so a generation is either complete or absent.
+
+    Args:
+        version (str): Database version; defaults to the current version
+
+    Returns:
+        dict: Generation manifest
+    """
+    version = version or get_database_version()
+    version_dir = os.path.join(CATALOG_STORE_DIR, version)
+    manifest_path = os.path.join(version_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        # Workers may build the same version at once; each writes its own directory and the first rename wins
+        build_dir = f"{version_dir}.build-{os.getpid()}"
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+
+        names, ras, decs = _fetch_columns(get_database(HEAVY_ROLE))
+        _write_arrays(build_dir, names, ras, decs)
+        manifest = {"version": version, "created": datetime.now().isoformat(), "rows": len(names)}
+        with open(os.path.join(build_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        try:
+            os.replace(build_dir, version_dir)
+        except OSError:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            if not os.path.exists(manifest_path):
+                raise
+        logger.info(f"Wrote catalog arrays of {len(names)} sources for database version {version}")
+
+    if get_latest_version() != version:
+        _set_latest(version)
+        _remove_old_generations(keep=version)
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _set_latest(version):
+    """Atomically point the LATEST file at a generation."""
+    latest_path = os.path.join(CATALOG_STORE_DIR, LATEST_FILE)
+    with open(f"{latest_path}.tmp-{os.getpid()}", "w") as f:
+        f.write(version)
+    os.replace(f"{latest_path}.tmp-{os.getpid()}", latest_path)
+
+
+def get_latest_version():
+    """
+    Return the database version of the most recently published generation.
+
+    Returns:
+        str: Generation version, or None if nothing has been written
+    """
+    try:
+        with open(os.path.join(CATALOG_STORE_DIR, LATEST_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _remove_old_generations(keep):
+    """Delete all but the newest KEEP_GENERATIONS generation directories."""
+    version_dirs = [entry for entry in os.scandir(CATALOG_STORE_DIR) if entry.is_dir() and ".build" not in entry.name]
+    version_dirs.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in version_dirs[KEEP_GENERATIONS:]:
+        if entry.name != keep:
+            # Unlinking is safe on POSIX for workers that still map the files
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _attach(version):
+    """Memory-map the arrays of a generation read-only."""
+    version_dir = os.path.join(CATALOG_STORE_DIR, version)
+    catalog = {"version": version}
+    for array_name in ARRAYS:
+        catalog[array_name] = np.load(os.path.join(version_dir, f"{array_name}.npy"), mmap_mode="r")
+    return catalog
+
+
+def get_catalog():
+    """
+    Return the current generation of the catalog arrays, mapping a new one when LATEST has changed.
+
+    Returns:
+        dict: "version" and read-only memory-mapped arrays (see ARRAYS), or None if nothing has been written
+    """
+    latest_path = os.path.join(CATALOG_STORE_DIR, LATEST_FILE)
+    try:
+        mtime = os.stat(latest_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        if _current["mtime"] == mtime:
+            return _current["catalog"]
+    try:
+        with open(latest_path) as f:
+            version = f.read().strip()
+        catalog = _current["catalog"]
+        if catalog is None or catalog["version"] != version:
+            catalog = _attach(version)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error mapping catalog arrays: {e}")
+        return None
+
+    with _lock:
+        if catalog is not _current["catalog"]:
+            _stats["attached"] += 1
+        _current.update(mtime=mtime, catalog=catalog)
+    return catalog
+
+
+def get_current_catalog():
+    """
+    Return the current generation only if it matches the current database version.
+
+    Returns:
+        dict: Catalog arrays from get_catalog(), or None if they are missing or out of date
+    """
+    catalog = get_catalog()
+    if catalog is None or catalog["version"] != get_database_version():
+        return None
+    return catalog
+
+
+def source_names(catalog, rows):
+    """
+    Decode the source names of catalog rows.
+
+    Args:
+        catalog (dict): Catalog arrays from get_catalog()
+        rows (iterable): Row numbers
+
+    Returns:
+        list: Source names as strings
+    """
+    name_bytes, offsets = catalog["name_bytes"], catalog["name_offsets"]
+    return [bytes(name_bytes[offsets[row] : offsets[row + 1]]).decode() for row in rows]
+
+
+def cone_rows(catalog, ra, dec, radius_deg):
+    """
+    Find the catalog rows within a radius of a position.
+
+    Separations use the Vincenty formula, as astropy's SkyCoord.separation does.
+
+    Args:
+        catalog (dict): Catalog arrays from get_catalog()
+        ra (float): Right Ascension of the center in degrees
+        dec (float): Declination of the center in degrees
+        radius_deg (float): Search radius in degrees
+
+    Returns:
+        numpy.ndarray: Row numbers in table order
+    """
+    with _lock:
+        _stats["cone_searches"] += 1
+    ra_rad, dec_rad = np.radians(catalog["ra"]), np.radians(catalog["dec"])
+    center_ra, center_dec = np.radians(ra), np.radians(dec)
+    delta = ra_rad - center_ra
+    sin_dec, cos_dec = np.sin(dec_rad), np.cos(dec_rad)
+    num1 = cos_dec * np.sin(delta)
+    num2 = np.cos(center_dec) * sin_dec - np.sin(center_dec) * cos_dec * np.cos(delta)
+    denominator = np.sin(center_dec) * sin_dec + np.cos(center_dec) * cos_dec * np.cos(delta)
+    separation = np.degrees(np.arctan2(np.hypot(num1, num2), denominator))
+    # NaN positions compare False and are never matched
+    return np.flatnonzero(separation <= radius_deg)
+
+
+def search_names(prefix, limit=10):
+    """
+    Autocomplete source names by case-insensitive prefix.
+
+    Args:
+        prefix (str): Beginning of a source name
+        limit (int): Maximum number of names to return
+
+    Returns:
+        list: Matching source names in case-insensitive order, or None if no catalog arrays exist
+    """
+    catalog = get_catalog()
+    if catalog is None:
+        return None
+    with _lock:
+        _stats["autocompletes"] += 1
+
+    prefix = prefix.casefold()
+    order = catalog["name_order"]
+    start = bisect.bisect_left(order, prefix, key=lambda row: source_names(catalog, [row])[0].casefold())
+    matches = []
+    for position in range(start, min(start + limit, len(order))):
+        name = source_names(catalog, [order[position]])[0]
+        if not name.casefold().startswith(prefix):
+            break
+        matches.append(name)
+    return matches
+
+
+def get_catalog_store_stats():
+    """
+    Return the mapped generation and how often the catalog arrays were read.
+
+    Returns:
+        dict: Mapped version and row count, generations attached, cone searches and autocompletions
+    """
+    with _lock:
+        catalog = _current["catalog"]
+        return {
+            "version": catalog["version"] if catalog else None,
+            "rows": len(catalog["ra"]) if catalog else 0,
+            **_stats,
+        }
+
+
+async def schedule_catalog_store(interval):
+    """
+    Write the catalog arrays whenever the database version has changed, checking periodically until cancelled.
+
+    Args:
+        interval (float): Seconds between checks
+    """
+    while True:
+        try:
+            catalog = get_catalog()
+            if catalog is None or catalog["version"] != await run_in_threadpool(get_database_version):
+                await run_in_threadpool(build_catalog_store)
+        except Exception:
+            logger.exception("Error writing catalog arrays")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the shared catalog arrays for the current database version.")
+    parser.add_argument(
+        "--interval", type=float, default=0, help="Keep running, checking for a new version every N seconds"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        manifest = build_catalog_store()
+        print(f"{manifest['rows']} sources for database version {manifest['version']} in {CATALOG_STORE_DIR}")
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+        check_for_changes()
@@ -0,0 +1,367 @@
+"""
+Change detection for the catalog database.
+
+Derived data (the browse view and any in-process caches) subscribe to change
+events instead of reloading everything after a data ingest. Changes are found
+by comparing per-table fingerprints (row count and maximum key) between polls.
+When a data table changes, per-source row counts are compared to identify the
+affected sources. If the optional trigger-maintained change log is installed,
+it is read instead and also catches in-place updates.
+
+Install the change log triggers (SQLite or PostgreSQL) with:
+
+    python -m src.database.changes --install-triggers
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select, text
+
+from src.config import LOOKUP_TABLES, PRIMARY_DATATYPE, PRIMARY_TABLE, SOURCE_COLUMN
+from src.database.browse_view import find_related_tables
+from src.database.connection import PRIMARY_ROLE, get_database
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_TABLE = "AstroWebChanges"
+
+_lock = threading.Lock()
+_subscribers = []
+_state = {
+    "fingerprints": None,
+    "source_counts": {},
+    "last_change_id": None,
+    "version": None,
+}
+
+
+def subscribe(callback):
+    """
+    Register a callback to be notified when the database changes.
+
+    The callback receives a change dictionary with keys:
+        version (str): New database version
+        previous_version (str): Database version before the change
+        tables (list): Names of the tables that changed
+        sources (set): Affected source identifiers, or None when the scope is unknown
+                       (for example, a lookup table changed) and a full rebuild is needed
+
+    Args:
+        callback (callable): Function taking the change dictionary
+    """
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    """Remove a previously registered change callback."""
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def _tracked_tables(db):
+    """Return the reflected tables to fingerprint, excluding the change log itself."""
+    return {name: table for name, table in db.metadata.tables.items() if name != CHANGE_LOG_TABLE}
+
+
+def get_fingerprints(db):
+    """
+    Compute a fingerprint for every tracked table.
+
+    Args:
+        db (Database): astrodbkit Database instance
+
+    Returns:
+        dict: Table name -> (row count, maximum key as string)
+    """
+    fingerprints = {}
+    with db.engine.connect() as conn:
+        for table_name, table in _tracked_tables(db).items():
+            key_columns = list(table.primary_key.columns) or list(table.columns)[:1]
+            row_count, max_key = conn.execute(select(func.count(), func.max(key_columns[0])).select_from(table)).one()
+            fingerprints[table_name] = (row_count, str(max_key))
+    return fingerprints
+
+
+def compute_database_version(fingerprints):
+    """
+    Derive a short database version string from table fingerprints.
+
+    Args:
+        fingerprints (dict): Output of get_fingerprints
+
+    Returns:
+        str: 12 character hexadecimal version
+    """
+    digest = hashlib.sha1()
+    for table_name in sorted(fingerprints):
+        digest.update(f"{table_name}:{fingerprints[table_name]};".encode())
+    return digest.hexdigest()[:12]
+
+
+def _source_counts(conn, table, fk_column):
+    """Return source -> row count for a table referencing the primary table."""
+    if table.name == PRIMARY_TABLE:
+        return {row[0]: 1 for row in conn.execute(select(fk_column))}
+    return dict(conn.execute(select(fk_column, func.count()).group_by(fk_column)).all())
+
+
+def _source_keyed_tables(db):
+    """Return table name -> source column for the primary table and every table referencing it."""
+    keyed = find_related_tables(db)
+    keyed[PRIMARY_TABLE] = db.metadata.tables[PRIMARY_TABLE].c[SOURCE_COLUMN]
+    return keyed
+
+
+def _record_source_counts(db, table_names):
+    """
+    Store per-source row counts for the given tables.
+
+    Returns:
+        dict: Table name -> previously stored counts (None if not recorded before)
+    """
+    keyed = _source_keyed_tables(db)
+    previous = {}
+    with db.engine.connect() as conn:
+        for table_name in table_names:
+            if table_name in keyed:
+                previous[table_name] = _state["source_counts"].get(table_name)
+                table = db.metadata.tables[table_name]
+                _state["source_counts"][table_name] = _source_counts(conn, table, keyed[table_name])
+    return previous
+
+
+def _changed_sources_from_counts(db, changed_tables):
+    """
+    Find affected sources by diffing per-source row counts of the changed tables.
+
+    Returns None if a changed table is not keyed by source or no per-source
+    difference explains the change (for example, an in-place update).
+    """
+    previous = _record_source_counts(db, changed_tables)
+    if any(table_name not in previous or previous[table_name] is None for table_name in changed_tables):
+        return None
+
+    sources = set()
+    for table_name in changed_tables:
+        old_counts = previous[table_name]
+        new_counts = _state["source_counts"][table_name]
+        table_sources = {s for s in new_counts.keys() | old_counts.keys() if new_counts.get(s) != old_counts.get(s)}
+        if not table_sources:
+            return None
+        sources |= table_sources
+    return sources
+
+
+def _changed_sources_from_log(db):
+    """
+    Read new entries from the trigger-maintained change log.
+
+    Returns:
+        tuple: (tables, sources) recorded since the last check, or None if the change log is not installed
+    """
+    change_log = db.metadata.tables.get(CHANGE_LOG_TABLE)
+    if change_log is None:
+        return None
+
+    with db.engine.connect() as conn:
+        if _state["last_change_id"] is None:
+            _state["last_change_id"] = conn.execute(select(func.max(change_log.c.id))).scalar() or 0
+            return set(), set()
+        query = select(change_log.c.id, change_log.c.table_name, change_log.c.source).where(
+            change_log.c.id > _state["last_change_id"]
+        )
+        tables, sources = set(), set()
+        for change_id, table_name, source in conn.execute(query):
+            tables.add(table_name)
+            if source is not None:
+                sources.add(PRIMARY_DATATYPE(source))
+            _state["last_change_id"] = max(_state["last_change_id"], change_id)
+    return tables, sources
+
+
+def _notify(change):
+    """Call every subscriber with a change dictionary, logging failures."""
+    for callback in _subscribers.copy():
+        try:
+            callback(change)
+        except Exception:
+            logger.exception(f"Error in change subscriber {callback.__name__}")
+
+
+def check_for_changes():
+    """
+    Compare the database against the last check and notify subscribers of changes.
+
+    The first call records a baseline and does not notify.
+
+    Returns:
+        dict: Change dictionary (see subscribe), or None if nothing changed
+    """
+    with _lock:
+        db = get_database(PRIMARY_ROLE)
+        fingerprints = get_fingerprints(db)
+        log_entries = _changed_sources_from_log(db)
+        previous = _state["fingerprints"]
+        previous_version = _state["version"]
+        _state["fingerprints"] = fingerprints
+        # In-place updates only show up in the change log, so its position is part of the version
+        version_inputs = dict(fingerprints)
+        if _state["last_change_id"] is not None:
+            version_inputs[CHANGE_LOG_TABLE] = (_state["last_change_id"], "")
+        _state["version"] = compute_database_version(version_inputs)
+
+        if previous is None:
+            if log_entries is None:
+                _record_source_counts(db, fingerprints)
+            return None
+
+        changed_tables = sorted(
+            name for name in fingerprints.keys() | previous.keys() if fingerprints.get(name) != previous.get(name)
+        )
+        if log_entries is not None:
+            log_tables, sources = log_entries
+            unexplained = set(changed_tables) - log_tables
+            changed_tables = sorted(set(changed_tables) | log_tables)
+            if unexplained or any(name in LOOKUP_TABLES for name in changed_tables):
+                sources = None
+        elif changed_tables:
+            sources = _changed_sources_from_counts(db, changed_tables)
+
+        if not changed_tables:
+            return None
+
+        change = {
+            "version": _state["version"],
+            "previous_version": previous_version,
+            "tables": changed_tables,
+            "sources": sources,
+        }
+        logger.info(f"Database changed: tables={changed_tables}, sources={'all' if sources is None else len(sources)}")
+
+    _notify(change)
+    return change
+
+
+def get_database_version():
+    """
+    Return the current database version, computing a baseline on first use.
+
+    Returns:
+        str: Database version string
+    """
+    if _state["version"] is None:
+        check_for_changes()
+    return _state["version"]
+
+
+def get_table_row_count(table_name):
+    """
+    Return the row count of a table as of the last change check.
+
+    Args:
+        table_name (str): Table name
+
+    Returns:
+        int: Number of rows, or None if the table does not exist
+    """
+    if _state["fingerprints"] is None:
+        check_for_changes()
+    fingerprint = _state["fingerprints"].get(table_name)
+    return fingerprint[0] if fingerprint else None
+
+
+async def watch_for_changes(interval):
+    """
+    Poll the database for changes until cancelled.
+
+    Args:
+        interval (float): Seconds between checks
+    """
+    while True:
+        try:
+            await run_in_threadpool(check_for_changes)
+        except Exception:
+            logger.exception("Error checking database for changes")
+        await asyncio.sleep(interval)
+
+
+def install_change_log(db):
+    """
+    Create the change log table and triggers on the primary table and its data tables.
+
+    Supported on SQLite and PostgreSQL.
+
+    Args:
+        db (Database): astrodbkit Database instance
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        raise ValueError(f"Change log triggers are not supported for {dialect} databases")
+
+    change_log = Table(
+        CHANGE_LOG_TABLE,
+        MetaData(),
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("table_name", String, nullable=False),
+        Column("source", String),
+        Column("operation", String, nullable=False),
+        Column("changed_at", DateTime, server_default=func.current_timestamp()),
+    )
+    change_log.create(db.engine, checkfirst=True)
+
+    related = _source_keyed_tables(db)
+
+    with db.engine.begin() as conn:
+        if dialect == "postgresql":
+            conn.execute(
+                text(f"""
+                CREATE OR REPLACE FUNCTION astroweb_log_change() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        INSERT INTO "{CHANGE_LOG_TABLE}" (table_name, source, operation)
+                        VALUES (TG_TABLE_NAME, to_jsonb(OLD) ->> TG_ARGV[0], TG_OP);
+                        RETURN OLD;
+                    END IF;
+                    INSERT INTO "{CHANGE_LOG_TABLE}" (table_name, source, operation)
+                    VALUES (TG_TABLE_NAME, to_jsonb(NEW) ->> TG_ARGV[0], TG_OP);
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+                """)
+            )
+        for table_name, fk_column in related.items():
+            if dialect == "postgresql":
+                conn.execute(text(f'DROP TRIGGER IF EXISTS astroweb_changes ON "{table_name}"'))
+                conn.execute(
+                    text(
+                        f'CREATE TRIGGER astroweb_changes AFTER INSERT OR UPDATE OR DELETE ON "{table_name}" '
+                        f"FOR EACH ROW EXECUTE FUNCTION astroweb_log_change('{fk_column.name}')"
+                    )
+                )
+                continue
+            for operation, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                conn.execute(
+                    text(
+                        f'CREATE TRIGGER IF NOT EXISTS "astroweb_{table_name}_{operation.lower()}" '
+                        f'AFTER {operation} ON "{table_name}" BEGIN '
+                        f'INSERT INTO "{CHANGE_LOG_TABLE}" (table_name, source, operation) '
+                        f"VALUES ('{table_name}', {row}.\"{fk_column.name}\", '{operation}'); END"
+                    )
+                )
+    logger.info(f"Installed change log triggers on {len(related)} tables")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database change detection.")
+    parser.add_argument("--install-triggers", action="store_true", help="Create the change log table and triggers")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.install_triggers:
+        install_change_log(get_database(PRIMARY_ROLE))
+    print(f"Database version: {get_database_version()}")
@@ -0,0 +1,105 @@
+"""
+Compact columnar query results.
+
+Query results are kept as pandas DataFrames with compact column types
+instead of lists of dictionaries:
+
+- strings with many repeated values (references, regimes, telescopes) become
+  categorical columns, storing each distinct value once
+- other string columns use pyarrow-backed storage when the optional `pyarrow`
+  package is installed
+- numeric columns stay NumPy arrays
+
+Templates and JSON responses iterate over the DataFrame directly, so a page
+holds one copy of the results rather than one Python dictionary per row.
+"""
+
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# String columns with at most this ratio of distinct values to rows become categorical
+CATEGORICAL_MAX_RATIO = 0.5
+
+
+def compact_dataframe(df):
+    """
+    Convert the string columns of a DataFrame to compact dtypes.
+
+    Args:
+        df (pandas.DataFrame): Query results
+
+    Returns:
+        pandas.DataFrame: New DataFrame with categorical or pyarrow-backed string columns
+    """
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if not isinstance(series.dtype, pd.CategoricalDtype) and pd.api.types.is_string_dtype(series.dtype):
+            if series.nunique() <= CATEGORICAL_MAX_RATIO * len(series):
+                series = series.astype("category")
+            elif series.dtype == object and pyarrow is not None:
+                series = series.astype("string[pyarrow]")
+        columns[name] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _is_missing(value):
+    """Return True for None, NaN, NaT and pandas missing values."""
+    return pd.api.types.is_scalar(value) and bool(pd.isna(value))
+
+
+def iter_records(df):
+    """
+    Iterate over the rows of a DataFrame as dictionaries, one row at a time.
+
+    Missing values are returned as None.
+
+    Args:
+        df (pandas.DataFrame): Query results
+
+    Yields:
+        dict: Column name -> value
+    """
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield {name: None if _is_missing(value) else value for name, value in zip(columns, values, strict=True)}
+
+
+def _json_default(value):
+    """Convert values the json module does not handle: NumPy scalars, dates and anything else as a string."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_value(value):
+    """Return None for infinite floats, which JSON cannot represent (NaN is already None)."""
+    if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+        return None
+    return value
+
+
+def records_json(df):
+    """
+    Serialize a DataFrame as a JSON array of records, one row at a time.
+
+    Floats keep their full precision (pandas' to_json rounds to at most 15 digits).
+
+    Args:
+        df (pandas.DataFrame): Query results
+
+    Returns:
+        str: JSON array; missing and infinite values are null and dates ISO 8601 strings
+    """
+    records = ({name: _json_value(value) for name, value in record.items()} for record in iter_records(df))
+    return "[" + ",".join(json.dumps(record, default=_json_default) for record in records) + "]"
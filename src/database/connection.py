@@ -0,0 +1,258 @@
+"""
+Shared database connection helper with read-replica routing.
+
+Reads go to the replicas configured in ASTRO_WEB_READ_REPLICAS, chosen by
+weight among the healthy replicas with the requested role:
+
+- "default": inventory, spectra and name search reads
+- "heavy": browse, cone search and bulk export reads
+
+When no healthy replica has the role, reads use the primary database
+(ASTRO_WEB_DATABASE_URL). Change detection and writes always use the primary.
+
+Within a web request the chosen replica is pinned (see ReplicaPinningMiddleware),
+so all reads of one request see the same replica. A replica that fails to
+connect is marked unhealthy and the read fails over to another one. A replica
+that fails later, while a query runs on it, is marked unhealthy as well, but
+only the following reads fail over: the failed query is not retried, so it
+reaches the caller as an error. Periodic health checks bring a replica back
+once it answers again.
+
+Replicas can be exercised locally with copies of a SQLite database:
+
+    ASTRO_WEB_READ_REPLICAS="sqlite:///replica1.sqlite|2,sqlite:///replica2.sqlite|1|heavy"
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import sqlite3
+import threading
+
+from astrodbkit.astrodb import Database
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, literal, make_url, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.pool import NullPool
+
+from src.config import (
+    CONNECTION_STRING,
+    FOREIGN_KEY,
+    LOOKUP_TABLES,
+    PRIMARY_TABLE,
+    READ_REPLICAS,
+    SCHEMA,
+    SOURCE_COLUMN,
+)
+from src.database.timeouts import is_interrupted
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_ROLE = "primary"
+DEFAULT_ROLE = "default"
+HEAVY_ROLE = "heavy"
+
+_lock = threading.Lock()
+_replicas = [
+    {"url": url, "weight": weight, "roles": roles, "healthy": True, "selected": 0, "failures": 0}
+    for url, weight, roles in READ_REPLICAS
+]
+_health_engines = {}
+
+# Role -> replica URL chosen for the current request (None outside of requests)
+_pinned = contextvars.ContextVar("pinned_replicas", default=None)
+
+
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """Enable foreign key checks on SQLite connections, as astrodbkit does by default."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _find_replica(url):
+    """Return the replica with a URL, or None for the primary and unknown URLs."""
+    return next((replica for replica in _replicas if replica["url"] == url), None)
+
+
+def _choose_url(role, exclude=()):
+    """Pick a replica URL for a role by weight, falling back to the primary."""
+    if role == PRIMARY_ROLE:
+        return CONNECTION_STRING
+
+    pinned = _pinned.get()
+    if pinned is not None and pinned.get(role) not in (None, *exclude):
+        with _lock:
+            replica = _find_replica(pinned[role])
+            healthy = replica is not None and replica["healthy"]
+        if healthy:
+            return pinned[role]
+
+    with _lock:
+        candidates = [
+            replica
+            for replica in _replicas
+            if role in replica["roles"] and replica["healthy"] and replica["url"] not in exclude
+        ]
+        if not candidates:
+            return CONNECTION_STRING
+        replica = random.choices(candidates, weights=[replica["weight"] for replica in candidates])[0]
+        replica["selected"] += 1
+
+    if pinned is not None:
+        pinned[role] = replica["url"]
+    return replica["url"]
+
+
+def _mark_unhealthy(url, error):
+    """Take a replica out of rotation until the next successful health check."""
+    with _lock:
+        replica = _find_replica(url)
+        if replica is None or not replica["healthy"]:
+            return
+        replica["healthy"] = False
+        replica["failures"] += 1
+    logger.error(f"Read replica {_redact(url)} failed, failing over: {error}")
+
+
+@event.listens_for(Engine, "handle_error")
+def _evict_failed_replica(context):
+    """Take a replica out of rotation when a query on it fails to reach the database."""
+    if not _replicas or is_interrupted():
+        # Statements stopped by a query time limit also surface as operational errors
+        return
+    if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+        url = context.engine.url.render_as_string(hide_password=False)
+        for replica in _replicas:
+            if make_url(replica["url"]).render_as_string(hide_password=False) == url:
+                _mark_unhealthy(replica["url"], context.original_exception)
+
+
+def get_database(role=DEFAULT_ROLE):
+    """
+    Open an astrodbkit Database using the configured connection settings.
+
+    Args:
+        role (str): "default" or "heavy" to read from a replica with that role,
+                    or "primary" for the primary database
+
+    Returns:
+        Database: astrodbkit Database instance with reflected metadata
+    """
+    tried = []
+    while True:
+        url = _choose_url(role, exclude=tried)
+        try:
+            return Database(
+                url,
+                primary_table=PRIMARY_TABLE,
+                primary_table_key=SOURCE_COLUMN,
+                lookup_tables=LOOKUP_TABLES,
+                schema=SCHEMA,
+                foreign_key=FOREIGN_KEY,
+                # astrodbkit would register another class-wide "connect" listener for every
+                # Database, racing with connections opened by other threads; see above
+                sqlite_foreign=False,
+            )
+        except SQLAlchemyError as e:
+            if url == CONNECTION_STRING:
+                raise
+            _mark_unhealthy(url, e)
+            tried.append(url)
+
+
+def _check_replica(url):
+    """Return True if a replica accepts connections and has the primary table."""
+    # Connecting to a missing SQLite file would create an empty database
+    database_url = make_url(url)
+    if database_url.get_backend_name() == "sqlite" and not os.path.exists(database_url.database or ""):
+        logger.warning(f"Read replica {url} failed health check: database file does not exist")
+        return False
+
+    engine = _health_engines.get(url)
+    if engine is None:
+        engine = _health_engines[url] = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            conn.execute(select(literal(1)).select_from(table(PRIMARY_TABLE, schema=SCHEMA)).limit(1))
+        return True
+    except SQLAlchemyError as e:
+        logger.warning(f"Read replica {url} failed health check: {e}")
+        return False
+
+
+def check_replicas():
+    """Run a health check against every configured replica and update its status."""
+    for replica in _replicas:
+        healthy = _check_replica(replica["url"])
+        with _lock:
+            if not healthy and replica["healthy"]:
+                replica["failures"] += 1
+            replica["healthy"] = healthy
+
+
+async def monitor_replicas(interval):
+    """
+    Health-check the read replicas periodically until cancelled.
+
+    Args:
+        interval (float): Seconds between checks
+    """
+    while True:
+        try:
+            await run_in_threadpool(check_replicas)
+        except Exception:
+            logger.exception("Error checking read replicas")
+        await asyncio.sleep(interval)
+
+
+def get_replica_stats():
+    """
+    Return the status of the read replicas.
+
+    Returns:
+        list: One dictionary per replica with role, weight, health and selection counters
+    """
+    with _lock:
+        return [
+            {
+                "url": _redact(replica["url"]),
+                "roles": list(replica["roles"]),
+                "weight": replica["weight"],
+                "healthy": replica["healthy"],
+                "selected": replica["selected"],
+                "failures": replica["failures"],
+            }
+            for replica in _replicas
+        ]
+
+
+def _redact(url):
+    """Hide the password of a database URL."""
+    scheme, separator, rest = url.partition("://")
+    credentials, at, host = rest.rpartition("@")
+    if not at or ":" not in credentials:
+        return url
+    return f"{scheme}{separator}{credentials.split(':', 1)[0]}:***@{host}"
+
+
+class ReplicaPinningMiddleware:
+    """ASGI middleware giving each request its own replica pinning, so all its reads use one replica per role."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _replicas:
+            await self.app(scope, receive, send)
+            return
+        token = _pinned.set({})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _pinned.reset(token)
@@ -0,0 +1,198 @@
+"""
+Coordinate string parsing.
+
+Common formats are parsed with regular expressions and NumPy arithmetic:
+
+- decimal degrees: "209.30 14.48", "209.30, -14.48", "209.30d 14.48d"
+- sexagesimal with unit letters or symbols: "13h57m12s +14d28m39s", "13h 57m 12.3s -14° 28′ 39″"
+- sexagesimal with colons or spaces: "13:57:12 +14:28:39", "13 57 12 +14 28 39"
+
+Sexagesimal RA is in hours unless it is marked in degrees ("209d18m00s").
+Anything else falls back to astropy's SkyCoord, which is much slower.
+
+parse_coordinates() parses an array of strings into RA/Dec arrays in one
+call and reports errors per row instead of raising.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+from astropy.coordinates import SkyCoord
+
+NUMBER = r"\d+(?:\.\d*)?|\.\d+"
+
+# Decimal degrees, optionally marked with d or °
+_DECIMAL = re.compile(rf"(?P<ra>[+-]?(?:{NUMBER}))\s*[d°]?\s*[,\s]\s*(?P<dec>[+-]?(?:{NUMBER}))\s*[d°]?", re.IGNORECASE)
+
+# Sexagesimal with unit letters or symbols
+_LETTERS = re.compile(
+    rf"(?P<ra_a>\d+)\s*(?P<ra_unit>[hd°])\s*(?P<ra_b>\d+)\s*[m′']\s*(?P<ra_c>{NUMBER})\s*(?:s|″|\"|'')?"
+    rf"\s*,?\s*(?P<dec_sign>[+-]?)\s*(?P<dec_a>\d+)\s*[d°]\s*(?P<dec_b>\d+)\s*[m′']\s*(?P<dec_c>{NUMBER})\s*(?:s|″|\"|'')?",
+    re.IGNORECASE,
+)
+
+# Sexagesimal with colons or spaces (RA in hours)
+_COLONS = re.compile(
+    rf"(?P<ra_a>\d+)(?P<sep>[:\s])\s*(?P<ra_b>\d+)(?P=sep)\s*(?P<ra_c>{NUMBER})"
+    rf"\s*,?\s*(?P<dec_sign>[+-]?)\s*(?P<dec_a>\d+)(?P=sep)\s*(?P<dec_b>\d+)(?P=sep)\s*(?P<dec_c>{NUMBER})"
+)
+
+# Characters that mark a sexagesimal string for the SkyCoord fallback
+SEXAGESIMAL_CHARACTERS = ("h", "m", "s", "d", "°", "'", '"')
+
+
+def _parse_with_skycoord(coords_str):
+    """Parse a string the fast paths do not recognise, as the original parser did."""
+    if any(char in coords_str.lower() for char in SEXAGESIMAL_CHARACTERS):
+        try:
+            skycoord = SkyCoord(coords_str, frame="icrs")
+        except (TypeError, KeyError) as e:
+            raise ValueError(f"Invalid coordinate format: {coords_str}") from e
+        return float(skycoord.ra.deg), float(skycoord.dec.deg)
+
+    parts = coords_str.split()
+    if len(parts) != 2:
+        raise ValueError("Expected two space-separated values for decimal coordinates (e.g., '209.30 14.48')")
+    return float(parts[0]), float(parts[1])
+
+
+def _validate_ranges(ra, dec):
+    """Return the range error for a coordinate pair, or None."""
+    if not (0 <= ra <= 360):
+        return f"RA must be between 0 and 360 degrees, got {ra}"
+    if not (-90 <= dec <= 90):
+        return f"Dec must be between -90 and +90 degrees, got {dec}"
+    return None
+
+
+def _to_degrees(ra_a, ra_b, ra_c, ra_hours, dec_negative, dec_a, dec_b, dec_c):
+    """
+    Convert sexagesimal fields to decimal degrees.
+
+    Works element-wise on NumPy arrays as well as on scalars.
+
+    Returns:
+        tuple: (ra, dec, valid) where valid is False when minutes or seconds are 60 or more
+    """
+    ra = (ra_a + ra_b / 60 + ra_c / 3600) * (1 + 14 * ra_hours)
+    dec = (1 - 2 * dec_negative) * (dec_a + dec_b / 60 + dec_c / 3600)
+    valid = (ra_b < 60) & (ra_c < 60) & (dec_b < 60) & (dec_c < 60)
+    return ra, dec, valid
+
+
+def _fields(groups, name):
+    """Return an extracted column as a float array."""
+    return groups[name].to_numpy(dtype=float)
+
+
+def parse_coordinates(values):
+    """
+    Parse an array of coordinate strings into RA/Dec arrays in decimal degrees.
+
+    Args:
+        values (list): Coordinate strings (e.g. "13h57m12s +14d28m39s" or "209.30 14.48")
+
+    Returns:
+        tuple: (ra, dec, errors) where ra and dec are float arrays (NaN for rows that
+               failed) and errors is a list with None or an error message per row
+    """
+    strings = pd.Series(values, dtype=object).fillna("").astype(str).str.strip()
+    count = len(strings)
+    ra = np.full(count, np.nan)
+    dec = np.full(count, np.nan)
+    errors = [None] * count
+    remaining = np.ones(count, dtype=bool)
+
+    # Decimal degrees
+    matched = strings.str.fullmatch(_DECIMAL).to_numpy()
+    if matched.any():
+        groups = strings[matched].str.extract(_DECIMAL)
+        ra[matched] = _fields(groups, "ra")
+        dec[matched] = _fields(groups, "dec")
+        remaining &= ~matched
+
+    # Sexagesimal formats
+    for pattern in (_LETTERS, _COLONS):
+        if not remaining.any():
+            break
+        subset = strings[remaining]
+        matched = subset.str.fullmatch(pattern).to_numpy()
+        if not matched.any():
+            continue
+        rows = subset.index[matched].to_numpy()
+        groups = subset[matched].str.extract(pattern)
+        ra_hours = groups["ra_unit"].str.lower().eq("h").to_numpy() if "ra_unit" in groups else True
+        ra[rows], dec[rows], valid = _to_degrees(
+            _fields(groups, "ra_a"),
+            _fields(groups, "ra_b"),
+            _fields(groups, "ra_c"),
+            ra_hours,
+            groups["dec_sign"].eq("-").to_numpy(),
+            _fields(groups, "dec_a"),
+            _fields(groups, "dec_b"),
+            _fields(groups, "dec_c"),
+        )
+        for row in rows[~valid]:
+            ra[row] = dec[row] = np.nan
+            errors[row] = f"Invalid coordinate format: {strings.iloc[row]} (minutes and seconds must be below 60)"
+        remaining[rows] = False
+
+    # Exotic formats
+    for row in np.flatnonzero(remaining):
+        try:
+            ra[row], dec[row] = _parse_with_skycoord(strings.iloc[row])
+        except ValueError as e:
+            errors[row] = str(e)
+
+    # Range checks
+    for row in np.flatnonzero((ra < 0) | (ra > 360) | (dec < -90) | (dec > 90)):
+        errors[row] = _validate_ranges(ra[row], dec[row])
+        ra[row] = dec[row] = np.nan
+
+    return ra, dec, errors
+
+
+def parse_coordinate(coords_str):
+    """
+    Parse a single coordinate string to decimal degrees.
+
+    Args:
+        coords_str (str): Combined coordinate string (e.g., "13h57m12s +14d28m39s" or "209.30 14.48")
+
+    Returns:
+        tuple: (ra_decimal, dec_decimal) in degrees
+
+    Raises:
+        ValueError: If coordinates cannot be parsed or are out of range
+    """
+    coords_str = coords_str.strip()
+
+    match = _DECIMAL.fullmatch(coords_str)
+    if match:
+        ra, dec = float(match["ra"]), float(match["dec"])
+    else:
+        for pattern in (_LETTERS, _COLONS):
+            match = pattern.fullmatch(coords_str)
+            if match:
+                break
+        if match:
+            ra, dec, valid = _to_degrees(
+                float(match["ra_a"]),
+                float(match["ra_b"]),
+                float(match["ra_c"]),
+                (match.groupdict().get("ra_unit") or "h").lower() == "h",
+                match["dec_sign"] == "-",
+                float(match["dec_a"]),
+                float(match["dec_b"]),
+                float(match["dec_c"]),
+            )
+            if not valid:
+                raise ValueError(f"Invalid coordinate format: {coords_str} (minutes and seconds must be below 60)")
+        else:
+            ra, dec = _parse_with_skycoord(coords_str)
+
+    error = _validate_ranges(ra, dec)
+    if error is not None:
+        raise ValueError(error)
+    return ra, dec
@@ -0,0 +1,258 @@
+"""
+Columnar snapshot export of the catalog.
+
+Every table is written to partitioned Parquet files and a single Arrow IPC
+file under a directory named after the database version, with a manifest
+describing the files. Bulk consumers download these instead of scraping
+`/browse` or looping over `/api/inventory`.
+
+Requires the optional `pyarrow` dependency (`pip install astro-web[export]`).
+
+Export the current version with:
+
+    python -m src.database.export
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, types
+
+from src.config import EXPORT_DIR, EXPORT_KEEP_VERSIONS
+from src.database.changes import CHANGE_LOG_TABLE, get_database_version
+from src.database.connection import HEAVY_ROLE, get_database
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+
+# Rows per Parquet part file and per Arrow record batch
+ROWS_PER_PART = 100_000
+
+
+def _arrow_schema(table):
+    """Map the reflected SQLAlchemy column types of a table to an Arrow schema."""
+    import pyarrow as pa
+
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, types.Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, types.Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, (types.Float, types.Numeric)):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, types.DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, types.Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _record_batches(conn, table, schema):
+    """Yield Arrow record batches for a table, streaming rows from the database cursor."""
+    import pyarrow as pa
+
+    result = conn.execution_options(stream_results=True).execute(select(table))
+    while rows := result.fetchmany(ROWS_PER_PART):
+        columns = {}
+        for index, field in enumerate(schema):
+            values = [row[index] for row in rows]
+            if pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            elif pa.types.is_floating(field.type):
+                # Numeric columns are read as Decimal, which Arrow does not convert to float64
+                values = [None if value is None else float(value) for value in values]
+            columns[field.name] = values
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def _export_table(conn, table, export_dir):
+    """
+    Write one table as Parquet parts and an Arrow IPC file.
+
+    Returns:
+        dict: Manifest entry with row count and file names relative to export_dir
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(table)
+    os.makedirs(os.path.join(export_dir, table.name), exist_ok=True)
+    arrow_file = f"{table.name}.arrow"
+    parquet_files = []
+    rows = 0
+
+    with (
+        pa.OSFile(os.path.join(export_dir, arrow_file), "wb") as sink,
+        pa.ipc.new_file(sink, schema) as writer,
+    ):
+        for part, batch in enumerate(_record_batches(conn, table, schema)):
+            writer.write_batch(batch)
+            parquet_file = f"{table.name}/part-{part:05d}.parquet"
+            pq.write_table(pa.Table.from_batches([batch]), os.path.join(export_dir, parquet_file))
+            parquet_files.append(parquet_file)
+            rows += batch.num_rows
+
+    # Empty tables still get one Parquet file so consumers see the schema
+    if not parquet_files:
+        parquet_file = f"{table.name}/part-00000.parquet"
+        pq.write_table(schema.empty_table(), os.path.join(export_dir, parquet_file))
+        parquet_files.append(parquet_file)
+
+    return {"rows": rows, "parquet": parquet_files, "arrow": arrow_file}
+
+
+def export_catalog(version=None):
+    """
+    Export every table of the database for a database version.
+
+    The export is written to a temporary directory and renamed into place, so a
+    version directory is either complete or absent. Existing exports are reused.
+
+    Args:
+        version (str): Database version; defaults to the current version
+
+    Returns:
+        dict: Export manifest
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Catalog export requires pyarrow: pip install astro-web[export]") from e
+
+    version = version or get_database_version()
+    version_dir = os.path.join(EXPORT_DIR, version)
+    if os.path.exists(os.path.join(version_dir, MANIFEST_FILE)):
+        return get_export_manifest(version)
+
+    # Workers and job processes may export the same version at once; each writes its own directory
+    # and the first rename wins
+    build_dir = f"{version_dir}.build-{os.getpid()}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    db = get_database(HEAVY_ROLE)
+    tables = {}
+    with db.engine.connect() as conn:
+        for table_name, table in db.metadata.tables.items():
+            if table_name == CHANGE_LOG_TABLE:
+                continue
+            tables[table_name] = _export_table(conn, table, build_dir)
+
+    manifest = {"version": version, "created": datetime.now().isoformat(), "tables": tables}
+    with open(os.path.join(build_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    try:
+        os.replace(build_dir, version_dir)
+    except OSError:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(version_dir, MANIFEST_FILE)):
+            raise
+        return get_export_manifest(version)
+    _set_latest(version)
+    _remove_old_exports(keep=version)
+    logger.info(f"Exported {len(tables)} tables for database version {version}")
+    return manifest
+
+
+def _set_latest(version):
+    """Atomically point the LATEST file at an export version."""
+    latest_path = os.path.join(EXPORT_DIR, LATEST_FILE)
+    with open(f"{latest_path}.tmp-{os.getpid()}", "w") as f:
+        f.write(version)
+    os.replace(f"{latest_path}.tmp-{os.getpid()}", latest_path)
+
+
+def _remove_old_exports(keep):
+    """Delete all but the newest EXPORT_KEEP_VERSIONS export directories."""
+    version_dirs = [entry for entry in os.scandir(EXPORT_DIR) if entry.is_dir() and ".build" not in entry.name]
+    version_dirs.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in version_dirs[EXPORT_KEEP_VERSIONS:]:
+        if entry.name != keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def get_latest_version():
+    """
+    Return the database version of the most recent export.
+
+    Returns:
+        str: Export version, or None if nothing has been exported
+    """
+    try:
+        with open(os.path.join(EXPORT_DIR, LATEST_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def get_export_manifest(version):
+    """
+    Load the manifest of an export version.
+
+    Args:
+        version (str): Export version
+
+    Returns:
+        dict: Export manifest, or None if the version does not exist
+    """
+    if not version.isalnum():
+        return None
+    try:
+        with open(os.path.join(EXPORT_DIR, version, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def get_export_file(version, file_path):
+    """
+    Resolve a file inside an export version directory.
+
+    Args:
+        version (str): Export version
+        file_path (str): Path relative to the version directory
+
+    Returns:
+        str: Absolute path to the file, or None if it does not exist or escapes the export directory
+    """
+    if not version.isalnum():
+        return None
+    version_dir = os.path.realpath(os.path.join(EXPORT_DIR, version))
+    full_path = os.path.realpath(os.path.join(version_dir, file_path))
+    if not full_path.startswith(version_dir + os.sep) or not os.path.isfile(full_path):
+        return None
+    return full_path
+
+
+async def schedule_exports(interval):
+    """
+    Export the catalog whenever the database version has changed, checking periodically until cancelled.
+
+    Args:
+        interval (float): Seconds between checks
+    """
+    while True:
+        try:
+            if get_latest_version() != await run_in_threadpool(get_database_version):
+                await run_in_threadpool(export_catalog)
+        except Exception:
+            logger.exception("Error exporting catalog")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    manifest = export_catalog()
+    print(f"Exported database version {manifest['version']} to {os.path.join(EXPORT_DIR, manifest['version'])}")
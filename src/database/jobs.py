@@ -0,0 +1,475 @@
+"""
+Background jobs for long-running queries.
+
+Uncapped cone searches, bulk inventories and full catalog exports are
+submitted as jobs instead of running inside a request. Jobs are kept in a
+SQLite job table under JOB_DIR, shared by every application process, and run
+one at a time in a thread of each application process, or on a process pool
+of JOB_WORKERS processes per application process when that is set.
+Clients poll the job, or follow its progress as server-sent events, and
+download the result file once it is done.
+
+Identical jobs (same kind and parameters, same database version) are
+deduplicated: submitting one that is queued, running or done returns the
+existing job. Result files are deleted JOB_RESULT_TTL_HOURS after the job
+finished, and the job is then marked expired.
+
+Jobs left running by a process that exited are queued again. Run the jobs
+in a separate worker process, instead of or in addition to the application
+processes, with:
+
+    python -m src.database.jobs
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, Text, create_engine, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+
+from src.config import JOB_DIR, JOB_POLL_SECONDS, JOB_RESULT_TTL_HOURS, JOB_WORKERS
+from src.database.changes import get_database_version
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_FILE = "jobs.sqlite"
+RESULTS_DIR = "results"
+
+# Job kinds and the extension and media type of their result file
+JOB_KINDS = {
+    "cone_search": ("csv", "text/csv"),
+    "inventory": ("jsonl", "application/x-ndjson"),
+    "export": ("json", "application/json"),
+}
+
+ACTIVE_STATUSES = ("queued", "running", "done")
+FINISHED_STATUSES = ("done", "failed", "expired")
+
+# Seconds between progress updates written by a running job
+PROGRESS_INTERVAL = 0.5
+
+# Seconds between deletions of expired results
+EXPIRE_INTERVAL = 60
+
+_metadata = MetaData()
+jobs_table = Table(
+    "jobs",
+    _metadata,
+    Column("id", String, primary_key=True),
+    Column("kind", String, nullable=False),
+    Column("params", Text, nullable=False),
+    Column("dedup_key", String, nullable=False),
+    Column("database_version", String),
+    Column("status", String, nullable=False),
+    Column("progress", Float, nullable=False, default=0.0),
+    Column("message", Text),
+    Column("result_file", String),
+    Column("result_rows", Integer),
+    Column("pid", Integer),
+    Column("created", Float, nullable=False),
+    Column("started", Float),
+    Column("finished", Float),
+    Column("expires", Float),
+)
+# At most one queued, running or done job per key; failed and expired jobs can be submitted again
+Index(
+    "jobs_dedup_idx",
+    jobs_table.c.dedup_key,
+    unique=True,
+    sqlite_where=jobs_table.c.status.in_(ACTIVE_STATUSES),
+)
+Index("jobs_status_idx", jobs_table.c.status, jobs_table.c.created)
+
+_lock = threading.Lock()
+_state = {"engine": None}
+_wakeup = {"event": None}
+
+
+def get_jobs_engine():
+    """
+    Return the engine of the job table, creating the table on first use.
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine bound to the job SQLite file
+    """
+    with _lock:
+        if _state["engine"] is None:
+            os.makedirs(os.path.join(JOB_DIR, RESULTS_DIR), exist_ok=True)
+            # Several processes write to the table; wait for their short transactions instead of failing
+            engine = create_engine(
+                f"sqlite:///{os.path.join(JOB_DIR, JOBS_DB_FILE)}",
+                poolclass=NullPool,
+                connect_args={"check_same_thread": False, "timeout": 30},
+            )
+            with engine.begin() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            _metadata.create_all(engine)
+            _state["engine"] = engine
+        return _state["engine"]
+
+
+def _row_to_job(row):
+    """Convert a job table row to a dictionary with decoded parameters."""
+    job = dict(row._mapping)
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+def dedup_key(kind, params, version):
+    """
+    Return the key identifying identical jobs.
+
+    Args:
+        kind (str): Job kind
+        params (dict): Job parameters
+        version (str): Database version the job runs against
+
+    Returns:
+        str: SHA-1 hex digest
+    """
+    canonical = json.dumps({"kind": kind, "params": params, "version": version}, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def submit_job(kind, params):
+    """
+    Queue a job, or return the identical job that is already queued, running or done.
+
+    Args:
+        kind (str): One of JOB_KINDS
+        params (dict): JSON-serializable job parameters
+
+    Returns:
+        tuple: (job, deduplicated) where job is the job dictionary
+
+    Raises:
+        ValueError: If the job kind is unknown
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}. Must be one of {', '.join(JOB_KINDS)}")
+
+    version = get_database_version()
+    key = dedup_key(kind, params, version)
+    engine = get_jobs_engine()
+    # The identical job may expire between a failed insert and the lookup; then insert again
+    for _ in range(3):
+        try:
+            with engine.begin() as conn:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    jobs_table.insert().values(
+                        id=job_id,
+                        kind=kind,
+                        params=json.dumps(params, sort_keys=True),
+                        dedup_key=key,
+                        database_version=version,
+                        status="queued",
+                        progress=0.0,
+                        created=time.time(),
+                    )
+                )
+            return get_job(job_id), False
+        except IntegrityError:
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(jobs_table).where(jobs_table.c.dedup_key == key, jobs_table.c.status.in_(ACTIVE_STATUSES))
+                ).first()
+            if row is not None:
+                return _row_to_job(row), True
+    raise RuntimeError(f"Could not queue {kind} job")
+
+
+def get_job(job_id):
+    """
+    Look up a job.
+
+    Args:
+        job_id (str): Job ID
+
+    Returns:
+        dict: Job table row with decoded parameters, or None if the job does not exist
+    """
+    with get_jobs_engine().connect() as conn:
+        row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+    return _row_to_job(row) if row is not None else None
+
+
+def get_result_file(job):
+    """
+    Resolve the result file of a finished job.
+
+    Args:
+        job (dict): Job from get_job()
+
+    Returns:
+        str: Path to the result file, or None if the job has no (unexpired) result
+    """
+    if job["status"] != "done" or not job["result_file"]:
+        return None
+    path = os.path.join(JOB_DIR, RESULTS_DIR, job["result_file"])
+    return path if os.path.isfile(path) else None
+
+
+def _update_job(job_id, **values):
+    """Write columns of a job."""
+    with get_jobs_engine().begin() as conn:
+        conn.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(**values))
+
+
+def claim_next_job():
+    """
+    Atomically mark the oldest queued job as running in this process.
+
+    Returns:
+        str: ID of the claimed job, or None if no job is queued
+    """
+    oldest = (
+        select(jobs_table.c.id)
+        .where(jobs_table.c.status == "queued")
+        .order_by(jobs_table.c.created)
+        .limit(1)
+        .scalar_subquery()
+    )
+    with get_jobs_engine().begin() as conn:
+        return conn.execute(
+            update(jobs_table)
+            .where(jobs_table.c.id == oldest, jobs_table.c.status == "queued")
+            .values(status="running", started=time.time(), pid=os.getpid())
+            .returning(jobs_table.c.id)
+        ).scalar()
+
+
+def _pid_alive(pid):
+    """Return True if a process with this ID exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_jobs():
+    """
+    Queue again the running jobs whose process has exited.
+
+    Returns:
+        int: Number of jobs queued again
+    """
+    with get_jobs_engine().connect() as conn:
+        running = conn.execute(select(jobs_table.c.id, jobs_table.c.pid).where(jobs_table.c.status == "running")).all()
+    orphaned = [job_id for job_id, pid in running if pid is None or not _pid_alive(pid)]
+    for job_id in orphaned:
+        _update_job(
+            job_id, status="queued", progress=0.0, pid=None, started=None, message="Restarted after interruption"
+        )
+    if orphaned:
+        logger.warning(f"Queued {len(orphaned)} interrupted jobs again")
+    return len(orphaned)
+
+
+def expire_jobs():
+    """
+    Delete the result files of jobs that finished more than JOB_RESULT_TTL_HOURS ago.
+
+    Returns:
+        int: Number of jobs expired
+    """
+    now = time.time()
+    with get_jobs_engine().connect() as conn:
+        expired = conn.execute(
+            select(jobs_table.c.id, jobs_table.c.result_file).where(
+                jobs_table.c.status.in_(("done", "failed")), jobs_table.c.expires < now
+            )
+        ).all()
+    for job_id, result_file in expired:
+        if result_file:
+            try:
+                os.remove(os.path.join(JOB_DIR, RESULTS_DIR, result_file))
+            except FileNotFoundError:
+                pass
+        _update_job(job_id, status="expired", result_file=None)
+    return len(expired)
+
+
+def _progress_reporter(job_id):
+    """Return a callback recording a job's progress (0-1), writing at most every PROGRESS_INTERVAL seconds."""
+    last = {"time": 0.0}
+
+    def report(fraction, message=None):
+        now = time.monotonic()
+        if now - last["time"] >= PROGRESS_INTERVAL:
+            last["time"] = now
+            _update_job(job_id, progress=min(max(fraction, 0.0), 1.0), message=message)
+
+    return report
+
+
+def _run_cone_search(params, path, report):
+    """Write every source within the radius as CSV, without the interactive result cap."""
+    from src.database.query import find_in_cone
+
+    report(0.0, "Searching")
+    results = find_in_cone(params["ra"], params["dec"], params["radius_deg"], limit=None)
+    results.to_csv(path, index=False)
+    return len(results)
+
+
+def _run_inventory(params, path, report):
+    """Write the inventory of each source as one JSON line."""
+    from src.database.sources import get_source_inventory
+
+    sources = params["sources"]
+    with open(path, "w") as f:
+        for position, source in enumerate(sources):
+            inventory = get_source_inventory(source)
+            f.write(json.dumps({"source": source, "inventory": inventory}, default=str) + "\n")
+            report((position + 1) / len(sources), f"{position + 1} of {len(sources)} sources")
+    return len(sources)
+
+
+def _run_export(params, path, report):
+    """Export every table and write the export manifest."""
+    from src.database.export import export_catalog
+
+    report(0.0, "Exporting tables")
+    manifest = export_catalog()
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return sum(table["rows"] for table in manifest["tables"].values())
+
+
+_RUNNERS = {"cone_search": _run_cone_search, "inventory": _run_inventory, "export": _run_export}
+
+
+def _fail_job(job_id, message):
+    """Record a failed job; it is kept for JOB_RESULT_TTL_HOURS so clients can see the error."""
+    now = time.time()
+    _update_job(job_id, status="failed", message=message, finished=now, expires=now + JOB_RESULT_TTL_HOURS * 3600)
+
+
+def run_job(job_id):
+    """
+    Run a claimed job and record its result. Called in a job worker process or the inline job thread.
+
+    Args:
+        job_id (str): Job ID
+    """
+    job = get_job(job_id)
+    _update_job(job_id, pid=os.getpid())
+    extension = JOB_KINDS[job["kind"]][0]
+    result_file = f"{job_id}.{extension}"
+    path = os.path.join(JOB_DIR, RESULTS_DIR, result_file)
+    try:
+        rows = _RUNNERS[job["kind"]](job["params"], f"{path}.tmp", _progress_reporter(job_id))
+        os.replace(f"{path}.tmp", path)
+    except Exception as e:
+        logger.exception(f"Job {job_id} ({job['kind']}) failed")
+        if os.path.exists(f"{path}.tmp"):
+            os.remove(f"{path}.tmp")
+        _fail_job(job_id, str(e))
+        return
+    now = time.time()
+    _update_job(
+        job_id,
+        status="done",
+        progress=1.0,
+        message=None,
+        result_file=result_file,
+        result_rows=rows,
+        finished=now,
+        expires=now + JOB_RESULT_TTL_HOURS * 3600,
+    )
+
+
+def notify_job_runner():
+    """Wake this process's job runner after a job was submitted, instead of waiting for its next poll."""
+    if _wakeup["event"] is not None:
+        _wakeup["event"].set()
+
+
+def _new_pool(workers):
+    """Create the job worker pool; spawned processes do not inherit the server's threads and connections."""
+    if workers == 0:
+        # Inline: one job at a time in a thread of this process, without starting more interpreters
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def run_jobs(workers=JOB_WORKERS, poll_seconds=JOB_POLL_SECONDS):
+    """
+    Claim queued jobs and run them on a process pool, or inline in a thread, until cancelled.
+
+    Args:
+        workers (int): Jobs run at the same time, or 0 to run one at a time in a thread of this process
+        poll_seconds (float): Seconds between checks for queued jobs
+    """
+    wakeup = _wakeup["event"] = asyncio.Event()
+    pool = _new_pool(workers)
+    slots = max(workers, 1)
+    running = {}
+    last_expiry = 0.0
+    try:
+        await run_in_threadpool(recover_jobs)
+        while True:
+            try:
+                while len(running) < slots and (job_id := await run_in_threadpool(claim_next_job)):
+                    running[asyncio.wrap_future(pool.submit(run_job, job_id))] = job_id
+                if time.monotonic() - last_expiry >= EXPIRE_INTERVAL:
+                    await run_in_threadpool(expire_jobs)
+                    last_expiry = time.monotonic()
+            except Exception:
+                logger.exception("Error dispatching jobs")
+
+            wakeup.clear()
+            waiter = asyncio.ensure_future(wakeup.wait())
+            done, _ = await asyncio.wait([*running, waiter], timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+
+            for future in done & running.keys():
+                job_id = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    continue
+                # The worker process died before it could record the failure
+                logger.error(f"Job {job_id} worker failed: {error!r}")
+                await run_in_threadpool(_fail_job, job_id, repr(error))
+                if isinstance(error, BrokenProcessPool):
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = _new_pool(workers)
+    finally:
+        _wakeup["event"] = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_job_stats():
+    """
+    Return the number of jobs in each status.
+
+    Returns:
+        dict: Status -> job count
+    """
+    with get_jobs_engine().connect() as conn:
+        return dict(conn.execute(select(jobs_table.c.status, func.count()).group_by(jobs_table.c.status)).all())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued background jobs.")
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1), help="Jobs run at the same time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_jobs(workers=args.workers))
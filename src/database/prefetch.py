@@ -0,0 +1,223 @@
+"""
+Background spectrum prefetching.
+
+Walks the Spectra table and downloads spectrum files into astropy's download
+cache ahead of the first visitor, starting with the sources ranked highest
+by recent inventory and spectra page views (see src.database.spectrum_cache).
+The first SPECTRUM_CACHE_ENTRIES spectra in that order are also parsed into
+the in-memory spectrum cache, so their spectra pages skip Spectrum.read.
+
+Downloads run PREFETCH_CONCURRENCY at a time and are read in chunks of
+DOWNLOAD_CHUNK_BYTES, each waiting for its share of PREFETCH_BANDWIDTH_KBPS,
+so the prefetcher never bursts more than one chunk above that rate. Files
+that are already cached are skipped, so repeated passes only fetch new or
+evicted spectra.
+
+Run in-process with ASTRO_WEB_PREFETCH_INTERVAL_SECONDS, or as a separate
+worker that fills the shared download cache on disk:
+
+    python -m src.database.prefetch
+    python -m src.database.prefetch --limit 500
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+from astropy.utils.data import conf, import_file_to_cache, is_url_in_cache
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from src.config import (
+    FOREIGN_KEY,
+    PREFETCH_BANDWIDTH_KBPS,
+    PREFETCH_CONCURRENCY,
+    SPECTRA_URL_COLUMN,
+    SPECTRUM_CACHE_ENTRIES,
+)
+from src.database.connection import HEAVY_ROLE, get_database
+from src.database.spectrum_cache import (
+    cache_spectrum,
+    get_access_ranking,
+    is_cached,
+    is_remote,
+    load_access_stats,
+    read_spectrum,
+    save_access_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats = {"passes": 0, "downloaded": 0, "downloaded_bytes": 0, "parsed": 0, "failed": 0, "last_pass": None}
+_bandwidth = {"next": 0.0}
+
+# Bytes read from a download before waiting for the bandwidth budget
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def _count(**increments):
+    """Add to the prefetch counters."""
+    with _lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def get_prefetch_order():
+    """
+    Return the access URLs of the Spectra table in prefetch order.
+
+    Spectra of the most viewed sources come first, followed by the remaining
+    spectra in table order.
+
+    Returns:
+        list: Access URLs without duplicates
+    """
+    db = get_database(HEAVY_ROLE)
+    spectra = db.metadata.tables["Spectra"]
+    with db.engine.connect() as conn:
+        rows = conn.execute(select(spectra.c[FOREIGN_KEY], spectra.c[SPECTRA_URL_COLUMN])).all()
+
+    urls_by_source = {}
+    for source, url in rows:
+        if url:
+            urls_by_source.setdefault(str(source), []).append(url)
+
+    ordered = []
+    for source in get_access_ranking():
+        ordered.extend(urls_by_source.get(source, []))
+    ordered.extend(url for _, url in rows if url)
+    return list(dict.fromkeys(ordered))
+
+
+def _throttle(size):
+    """Block until size more bytes fit in PREFETCH_BANDWIDTH_KBPS, shared by all downloads."""
+    if PREFETCH_BANDWIDTH_KBPS <= 0:
+        return
+    now = time.monotonic()
+    with _lock:
+        _bandwidth["next"] = max(_bandwidth["next"], now) + size / (PREFETCH_BANDWIDTH_KBPS * 1024)
+        delay = _bandwidth["next"] - now
+    time.sleep(delay)
+
+
+def _download(url):
+    """
+    Download a spectrum file into astropy's download cache and return its size in bytes (0 if cached).
+
+    The file is read in DOWNLOAD_CHUNK_BYTES chunks with _throttle() between
+    them, then moved into the cache once complete.
+    """
+    if not is_remote(url) or is_url_in_cache(url):
+        return 0
+    fd, tmp_path = tempfile.mkstemp(suffix=".download")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f, urllib.request.urlopen(url, timeout=conf.remote_timeout) as response:
+            while chunk := response.read(DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+                size += len(chunk)
+                _throttle(len(chunk))
+        import_file_to_cache(url, tmp_path, remove_original=True)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return size
+
+
+def _parse(url):
+    """Parse a spectrum into the in-memory spectrum cache."""
+    cache_spectrum(url, read_spectrum(url))
+
+
+async def _prefetch_one(url, parse):
+    """Download (and optionally parse) one spectrum, recording the outcome."""
+    try:
+        size = await run_in_threadpool(_download, url)
+        if size:
+            _count(downloaded=1, downloaded_bytes=size)
+        if parse and not is_cached(url):
+            await run_in_threadpool(_parse, url)
+            _count(parsed=1)
+    except Exception as e:
+        logger.warning(f"Error prefetching spectrum {url}: {e}")
+        _count(failed=1)
+
+
+async def prefetch_spectra(limit=None, parse=True):
+    """
+    Run one prefetch pass over the Spectra table.
+
+    Args:
+        limit (int): Maximum number of spectra to visit, in prefetch order (default: all)
+        parse (bool): Parse the first SPECTRUM_CACHE_ENTRIES spectra into the in-memory cache;
+                      a separate worker process only fills the download cache
+
+    Returns:
+        dict: Prefetch counters after the pass
+    """
+    urls = await run_in_threadpool(get_prefetch_order)
+    if limit is not None:
+        urls = urls[:limit]
+
+    queue = asyncio.Queue()
+    for position, url in enumerate(urls):
+        queue.put_nowait((url, parse and position < SPECTRUM_CACHE_ENTRIES))
+
+    async def worker():
+        while not queue.empty():
+            url, parse_url = queue.get_nowait()
+            await _prefetch_one(url, parse_url)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, PREFETCH_CONCURRENCY))))
+
+    with _lock:
+        _stats["passes"] += 1
+        _stats["last_pass"] = datetime.now().isoformat()
+    return get_prefetch_stats()
+
+
+async def schedule_prefetch(interval):
+    """
+    Prefetch spectra periodically until cancelled, saving the view statistics after each pass.
+
+    Args:
+        interval (float): Seconds between passes
+    """
+    while True:
+        try:
+            await prefetch_spectra()
+            await run_in_threadpool(save_access_stats)
+        except Exception:
+            logger.exception("Error prefetching spectra")
+        await asyncio.sleep(interval)
+
+
+def get_prefetch_stats():
+    """
+    Return the prefetch counters.
+
+    Returns:
+        dict: Passes, downloaded files and bytes, parsed and failed spectra, and the time of the last pass
+    """
+    with _lock:
+        return dict(_stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download spectrum files into the local cache.")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of spectra to prefetch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_access_stats()
+    stats = asyncio.run(prefetch_spectra(limit=args.limit, parse=False))
+    print(
+        f"Downloaded {stats['downloaded']} files ({stats['downloaded_bytes'] / 1024:.0f} KiB), {stats['failed']} failed"
+    )
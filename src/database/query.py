@@ -6,20 +6,27 @@ with timing and error handling.
 """
 
 import time
-from astrodbkit.astrodb import Database
+import pandas as pd
 from astropy.coordinates import SkyCoord
 from astropy.units import Quantity
+from sqlalchemy import select
+from src.database.catalog_store import cone_rows, get_current_catalog, source_names
+from src.database.columnar import compact_dataframe
+from src.database.coordinates import parse_coordinate
+from src.database.connection import HEAVY_ROLE, get_database
+from src.database.singleflight import single_flight
+from src.database.spatial import count_generic, detect_backend, native_cone_search
 from src.config import (
+    PRIMARY_DATATYPE,
+    PRIMARY_TABLE,
     RA_COLUMN,
     DEC_COLUMN,
-    CONNECTION_STRING,
-    LOOKUP_TABLES,
-    PRIMARY_TABLE,
     SOURCE_COLUMN,
-    SCHEMA,
-    FOREIGN_KEY,
 )
 
+# Maximum number of cone search results
+CONE_SEARCH_LIMIT = 10000
+
 
 def search_objects(query: str):
     """
@@ -30,19 +37,12 @@ def search_objects(query: str):
         db_path (str): Path to the database file
 
     Returns:
-        tuple: (results, execution_time) where results is a list of search results
+        tuple: (results, execution_time) where results is a compact DataFrame of search results
                and execution_time is the time taken in seconds
     """
     start_time = time.time()
-    db = Database(
-        CONNECTION_STRING,
-        primary_table=PRIMARY_TABLE,
-        primary_table_key=SOURCE_COLUMN,
-        lookup_tables=LOOKUP_TABLES,
-        schema=SCHEMA,
-        foreign_key=FOREIGN_KEY,
-    )
-    results = db.search_object(query.strip(), resolve_simbad=True, format="pandas")
+    db = get_database()
+    results = compact_dataframe(db.search_object(query.strip(), resolve_simbad=True, format="pandas"))
     execution_time = time.time() - start_time
 
     return results, execution_time
@@ -52,8 +52,8 @@ def parse_coordinates_string(coords_str):
     """
     Parse a combined coordinate string (RA and Dec) to decimal degrees.
 
-    The coordinate string can contain both RA and Dec in various formats.
-    Uses SkyCoord to handle all parsing.
+    Common decimal and sexagesimal formats are parsed without SkyCoord; see
+    src.database.coordinates, which also provides a batch parser.
 
     Args:
         coords_str (str): Combined coordinate string (e.g., "13h57m12s +14d28m39s" or "209.30 14.48")
@@ -64,39 +64,7 @@ def parse_coordinates_string(coords_str):
     Raises:
         ValueError: If coordinates cannot be parsed
     """
-    coords_str = coords_str.strip()
-
-    # Check if the string contains sexagesimal indicators (h, m, s, d, etc.)
-    has_sexagesimal = any(char in coords_str.lower() for char in ["h", "m", "s", "d", "°", "'", '"'])
-
-    try:
-        if has_sexagesimal:
-            # For sexagesimal format, SkyCoord can auto-detect
-            skycoord = SkyCoord(coords_str, frame="icrs")
-            ra_decimal = skycoord.ra.deg
-            dec_decimal = skycoord.dec.deg
-        else:
-            # For decimal format, split and parse manually
-            parts = coords_str.split()
-            if len(parts) != 2:
-                raise ValueError("Expected two space-separated values for decimal coordinates (e.g., '209.30 14.48')")
-
-            ra_decimal = float(parts[0])
-            dec_decimal = float(parts[1])
-
-        # Validate coordinate ranges
-        if not (0 <= ra_decimal <= 360):
-            raise ValueError(f"RA must be between 0 and 360 degrees, got {ra_decimal}")
-        if not (-90 <= dec_decimal <= 90):
-            raise ValueError(f"Dec must be between -90 and +90 degrees, got {dec_decimal}")
-
-        return ra_decimal, dec_decimal
-
-    except ValueError as e:
-        # Re-raise ValueError to preserve the error message
-        raise e from None
-    except (TypeError, KeyError) as e:
-        raise ValueError(f"Invalid coordinate format: {coords_str}") from e
+    return parse_coordinate(coords_str)
 
 
 def convert_radius_to_degrees(radius_value, radius_unit):
@@ -137,35 +105,76 @@ def convert_radius_to_degrees(radius_value, radius_unit):
     return radius_deg
 
 
+def _catalog_cone_search(db, catalog, ra, dec, radius_deg, limit):
+    """Select the primary table rows of the sources within a radius, found with the catalog arrays."""
+    table = db.metadata.tables[PRIMARY_TABLE]
+    names = source_names(catalog, cone_rows(catalog, ra, dec, radius_deg)[:limit])
+    if not names:
+        return pd.DataFrame(columns=[column.name for column in table.columns])
+    with db.engine.connect() as conn:
+        keys = [PRIMARY_DATATYPE(name) for name in names]
+        result = conn.execute(select(table).where(table.c[SOURCE_COLUMN].in_(keys)))
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def find_in_cone(ra, dec, radius_deg, limit=CONE_SEARCH_LIMIT):
+    """
+    Select the primary table rows within a radius of a position.
+
+    Uses a native PostgreSQL spatial backend when available, then the shared
+    catalog arrays, then astrodbkit's query_region.
+
+    Args:
+        ra (float): Right Ascension in decimal degrees (0-360)
+        dec (float): Declination in decimal degrees (-90 to +90)
+        radius_deg (float): Search radius in degrees
+        limit (int): Maximum number of rows to return, or None for all matches
+
+    Returns:
+        pandas.DataFrame: Matching rows (all columns)
+    """
+    db = get_database(HEAVY_ROLE)
+
+    # Run the radial query in PostgreSQL when a spatial extension is available
+    results = None
+    backend = detect_backend(db.engine)
+    if backend is not None:
+        results = native_cone_search(db, backend, ra, dec, radius_deg, limit)
+    if results is None:
+        # Otherwise compute separations on the shared catalog arrays and fetch only the matches
+        catalog = get_current_catalog()
+        if catalog is not None:
+            results = _catalog_cone_search(db, catalog, ra, dec, radius_deg, limit)
+    if results is None:
+        count_generic()
+        coords = SkyCoord(ra, dec, unit="deg")
+        radius = Quantity(radius_deg, "deg")
+        results = db.query_region(coords, radius=radius, fmt="pandas", ra_col=RA_COLUMN, dec_col=DEC_COLUMN)
+
+    if limit is not None and len(results) > limit:
+        results = results.head(limit)
+    return results
+
+
+@single_flight("cone_search")
 def cone_search(ra, dec, radius_deg):
     """
     Perform a cone search for objects within a specified region of the sky.
 
+    Results are capped at CONE_SEARCH_LIMIT rows; uncapped searches run as
+    background jobs (see src.database.jobs).
+
     Args:
         ra (float): Right Ascension in decimal degrees (0-360)
         dec (float): Declination in decimal degrees (-90 to +90)
         radius_deg (float): Search radius in degrees
 
     Returns:
-        tuple: (results, execution_time) where results is a DataFrame
+        tuple: (results, execution_time) where results is a compact DataFrame
                and execution_time is the time taken in seconds
     """
     start_time = time.time()
-    db = Database(
-        CONNECTION_STRING,
-        primary_table=PRIMARY_TABLE,
-        primary_table_key=SOURCE_COLUMN,
-        lookup_tables=LOOKUP_TABLES,
-        schema=SCHEMA,
-        foreign_key=FOREIGN_KEY,
-    )
-    coords = SkyCoord(ra, dec, unit="deg")
-    radius = Quantity(radius_deg, "deg")
-    results = db.query_region(coords, radius=radius, fmt="pandas", ra_col=RA_COLUMN, dec_col=DEC_COLUMN)
+    results = find_in_cone(ra, dec, radius_deg)
     execution_time = time.time() - start_time
 
-    # Apply 10,000 result cap if needed
-    if len(results) > 10000:
-        results = results.head(10000)
-
-    return results, execution_time
+    return compact_dataframe(results), execution_time
@@ -0,0 +1,268 @@
+"""
+Similar sources by photometry, spectral type and modeled parameters.
+
+Each source is described by a feature vector of its band magnitudes,
+adopted spectral type code and adopted modeled parameters, taken from the
+per-version diagram table (see src.visualizations.diagrams). Every feature
+is standardized to zero mean and unit variance. Sources with fewer than
+SIMILAR_MIN_FEATURES measured features are left out.
+
+Missing values are not imputed: the distance between two sources is taken
+over the features measured for both, scaled by (features / shared
+features) so distances over fewer features are not smaller by
+construction, and neighbours must share at least SIMILAR_MIN_FEATURES
+features with the source. Sources are grouped by which features they have
+measured. Each search visits every feature group sharing enough features
+with the source and queries that group's KD-tree over the shared features
+for its nearest members, so results are exact and the work per search
+grows with the number of groups rather than the number of sources. Group
+trees are built on first use and the SIMILAR_MAX_TREES most recently used
+are kept. The index is rebuilt when the database version changes.
+
+Pages that only show neighbours as an extra panel ask for them without
+waiting: while the index is missing or out of date it is built in a
+background thread and the panel is left out.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from src.config import SIMILAR_MAX_K, SIMILAR_MAX_TREES, SIMILAR_MIN_FEATURES
+from src.database.changes import get_database_version
+from src.database.singleflight import single_flight
+from src.visualizations.diagrams import get_diagram_table
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_current = {"index": None, "building": False}
+_stats = {"built": 0, "queries": 0, "trees": 0, "tree_evictions": 0}
+
+
+def standardize(values):
+    """
+    Standardize feature columns to zero mean and unit variance.
+
+    Args:
+        values (numpy.ndarray): Sources x features, NaN where missing
+
+    Returns:
+        numpy.ndarray: Standardized features, NaN where missing
+    """
+    mean = np.nanmean(values, axis=0)
+    scale = np.nanstd(values, axis=0)
+    scale[~np.isfinite(scale) | (scale == 0)] = 1.0
+    return (values - mean) / scale
+
+
+def scaled_distance(distance, shared, features):
+    """
+    Scale a Euclidean distance over shared features up to the full feature count.
+
+    Args:
+        distance (float or numpy.ndarray): Distance over the shared features
+        shared (int): Number of shared features
+        features (int): Number of features of the index
+
+    Returns:
+        float or numpy.ndarray: distance * sqrt(features / shared)
+    """
+    return distance * np.sqrt(features / shared)
+
+
+@single_flight("similar_index")
+def build_similar_index(version):
+    """
+    Group the standardized feature vectors of a database version by their measured features.
+
+    Args:
+        version (str): Database version of the diagram table
+
+    Returns:
+        dict: "version", "columns", "sources", "rows" (source to row), standardized "features",
+              "observed" (sources x features, True where measured), "patterns" (groups x features),
+              "groups" (row numbers per pattern) and "trees" (LRU of KD-trees built on first use)
+    """
+    table = get_diagram_table()
+    values = table["values"]
+    # Features measured for fewer than two sources have no spread to standardize by
+    columns = np.flatnonzero(np.isfinite(values).sum(axis=0) >= 2) if len(table["columns"]) else np.array([], int)
+    values = values[:, columns]
+    keep = np.isfinite(values).sum(axis=1) >= max(SIMILAR_MIN_FEATURES, 1)
+
+    values = values[keep]
+    observed = np.isfinite(values)
+    patterns, groups = np.unique(observed, axis=0, return_inverse=True)
+    sources = table["sources"][keep]
+    index = {
+        "version": table["version"],
+        "columns": [table["columns"][column] for column in columns],
+        "sources": sources,
+        "rows": {source: row for row, source in enumerate(sources.tolist())},
+        "features": standardize(values) if len(values) else values,
+        "observed": observed,
+        "patterns": patterns,
+        "groups": [np.flatnonzero(groups.ravel() == group) for group in range(len(patterns))],
+        "trees": OrderedDict(),
+    }
+    with _lock:
+        _stats["built"] += 1
+    logger.info(
+        f"Indexed {len(sources)} sources in {len(patterns)} feature groups on {len(columns)} features "
+        "for similar source searches"
+    )
+    return index
+
+
+def _group_tree(index, group, shared):
+    """Return the KD-tree of a group over a set of shared features, building it on first use."""
+    key = (group, shared.tobytes())
+    trees = index["trees"]
+    with _lock:
+        tree = trees.get(key)
+        if tree is not None:
+            trees.move_to_end(key)
+            return tree
+    tree = cKDTree(index["features"][np.ix_(index["groups"][group], shared)])
+    with _lock:
+        if key in trees:
+            trees.move_to_end(key)
+            return trees[key]
+        trees[key] = tree
+        _stats["trees"] += 1
+        while len(trees) > max(SIMILAR_MAX_TREES, 1):
+            trees.popitem(last=False)
+            _stats["tree_evictions"] += 1
+    return tree
+
+
+def _build_in_background():
+    """Build the index of the current database version in a background thread, unless one is already running."""
+    with _lock:
+        if _current["building"]:
+            return
+        _current["building"] = True
+
+    def build():
+        try:
+            get_similar_index()
+        except Exception:
+            logger.exception("Error building the similar source index")
+        finally:
+            with _lock:
+                _current["building"] = False
+
+    threading.Thread(target=build, name="similar-index", daemon=True).start()
+
+
+def get_similar_index(wait=True):
+    """
+    Return the feature index of the current database version, rebuilding it when the version has changed.
+
+    Args:
+        wait (bool): Build a missing or outdated index before returning. If False, start
+                     building it in the background and return None.
+
+    Returns:
+        dict: Index from build_similar_index(), or None while it is being built in the background
+    """
+    version = get_database_version()
+    with _lock:
+        index = _current["index"]
+        if index is not None and index["version"] == version:
+            return index
+    if not wait:
+        _build_in_background()
+        return None
+    index = build_similar_index(version)
+    with _lock:
+        _current["index"] = index
+    return index
+
+
+def similar_sources(source, k=10, wait=True):
+    """
+    Find the sources whose photometry and parameters are nearest to those of a source.
+
+    Args:
+        source (str): Source identifier
+        k (int): Number of neighbours (at most SIMILAR_MAX_K)
+        wait (bool): Build a missing or outdated index first; see get_similar_index()
+
+    Returns:
+        dict: "source", "features" (columns measured for the source) and "neighbours" ({"source", "distance",
+              "measured", "shared"}, nearest first), or None if the source is not indexed or the index is not ready
+
+    Raises:
+        ValueError: If k is not positive
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    index = get_similar_index(wait)
+    if index is None:
+        return None
+    row = index["rows"].get(source)
+    if row is None:
+        return None
+    with _lock:
+        _stats["queries"] += 1
+
+    count = min(k, SIMILAR_MAX_K)
+    measured = index["observed"][row]
+    min_shared = min(max(SIMILAR_MIN_FEATURES, 1), measured.sum())
+    found_distances, found_rows, found_shared = [], [], []
+    for group, pattern in enumerate(index["patterns"]):
+        shared = pattern & measured
+        if shared.sum() < min_shared:
+            continue
+        rows = index["groups"][group]
+        # One extra neighbour in case the source itself is in this group
+        distances, positions = _group_tree(index, group, shared).query(
+            index["features"][row, shared], k=min(count + 1, len(rows))
+        )
+        positions = np.atleast_1d(positions)
+        found_distances.append(scaled_distance(np.atleast_1d(distances), shared.sum(), len(measured)))
+        found_rows.append(rows[positions])
+        found_shared.append(np.full(len(positions), shared.sum()))
+
+    distances, rows, shared = (np.concatenate(found) for found in (found_distances, found_rows, found_shared))
+    others = np.flatnonzero(rows != row)
+    nearest = others[np.argsort(distances[others], kind="stable")[:count]]
+    neighbours = [
+        {
+            "source": str(index["sources"][rows[position]]),
+            "distance": float(distances[position]),
+            "measured": int(index["observed"][rows[position]].sum()),
+            "shared": int(shared[position]),
+        }
+        for position in nearest
+    ]
+    return {
+        "source": source,
+        "features": [index["columns"][column] for column in np.flatnonzero(measured)],
+        "neighbours": neighbours,
+    }
+
+
+def get_similar_stats():
+    """
+    Return the indexed version and how often the index was built and queried.
+
+    Returns:
+        dict: Indexed version, source, feature and group counts, cached group trees, indexes built, queries,
+              and group trees built and evicted
+    """
+    with _lock:
+        index = _current["index"]
+        return {
+            "version": index["version"] if index else None,
+            "sources": len(index["sources"]) if index else 0,
+            "features": len(index["columns"]) if index else 0,
+            "groups": len(index["patterns"]) if index else 0,
+            "cached_trees": len(index["trees"]) if index else 0,
+            **_stats,
+        }
@@ -0,0 +1,94 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When several requests ask for the same source inventory, spectra or cone
+search at the same moment, only the first call runs; the others wait for it
+and receive the same result (or exception). Results are shared and must be
+treated as read-only by callers.
+
+The leader runs with its own caller's time budget. If that budget expires or
+is cancelled (for example because the leader's client disconnected), its
+outcome is not shared: the waiting callers retry, one of them becoming the
+new leader, while each waiting caller remains bound by its own budget.
+"""
+
+import functools
+import threading
+
+from src.database.timeouts import QueryInterrupted, check_budget, is_interrupted
+
+# Seconds between budget checks of callers waiting for a leader
+WAIT_POLL_SECONDS = 0.1
+
+_lock = threading.Lock()
+_in_flight = {}
+_stats = {}
+
+
+def single_flight(name):
+    """
+    Decorator coalescing concurrent calls with identical arguments.
+
+    Args:
+        name (str): Name used for the call key and the counters
+
+    Returns:
+        callable: Decorator for a thread-safe function with hashable arguments
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            while True:
+                with _lock:
+                    counters = _stats.setdefault(name, {"executed": 0, "coalesced": 0, "retried": 0})
+                    call = _in_flight.get(key)
+                    is_leader = call is None
+                    if is_leader:
+                        call = {"done": threading.Event(), "result": None, "error": None, "interrupted": False}
+                        _in_flight[key] = call
+                    else:
+                        counters["coalesced"] += 1
+
+                if is_leader:
+                    break
+                while not call["done"].wait(WAIT_POLL_SECONDS):
+                    check_budget()
+                if call["interrupted"]:
+                    # The leader's budget ran out; its error (or swallowed result) says nothing about ours
+                    with _lock:
+                        counters["retried"] += 1
+                    continue
+                if call["error"] is not None:
+                    raise call["error"]
+                return call["result"]
+
+            try:
+                call["result"] = function(*args, **kwargs)
+                return call["result"]
+            except Exception as e:
+                call["error"] = e
+                raise
+            finally:
+                call["interrupted"] = isinstance(call["error"], QueryInterrupted) or is_interrupted()
+                with _lock:
+                    del _in_flight[key]
+                    counters["executed"] += 1
+                call["done"].set()
+
+        return wrapper
+
+    return decorator
+
+
+def get_single_flight_stats():
+    """
+    Return executed and coalesced call counts per function.
+
+    Returns:
+        dict: Function name -> {"executed": int, "coalesced": int, "retried": int, "in_flight": int}
+    """
+    with _lock:
+        in_flight = [key[0] for key in _in_flight]
+        return {name: {**counters, "in_flight": in_flight.count(name)} for name, counters in _stats.items()}
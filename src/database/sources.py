@@ -1,44 +1,74 @@
 """Sources table database queries."""
 
 import logging
-from astrodbkit.astrodb import Database
-from specutils import Spectrum
+
+from sqlalchemy import cast, func, select, String
+
+from src.database.catalog_store import search_names
+from src.database.columnar import compact_dataframe
+from src.database.connection import HEAVY_ROLE, get_database
+from src.database.singleflight import single_flight
+from src.database.spectrum_cache import get_spectrum
+from src.database.timeouts import check_budget
 
 from src.config import (
-    CONNECTION_STRING,
     SPECTRA_URL_COLUMN,
     LOOKUP_TABLES,
     PRIMARY_TABLE,
-    SOURCE_COLUMN,
-    SCHEMA,
-    FOREIGN_KEY,
     PRIMARY_DATATYPE,
+    SOURCE_COLUMN,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def get_all_sources():
     """
     Retrieve all Sources records from database.
 
     Returns:
-        list: List of dictionaries representing all Sources rows, or None on error
+        pandas.DataFrame: Compact DataFrame of all Sources rows (see compact_dataframe), or None on error
     """
     try:
-        db = Database(
-            CONNECTION_STRING,
-            primary_table=PRIMARY_TABLE,
-            primary_table_key=SOURCE_COLUMN,
-            lookup_tables=LOOKUP_TABLES,
-            schema=SCHEMA,
-            foreign_key=FOREIGN_KEY,
-        )
+        db = get_database(HEAVY_ROLE)
         df = db.query(db.metadata.tables[PRIMARY_TABLE]).pandas()
-        return df.to_dict("records")
-    except Exception as e:
-        logging.error(f"Error getting all sources: {e}")
+        return compact_dataframe(df)
+    except Exception:
+        logger.exception("Error getting all sources")
         return None
 
 
+def autocomplete_source_names(prefix, limit=10):
+    """
+    Return source names starting with a prefix, ignoring case.
+
+    Uses the shared catalog arrays when they exist, and the Sources table otherwise.
+
+    Args:
+        prefix (str): Beginning of a source name
+        limit (int): Maximum number of names to return
+
+    Returns:
+        list: Matching source names
+    """
+    names = search_names(prefix, limit)
+    if names is not None:
+        return names
+
+    db = get_database()
+    name_column = cast(db.metadata.tables[PRIMARY_TABLE].c[SOURCE_COLUMN], String)
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    query = (
+        select(name_column)
+        .where(func.lower(name_column).like(f"{escaped.lower()}%", escape="\\"))
+        .order_by(func.lower(name_column))
+        .limit(limit)
+    )
+    with db.engine.connect() as conn:
+        return list(conn.execute(query).scalars())
+
+
+@single_flight("get_source_inventory")
 def get_source_inventory(source_name):
     """
     Retrieve all data for a specific source using inventory method.
@@ -52,16 +82,9 @@ def get_source_inventory(source_name):
     """
     try:
         print(LOOKUP_TABLES)
-        
+
         # Connect to database
-        db = Database(
-            CONNECTION_STRING,
-            primary_table=PRIMARY_TABLE,
-            primary_table_key=SOURCE_COLUMN,
-            lookup_tables=LOOKUP_TABLES,
-            schema=SCHEMA,
-            foreign_key=FOREIGN_KEY,
-        )
+        db = get_database()
 
         # Get inventory (returns dict of table name -> list of dicts)
         source_name = PRIMARY_DATATYPE(source_name)
@@ -74,17 +97,20 @@ def get_source_inventory(source_name):
                 result[table_name] = table_data
 
         return result if result else None
-    except Exception as e:
-        logging.error(f"Error getting inventory for source {source_name}: {e}")
+    except Exception:
+        logger.exception(f"Error getting inventory for source {source_name}")
         return None
 
 
+@single_flight("get_source_spectra")
 def get_source_spectra(source_name, convert_to_spectrum=False):
     """
     Retrieve all spectra for a specific source using db.query() with manual specutils conversion.
 
     Args:
         source_name (str): Source identifier
+        convert_to_spectrum (bool): Read each spectrum file into a "processed_spectrum" column.
+                                    When False only the Spectra table rows are returned.
 
     Returns:
         pandas.DataFrame: DataFrame with spectrum records including wavelength and flux arrays,
@@ -93,14 +119,7 @@ def get_source_spectra(source_name, convert_to_spectrum=False):
     """
 
     # Connect to database
-    db = Database(
-        CONNECTION_STRING,
-        primary_table=PRIMARY_TABLE,
-        primary_table_key=SOURCE_COLUMN,
-        lookup_tables=LOOKUP_TABLES,
-        schema=SCHEMA,
-        foreign_key=FOREIGN_KEY,
-    )
+    db = get_database()
 
     try:
         # Query spectra table for the source using astrodbkit's pandas method
@@ -112,15 +131,20 @@ def get_source_spectra(source_name, convert_to_spectrum=False):
     if spectra_df.empty:
         return None
 
+    if not convert_to_spectrum:
+        return spectra_df
+
     spectra_df["processed_spectrum"] = None
 
     # Convert spectra URLs to spectra objects
     for index, row in spectra_df.iterrows():
+        # Stop downloading when the request has timed out or the client has gone
+        check_budget()
         try:
-            spectrum = Spectrum.read(row[SPECTRA_URL_COLUMN], cache=True)
+            spectrum = get_spectrum(row[SPECTRA_URL_COLUMN])
             spectra_df.at[index, "processed_spectrum"] = spectrum
-        except Exception as e:
-            logging.error(f"Error converting spectrum {row[SPECTRA_URL_COLUMN]} to Spectrum object: {e}")
+        except Exception:
+            logger.exception(f"Error converting spectrum {row[SPECTRA_URL_COLUMN]} to Spectrum object")
             continue
 
     return spectra_df
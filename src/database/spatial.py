@@ -0,0 +1,268 @@
+"""
+Native cone searches on PostgreSQL.
+
+astrodbkit's query_region loads every row of the primary table and computes
+separations in Python. On PostgreSQL with a spherical indexing extension the
+radial query runs in the database instead:
+
+- q3c: `q3c_radial_query(ra, dec, ...)` with a B-tree index on `q3c_ang2ipix(ra, dec)`
+- pg_sphere: `spoint <@ scircle` with a GiST index on the position
+- PostGIS: `ST_DWithin` on a spherical geography with a GiST index on the position
+
+The extension is detected per database (the primary and each read replica)
+from `pg_extension`, preferring them in the order above, or chosen with
+ASTRO_WEB_SPATIAL_BACKEND. Other databases, databases without an extension
+and failed native queries use the generic query_region path. A database
+whose native query is rejected (for example because the extension was
+dropped) uses the generic path until its backend is detected again after
+BACKEND_RETRY_SECONDS; other failures, such as a dropped connection, only
+affect the query that failed.
+
+Show the detected backend, or create the spatial index on RA_COLUMN/DEC_COLUMN
+of the primary table, with:
+
+    python -m src.database.spatial
+    python -m src.database.spatial --create-index [--backend q3c]
+"""
+
+import argparse
+import logging
+import math
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import column, func, literal_column, select, text
+from sqlalchemy.exc import ProgrammingError
+
+from src.config import DEC_COLUMN, PRIMARY_TABLE, RA_COLUMN, SPATIAL_BACKEND
+from src.database.timeouts import check_budget
+
+logger = logging.getLogger(__name__)
+
+# Extensions in order of preference
+BACKENDS = ("q3c", "pg_sphere", "postgis")
+
+# Sphere radius in meters used by PostGIS for geography distances without the spheroid
+POSTGIS_SPHERE_RADIUS = 6371008.7714150598
+
+# Seconds before the backend of a database whose native query was rejected is detected again
+BACKEND_RETRY_SECONDS = 300
+
+_lock = threading.Lock()
+_backends = {}
+_disabled = {}
+_stats = {"native": 0, "generic": 0, "failures": 0}
+
+
+def _installed_extensions(conn):
+    """Return the names of the extensions installed in a PostgreSQL database."""
+    return set(conn.execute(text("SELECT extname FROM pg_extension")).scalars())
+
+
+def detect_backend(engine):
+    """
+    Return the spatial backend to use for a database, detecting it on first use.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Database engine
+
+    Returns:
+        str: "q3c", "pg_sphere" or "postgis", or None for the generic path
+    """
+    if engine.dialect.name != "postgresql" or SPATIAL_BACKEND == "none":
+        return None
+
+    key = str(engine.url)
+    with _lock:
+        disabled_at = _disabled.get(key)
+        if disabled_at is not None and time.monotonic() - disabled_at >= BACKEND_RETRY_SECONDS:
+            del _disabled[key]
+            del _backends[key]
+        if key in _backends:
+            return _backends[key]
+
+    with engine.connect() as conn:
+        installed = _installed_extensions(conn)
+    candidates = BACKENDS if SPATIAL_BACKEND == "auto" else (SPATIAL_BACKEND,)
+    backend = next((name for name in candidates if name in installed), None)
+    logger.info(f"Spatial backend for {key}: {backend or 'generic'}")
+
+    with _lock:
+        _backends[key] = backend
+    return backend
+
+
+def _disable_backend(engine, error):
+    """Use the generic path for a database after its native query was rejected, until it is detected again."""
+    key = str(engine.url)
+    with _lock:
+        _backends[key] = None
+        _disabled[key] = time.monotonic()
+    logger.error(
+        f"Native cone search rejected by {key}, using the generic path for {BACKEND_RETRY_SECONDS} seconds: {error}"
+    )
+
+
+def position_expression(backend, ra, dec):
+    """
+    Return the indexed position expression of a backend.
+
+    The same expression is used by the index and the radial query, so the
+    query planner can use the index. Constants are rendered inline for that reason.
+
+    Args:
+        backend (str): "q3c", "pg_sphere" or "postgis"
+        ra (sqlalchemy.sql.ColumnElement): RA column in degrees
+        dec (sqlalchemy.sql.ColumnElement): Dec column in degrees
+
+    Returns:
+        sqlalchemy.sql.ColumnElement: Indexed expression
+    """
+    if backend == "q3c":
+        return func.q3c_ang2ipix(ra, dec)
+    if backend == "pg_sphere":
+        return func.spoint(func.radians(ra), func.radians(dec))
+    if backend == "postgis":
+        # Geography longitudes must be within [-180, 180]; shifting RA keeps separations unchanged
+        point = func.ST_MakePoint(ra - literal_column("180"), dec)
+        return func.geography(func.ST_SetSRID(point, literal_column("4326")))
+    raise ValueError(f"Unknown spatial backend: {backend}")
+
+
+def radial_condition(backend, table, ra, dec, radius_deg):
+    """
+    Return the SQL condition selecting rows within a radius of a position.
+
+    Args:
+        backend (str): "q3c", "pg_sphere" or "postgis"
+        table (sqlalchemy.Table): Table with RA_COLUMN and DEC_COLUMN in degrees
+        ra (float): Right Ascension of the center in degrees
+        dec (float): Declination of the center in degrees
+        radius_deg (float): Radius in degrees
+
+    Returns:
+        sqlalchemy.sql.ColumnElement: Boolean condition
+    """
+    ra_column, dec_column = table.c[RA_COLUMN], table.c[DEC_COLUMN]
+    if backend == "q3c":
+        return func.q3c_radial_query(ra_column, dec_column, ra, dec, radius_deg)
+    if backend == "pg_sphere":
+        center = func.spoint(func.radians(ra), func.radians(dec))
+        position = position_expression(backend, ra_column, dec_column)
+        return position.op("<@")(func.scircle(center, func.radians(radius_deg)))
+    if backend == "postgis":
+        center = func.geography(func.ST_SetSRID(func.ST_MakePoint(ra - 180, dec), 4326))
+        meters = math.radians(radius_deg) * POSTGIS_SPHERE_RADIUS
+        return func.ST_DWithin(position_expression(backend, ra_column, dec_column), center, meters, False)
+    raise ValueError(f"Unknown spatial backend: {backend}")
+
+
+def native_cone_search(db, backend, ra, dec, radius_deg, limit):
+    """
+    Run a cone search on the primary table in the database.
+
+    Args:
+        db (astrodbkit.astrodb.Database): Database to query
+        backend (str): Spatial backend from detect_backend()
+        ra (float): Right Ascension in decimal degrees
+        dec (float): Declination in decimal degrees
+        radius_deg (float): Search radius in degrees
+        limit (int): Maximum number of rows to return, or None for all matches
+
+    Returns:
+        pandas.DataFrame: Matching rows of the primary table (all columns), or None if the
+                          native query failed and the generic path should be used
+    """
+    table = db.metadata.tables[PRIMARY_TABLE]
+    query = select(table).where(radial_condition(backend, table, ra, dec, radius_deg)).limit(limit)
+    try:
+        with db.engine.connect() as conn:
+            result = conn.execute(query)
+            results = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    except Exception as e:
+        # Statements stopped by the time limit are not a reason to give up on the extension
+        check_budget()
+        with _lock:
+            _stats["failures"] += 1
+        if isinstance(e, ProgrammingError):
+            # Missing function, operator or extension
+            _disable_backend(db.engine, e)
+        else:
+            logger.warning(f"Native cone search failed on {db.engine.url}, using the generic path once: {e}")
+        return None
+    with _lock:
+        _stats["native"] += 1
+    return results
+
+
+def count_generic():
+    """Count a cone search that used the generic path."""
+    with _lock:
+        _stats["generic"] += 1
+
+
+def get_spatial_stats():
+    """
+    Return the detected backends and how many cone searches ran natively.
+
+    Returns:
+        dict: {"backends": {database: backend}, "native": int, "generic": int, "failures": int}
+    """
+    with _lock:
+        return {"backends": dict(_backends), **_stats}
+
+
+def create_spatial_index(db, backend):
+    """
+    Create the spatial index of a backend on the primary table, if it does not exist.
+
+    Args:
+        db (astrodbkit.astrodb.Database): Database opened on the primary
+        backend (str): "q3c", "pg_sphere" or "postgis"
+
+    Returns:
+        str: Index name
+    """
+    table = db.metadata.tables[PRIMARY_TABLE]
+    name = f"{PRIMARY_TABLE.lower()}_{backend}_position_idx"
+    using = "" if backend == "q3c" else "USING gist "
+    with db.engine.begin() as conn:
+        preparer = conn.dialect.identifier_preparer
+        expression = position_expression(backend, column(RA_COLUMN), column(DEC_COLUMN)).compile(
+            dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+        )
+        conn.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS {preparer.quote(name)} "
+                f"ON {preparer.format_table(table)} {using}(({expression}))"
+            )
+        )
+        conn.execute(text(f"ANALYZE {preparer.format_table(table)}"))
+    return name
+
+
+if __name__ == "__main__":
+    from src.database.connection import PRIMARY_ROLE, get_database
+
+    parser = argparse.ArgumentParser(description="Show or set up native cone searches on PostgreSQL.")
+    parser.add_argument("--create-index", action="store_true", help="Create the spatial index on the primary table")
+    parser.add_argument("--backend", choices=BACKENDS, help="Extension to index for (default: the detected one)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = get_database(PRIMARY_ROLE)
+    if db.engine.dialect.name != "postgresql":
+        raise SystemExit(f"Native cone searches need PostgreSQL, not {db.engine.dialect.name}")
+    backend = args.backend or detect_backend(db.engine)
+    with db.engine.connect() as conn:
+        installed = _installed_extensions(conn)
+    print(f"Installed spatial extensions: {', '.join(sorted(installed & set(BACKENDS))) or 'none'}")
+    print(f"Spatial backend: {backend or 'none (generic path)'}")
+
+    if args.create_index:
+        if backend is None:
+            raise SystemExit(f"Install one of the extensions first, e.g. CREATE EXTENSION {BACKENDS[0]}")
+        if backend not in installed:
+            raise SystemExit(f"The {backend} extension is not installed: CREATE EXTENSION {backend}")
+        print(f"Created index {create_spatial_index(db, backend)} on {PRIMARY_TABLE}")
@@ -0,0 +1,269 @@
+"""
+Parsed spectrum cache and spectrum access statistics.
+
+Spectrum files are downloaded into astropy's download cache on disk, and the
+parsed specutils Spectrum objects are kept in an in-memory LRU keyed by
+access URL. The spectra page reads through both caches. The prefetch
+scheduler (src.database.prefetch) fills them ahead of time, starting with
+the sources ranked highest by the view statistics recorded here.
+
+Cached spectra are shared between requests and must be treated as read-only.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from astropy.utils.data import is_url_in_cache
+from specutils import Spectrum
+
+from src.config import PREFETCH_HALF_LIFE_HOURS, SPECTRUM_ACCESS_PATH, SPECTRUM_CACHE_ENTRIES
+from src.database.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# URL schemes downloaded into astropy's download cache
+REMOTE_SCHEMES = ("http", "https", "ftp", "file")
+
+_lock = threading.Lock()
+_spectra = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "file_hits": 0, "file_misses": 0, "evictions": 0}
+_access = {}
+
+# Sources whose view scores are kept; the lowest scored tenth is dropped when the limit is exceeded
+ACCESS_MAX_SOURCES = 10_000
+
+
+def is_remote(url):
+    """Return True for URLs fetched through astropy's download cache (rather than local paths)."""
+    return urlparse(url).scheme in REMOTE_SCHEMES
+
+
+def read_spectrum(url):
+    """
+    Read a spectrum file with specutils, bypassing the parsed spectrum cache.
+
+    Remote files are kept in astropy's download cache, so repeated reads of the
+    same URL do not download it again.
+
+    Args:
+        url (str): Access URL or local path of the spectrum file
+
+    Returns:
+        specutils.Spectrum: Spectrum object
+    """
+    return Spectrum.read(url, cache=True)
+
+
+def cache_spectrum(url, spectrum):
+    """
+    Store a parsed spectrum, evicting the least recently used ones beyond SPECTRUM_CACHE_ENTRIES.
+
+    Args:
+        url (str): Access URL of the spectrum
+        spectrum (specutils.Spectrum): Parsed spectrum
+    """
+    if SPECTRUM_CACHE_ENTRIES <= 0:
+        return
+    with _lock:
+        _spectra[url] = spectrum
+        _spectra.move_to_end(url)
+        while len(_spectra) > SPECTRUM_CACHE_ENTRIES:
+            _spectra.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def is_cached(url):
+    """Return True if a parsed spectrum is in the cache, without counting a hit."""
+    with _lock:
+        return url in _spectra
+
+
+@single_flight("read_spectrum")
+def _load_spectrum(url):
+    """Read and cache a spectrum, counting whether its file was already in the download cache."""
+    if is_remote(url):
+        in_cache = is_url_in_cache(url)
+        with _lock:
+            _stats["file_hits" if in_cache else "file_misses"] += 1
+    spectrum = read_spectrum(url)
+    cache_spectrum(url, spectrum)
+    return spectrum
+
+
+def get_spectrum(url):
+    """
+    Return a parsed spectrum from the cache, reading and caching it on a miss.
+
+    Args:
+        url (str): Access URL or local path of the spectrum file
+
+    Returns:
+        specutils.Spectrum: Spectrum object (shared, read-only)
+    """
+    with _lock:
+        spectrum = _spectra.get(url)
+        if spectrum is not None:
+            _spectra.move_to_end(url)
+            _stats["hits"] += 1
+            return spectrum
+        _stats["misses"] += 1
+    return _load_spectrum(url)
+
+
+def _decayed(entry, now):
+    """Return the view score of an entry decayed to now by PREFETCH_HALF_LIFE_HOURS."""
+    half_life = PREFETCH_HALF_LIFE_HOURS * 3600
+    if half_life <= 0:
+        return entry["score"]
+    return entry["score"] * 0.5 ** (max(now - entry["last"], 0.0) / half_life)
+
+
+def _prune(now, keep=None):
+    """Drop the lowest scored entries once more than ACCESS_MAX_SOURCES are tracked. Call with _lock held."""
+    if len(_access) <= ACCESS_MAX_SOURCES:
+        return
+    ranked = sorted((source for source in _access if source != keep), key=lambda source: _decayed(_access[source], now))
+    for source in ranked[: len(_access) - ACCESS_MAX_SOURCES * 9 // 10]:
+        del _access[source]
+
+
+def register_source(source_name):
+    """
+    Start tracking views of a source, once its inventory or spectra were found.
+
+    Only registered sources are counted by record_access(), so requests for
+    unknown names do not grow the statistics.
+
+    Args:
+        source_name (str): Source identifier
+    """
+    now = time.time()
+    with _lock:
+        if str(source_name) not in _access:
+            _access[str(source_name)] = {"score": 0.0, "last": now}
+            _prune(now, keep=str(source_name))
+
+
+def record_access(source_name):
+    """
+    Count a view of a registered source's inventory or spectra page for prefetch ranking.
+
+    The score decays by PREFETCH_HALF_LIFE_HOURS and each view adds one, so
+    a fresh view does not restore the weight of old ones.
+
+    Args:
+        source_name (str): Source identifier
+    """
+    now = time.time()
+    with _lock:
+        entry = _access.get(str(source_name))
+        if entry is not None:
+            entry["score"] = _decayed(entry, now) + 1
+            entry["last"] = now
+
+
+def get_access_ranking():
+    """
+    Rank viewed sources by view score, with views decaying by PREFETCH_HALF_LIFE_HOURS.
+
+    Returns:
+        list: Source identifiers (as strings), most important first
+    """
+    now = time.time()
+    with _lock:
+        scores = {source: _decayed(entry, now) for source, entry in _access.items() if entry["score"] > 0}
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _read_access_stats(path):
+    """Return the view statistics saved at path, or an empty dict if missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Error reading spectrum access statistics: {e}")
+        return {}
+
+
+def _merge_access_stats(saved, now):
+    """Merge saved entries into _access, keeping the higher decayed score of each source. Call with _lock held."""
+    for source, saved_entry in saved.items():
+        # Files written before scores were kept have view counts instead
+        entry = {
+            "score": float(saved_entry.get("score", saved_entry.get("count", 0))),
+            "last": saved_entry.get("last", 0.0),
+        }
+        current = _access.get(source)
+        if current is None or _decayed(entry, now) > _decayed(current, now):
+            _access[source] = entry
+    _prune(now)
+
+
+def load_access_stats(path=SPECTRUM_ACCESS_PATH):
+    """
+    Merge saved view statistics into the in-memory statistics.
+
+    Args:
+        path (str): JSON file written by save_access_stats()
+    """
+    saved = _read_access_stats(path)
+    with _lock:
+        _merge_access_stats(saved, time.time())
+
+
+def save_access_stats(path=SPECTRUM_ACCESS_PATH):
+    """
+    Merge the view statistics into the saved file, so restarts and the prefetch worker command can use them.
+
+    Every worker saves its own statistics, so the file is read and written
+    under an exclusive lock across processes and entries saved by other
+    workers are merged in (see load_access_stats()) rather than overwritten.
+    The merged statistics are also kept in memory.
+
+    Args:
+        path (str): JSON file to write
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            saved = _read_access_stats(path)
+            with _lock:
+                _merge_access_stats(saved, time.time())
+                data = {source: dict(entry) for source, entry in _access.items()}
+            with open(f"{path}.tmp-{os.getpid()}", "w") as f:
+                json.dump(data, f)
+            os.replace(f"{path}.tmp-{os.getpid()}", path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _ratio(hits, misses):
+    """Return hits / (hits + misses), or None before the first lookup."""
+    return hits / (hits + misses) if hits + misses else None
+
+
+def get_spectrum_cache_stats():
+    """
+    Return hit counters of the parsed spectrum cache and the download cache.
+
+    Returns:
+        dict: Entry counts, hits, misses and hit ratios
+    """
+    with _lock:
+        return {
+            "entries": len(_spectra),
+            "max_entries": SPECTRUM_CACHE_ENTRIES,
+            **_stats,
+            "hit_ratio": _ratio(_stats["hits"], _stats["misses"]),
+            "file_hit_ratio": _ratio(_stats["file_hits"], _stats["file_misses"]),
+            "tracked_sources": len(_access),
+        }
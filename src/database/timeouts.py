@@ -0,0 +1,270 @@
+"""
+Query time limits and cancellation.
+
+Each data call made by an endpoint runs with a time budget from
+ASTRO_WEB_QUERY_TIMEOUTS. The budget is pushed to the database:
+
+- SQLite: a progress handler interrupts the running statement once the
+  budget has expired or been cancelled
+- PostgreSQL: `SET LOCAL statement_timeout` is issued when a connection is
+  checked out, and running statements are cancelled through the driver
+
+While the call runs, run_with_timeout() watches the client connection and
+cancels the budget when the client disconnects, so closing a tab during a
+big cone search or spectra download frees the worker and the connection.
+Work that does not touch the database (such as downloading spectra) checks
+the budget between steps with check_budget().
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import QUERY_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for an expired budget or a disconnected client
+POLL_SECONDS = 0.25
+
+# SQLite virtual machine instructions between progress handler calls
+SQLITE_PROGRESS_STEPS = 10_000
+
+_budget = contextvars.ContextVar("query_budget", default=None)
+
+# Background renders (e.g. page cache revalidation) must not be cancelled when the original client leaves
+watch_disconnect = contextvars.ContextVar("watch_disconnect", default=True)
+
+_lock = threading.Lock()
+_stats = {"timeouts": {}, "cancelled": {}}
+
+
+class QueryInterrupted(Exception):
+    """Base class for data calls stopped before they finished."""
+
+    status_code = 503
+
+    def __init__(self, name, message, seconds=None):
+        super().__init__(message)
+        self.name = name
+        self.message = message
+        self.seconds = seconds
+
+
+class QueryTimeout(QueryInterrupted):
+    """The data call exceeded its time budget."""
+
+    status_code = 504
+
+
+class QueryCancelled(QueryInterrupted):
+    """The data call was cancelled, for example because the client disconnected."""
+
+    status_code = 503
+
+
+def _new_budget(name, seconds):
+    """Create the state shared between the request and the worker thread running a data call."""
+    return {
+        "name": name,
+        "seconds": seconds,
+        "deadline": time.monotonic() + seconds if seconds > 0 else None,
+        "cancelled": None,
+        "connections": set(),
+    }
+
+
+def _interrupt_reason(budget):
+    """Return "timeout" or "cancelled" when a budget should stop, otherwise None."""
+    if budget["cancelled"] is not None:
+        return budget["cancelled"]
+    if budget["deadline"] is not None and time.monotonic() >= budget["deadline"]:
+        return "timeout"
+    return None
+
+
+def _error(budget, reason):
+    """Build the exception for an interrupted budget."""
+    if reason == "timeout":
+        message = f"Query exceeded the {budget['seconds']:g} second time limit"
+        return QueryTimeout(budget["name"], message, budget["seconds"])
+    return QueryCancelled(budget["name"], "Query was cancelled because the client disconnected")
+
+
+def check_budget():
+    """
+    Raise if the time budget of the current data call has expired or been cancelled.
+
+    Raises:
+        QueryTimeout: The time budget has expired
+        QueryCancelled: The call was cancelled
+    """
+    budget = _budget.get()
+    if budget is not None:
+        reason = _interrupt_reason(budget)
+        if reason is not None:
+            raise _error(budget, reason)
+
+
+def is_interrupted():
+    """
+    Return True if the time budget of the current data call has expired or been cancelled.
+
+    Returns:
+        bool: False when there is no budget or it is still running
+    """
+    budget = _budget.get()
+    return budget is not None and _interrupt_reason(budget) is not None
+
+
+def _count(budget, reason):
+    """Count an interrupted data call in the metrics."""
+    with _lock:
+        counters = _stats["timeouts" if reason == "timeout" else "cancelled"]
+        counters[budget["name"]] = counters.get(budget["name"], 0) + 1
+
+
+def _cancel(budget, reason):
+    """Cancel a budget and abort the statements running on its connections."""
+    budget["cancelled"] = reason
+    _count(budget, reason)
+    with _lock:
+        connections = list(budget["connections"])
+
+    # SQLite statements are stopped by the progress handler; PostgreSQL needs a cancel request
+    for dbapi_connection in connections:
+        cancel = getattr(dbapi_connection, "cancel_safe", None) or getattr(dbapi_connection, "cancel", None)
+        if cancel is not None:
+            try:
+                cancel()
+            except Exception as e:
+                logger.warning(f"Could not cancel query for {budget['name']}: {e}")
+
+
+@event.listens_for(Engine, "connect")
+def _install_progress_handler(dbapi_connection, connection_record):
+    """Let SQLite statements be interrupted by the budget of the thread running them."""
+    if not hasattr(dbapi_connection, "set_progress_handler"):
+        return
+
+    def progress_handler():
+        budget = _budget.get()
+        return 0 if budget is None or _interrupt_reason(budget) is None else 1
+
+    dbapi_connection.set_progress_handler(progress_handler, SQLITE_PROGRESS_STEPS)
+
+
+def _is_postgres(dbapi_connection):
+    """Return True for connections of the PostgreSQL drivers."""
+    return type(dbapi_connection).__module__.split(".")[0] in ("psycopg", "psycopg2")
+
+
+@event.listens_for(Engine, "checkout")
+def _apply_budget(dbapi_connection, connection_record, connection_proxy):
+    """Register a checked-out connection with the current budget and push the time limit to PostgreSQL."""
+    budget = _budget.get()
+    if budget is None:
+        return
+    with _lock:
+        budget["connections"].add(dbapi_connection)
+    connection_record.info["query_budget"] = budget
+
+    if budget["deadline"] is not None and _is_postgres(dbapi_connection):
+        remaining_ms = max(1, int((budget["deadline"] - time.monotonic()) * 1000))
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"SET LOCAL statement_timeout = {remaining_ms}")
+        finally:
+            cursor.close()
+
+
+@event.listens_for(Engine, "checkin")
+def _release_budget(dbapi_connection, connection_record):
+    """Unregister a connection returned to the pool."""
+    budget = connection_record.info.pop("query_budget", None)
+    if budget is not None:
+        with _lock:
+            budget["connections"].discard(dbapi_connection)
+
+
+def _consume_result(task):
+    """Retrieve the outcome of an abandoned call so its exception is not reported as unhandled."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.info(f"Abandoned query finished with: {task.exception()}")
+
+
+async def run_with_timeout(name, request, function, *args, **kwargs):
+    """
+    Run a blocking data call in the thread pool with the time budget of an endpoint.
+
+    Args:
+        name (str): Key of ASTRO_WEB_QUERY_TIMEOUTS, e.g. "cone"
+        request (Request): Incoming request watched for client disconnects, or None
+        function (callable): Blocking function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        Return value of the function
+
+    Raises:
+        QueryTimeout: The call exceeded its time budget
+        QueryCancelled: The client disconnected before the call finished
+    """
+    budget = _new_budget(name, QUERY_TIMEOUTS.get(name, 0))
+    token = _budget.set(budget)
+    try:
+        task = asyncio.ensure_future(run_in_threadpool(function, *args, **kwargs))
+    finally:
+        _budget.reset(token)
+
+    watch = request is not None and watch_disconnect.get()
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=POLL_SECONDS)
+        if done:
+            break
+        reason = _interrupt_reason(budget)
+        if reason is None and watch and await request.is_disconnected():
+            reason = "cancelled"
+        if reason is not None:
+            await run_in_threadpool(_cancel, budget, reason)
+            task.add_done_callback(_consume_result)
+            raise _error(budget, reason)
+
+    try:
+        result = task.result()
+    except Exception as e:
+        # Statements interrupted by the database surface as driver errors
+        reason = _interrupt_reason(budget)
+        if reason is None:
+            raise
+        _count(budget, reason)
+        raise _error(budget, reason) from e
+
+    # Some data calls log and swallow errors, so check whether the budget ran out
+    reason = _interrupt_reason(budget)
+    if reason is not None:
+        _count(budget, reason)
+        raise _error(budget, reason)
+    return result
+
+
+def get_timeout_stats():
+    """
+    Return the number of timed out and cancelled data calls per endpoint.
+
+    Returns:
+        dict: {"timeouts": {name: int}, "cancelled": {name: int}, "limits": {name: seconds}}
+    """
+    with _lock:
+        return {
+            "timeouts": dict(_stats["timeouts"]),
+            "cancelled": dict(_stats["cancelled"]),
+            "limits": dict(QUERY_TIMEOUTS),
+        }
@@ -4,27 +4,105 @@ Main FastAPI application entry point for Hello World website.
 This module initializes the FastAPI app with basic configuration.
 """
 
-from fastapi import FastAPI, Request, Form
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Annotated
+from urllib.parse import quote
+
+from fastapi import FastAPI, Form, Query, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from urllib.parse import quote
+
+from src.config import (
+    CATALOG_STORE_INTERVAL_SECONDS,
+    CHANGE_POLL_SECONDS,
+    EXPORT_INTERVAL_SECONDS,
+    JOB_INLINE,
+    JOB_WORKERS,
+    PREFETCH_INTERVAL_SECONDS,
+    READ_REPLICAS,
+    REPLICA_HEALTH_SECONDS,
+    THUMBNAIL_INTERVAL_SECONDS,
+)
+from src.database import browse_view, catalog_store, changes, connection, export, jobs, prefetch, spectrum_cache
+from src.database.timeouts import QueryInterrupted
 from src.routes import web
+from src.routes.delivery import (
+    BOKEH_DIR,
+    CompressionMiddleware,
+    FingerprintedStaticFiles,
+    bokeh_url,
+    static_url,
+    vendor_url,
+)
+from src.visualizations import thumbnails
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks on startup and cancel them on shutdown."""
+    changes.subscribe(browse_view.refresh_browse_view)
+    spectrum_cache.load_access_stats()
+
+    tasks = []
+    if CHANGE_POLL_SECONDS > 0:
+        tasks.append(asyncio.create_task(changes.watch_for_changes(CHANGE_POLL_SECONDS)))
+    if CATALOG_STORE_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(catalog_store.schedule_catalog_store(CATALOG_STORE_INTERVAL_SECONDS)))
+    if EXPORT_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(export.schedule_exports(EXPORT_INTERVAL_SECONDS)))
+    if THUMBNAIL_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(thumbnails.schedule_thumbnails(THUMBNAIL_INTERVAL_SECONDS)))
+    if PREFETCH_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(prefetch.schedule_prefetch(PREFETCH_INTERVAL_SECONDS)))
+    if JOB_WORKERS > 0 or JOB_INLINE:
+        tasks.append(asyncio.create_task(jobs.run_jobs(JOB_WORKERS)))
+    if READ_REPLICAS and REPLICA_HEALTH_SECONDS > 0:
+        tasks.append(asyncio.create_task(connection.monitor_replicas(REPLICA_HEALTH_SECONDS)))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+
+    # Keep the source view statistics used to rank spectra for prefetching
+    try:
+        spectrum_cache.save_access_stats()
+    except OSError as e:
+        logger.error(f"Error saving spectrum access statistics: {e}")
+
 
 app = FastAPI(
     title="Astro Web",
     description="Multi-page astronomy database web application with navigation bar",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Configure Jinja2 templates
 templates = Jinja2Templates(directory="src/templates")
 # Add urlencode filter for URL encoding source names
 templates.env.filters["urlencode"] = lambda u: quote(str(u), safe="")
+# Fingerprinted URLs for static assets and self-hosted JS bundles
+templates.env.globals["static_url"] = static_url
+templates.env.globals["bokeh_url"] = bokeh_url
+templates.env.globals["vendor_url"] = vendor_url
 web.set_templates(templates)
 
-# Configure static file serving
-app.mount("/static", StaticFiles(directory="src/static"), name="static")
+# Structured 503/504 responses for cancelled and timed out queries
+app.add_exception_handler(QueryInterrupted, web.query_interrupted_handler)
+
+# Compress large HTML/JSON responses
+app.add_middleware(CompressionMiddleware)
+# Pin each request to one read replica per role
+app.add_middleware(connection.ReplicaPinningMiddleware)
+
+# Configure static file serving (BokehJS is served from the installed bokeh package)
+app.mount("/static/bokeh", FingerprintedStaticFiles(directory=BOKEH_DIR), name="bokeh")
+app.mount("/static", FingerprintedStaticFiles(directory="src/static"), name="static")
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -40,9 +118,11 @@ async def browse(request: Request):
 
 
 @app.get("/plots", response_class=HTMLResponse)
-async def plot(request: Request):
-    """Plots page rendering scatter visualization."""
-    return await web.plot(request)
+async def plot(
+    request: Request, x: str | None = None, x_minus: str | None = None, y: str | None = None, y_minus: str | None = None
+):
+    """Plots page rendering scatter visualization and a color-magnitude or parameter diagram."""
+    return await web.plot(request, x, x_minus, y, y_minus)
 
 
 @app.get("/source/{source_name}", response_class=HTMLResponse)
@@ -57,6 +137,18 @@ async def spectra_page(request: Request, source_name: str):
     return await web.spectra_display(request, source_name)
 
 
+@app.get("/spectra/compare", response_class=HTMLResponse)
+async def compare_page(
+    request: Request,
+    source: Annotated[list[str], Query(default_factory=list)],
+    url: Annotated[list[str], Query(default_factory=list)],
+    points: int | None = None,
+    band: str | None = None,
+):
+    """Overlay of the spectra of several sources on a common, normalized wavelength grid."""
+    return await web.compare_page(request, source, url, points, band)
+
+
 @app.get("/search", response_class=HTMLResponse)
 async def search_page(request: Request):
     """Search form page."""
@@ -70,9 +162,9 @@ async def search_results_page(request: Request, query: str = Form(...)):
 
 
 @app.post("/api/search")
-async def search_api_endpoint(query: str = Form(...)):
+async def search_api_endpoint(request: Request, query: str = Form(...)):
     """API endpoint for programmatic search access."""
-    return await web.search_api(query)
+    return await web.search_api(query, request)
 
 
 @app.post("/search/cone-results", response_class=HTMLResponse)
@@ -84,15 +176,109 @@ async def cone_search_results_page(
 
 
 @app.post("/api/search/cone")
-async def cone_search_api_endpoint(coordinates: str = Form(...), radius: str = Form(...), radius_unit: str = Form(...)):
+async def cone_search_api_endpoint(
+    request: Request, coordinates: str = Form(...), radius: str = Form(...), radius_unit: str = Form(...)
+):
     """API endpoint for programmatic cone search access."""
-    return await web.cone_search_api(coordinates, radius, radius_unit)
+    return await web.cone_search_api(coordinates, radius, radius_unit, request)
 
 
 @app.post("/api/inventory")
-async def inventory_api_endpoint(source: str = Form(...)):
+async def inventory_api_endpoint(request: Request, source: str = Form(...)):
     """API endpoint for programmatic inventory access."""
-    return await web.inventory_api(source)
+    return await web.inventory_api(source, request)
+
+
+@app.get("/api/spectra/compare")
+async def compare_api_endpoint(
+    request: Request,
+    source: Annotated[list[str], Query(default_factory=list)],
+    url: Annotated[list[str], Query(default_factory=list)],
+    points: int | None = None,
+    wavelength_min: float | None = Query(None, alias="min"),
+    wavelength_max: float | None = Query(None, alias="max"),
+    band: str | None = None,
+):
+    """API endpoint returning the spectra of sources resampled onto a common grid and normalized."""
+    return await web.compare_api(request, source, url, points, wavelength_min, wavelength_max, band)
+
+
+@app.get("/api/diagrams")
+async def diagrams_api_endpoint():
+    """API endpoint listing the band magnitudes, spectral type and parameters available as diagram axes."""
+    return await web.diagrams_api()
+
+
+@app.get("/api/diagrams/data")
+async def diagram_data_api_endpoint(x: str, y: str, x_minus: str | None = None, y_minus: str | None = None):
+    """API endpoint returning diagram points; an axis is a column, or its difference with a "_minus" column."""
+    return await web.diagram_data_api(x, x_minus, y, y_minus)
+
+
+@app.post("/api/jobs")
+async def submit_job_endpoint(
+    kind: str = Form(...),
+    coordinates: str | None = Form(None),
+    radius: str | None = Form(None),
+    radius_unit: str = Form("degrees"),
+    sources: str | None = Form(None),
+):
+    """API endpoint queuing an uncapped cone search, bulk inventory or catalog export job."""
+    return await web.submit_job_api(kind, coordinates, radius, radius_unit, sources)
+
+
+@app.get("/api/jobs/{job_id}")
+async def job_status_endpoint(job_id: str):
+    """API endpoint reporting the status and progress of a background job."""
+    return await web.job_status_api(job_id)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events_endpoint(request: Request, job_id: str):
+    """Server-sent events with the progress of a background job."""
+    return await web.job_events(request, job_id)
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result_endpoint(job_id: str):
+    """Download the result file of a finished background job."""
+    return await web.job_result(job_id)
+
+
+@app.get("/api/similar")
+async def similar_api_endpoint(source: str, k: int | None = None):
+    """API endpoint returning the k sources with the most similar photometry, spectral type and parameters."""
+    return await web.similar_api(source, k)
+
+
+@app.get("/api/autocomplete")
+async def autocomplete_api_endpoint(q: str, limit: int = 10):
+    """API endpoint suggesting source names for a prefix."""
+    return await web.autocomplete_api(q, limit)
+
+
+@app.get("/api/metrics")
+async def metrics_api_endpoint():
+    """API endpoint reporting cache, coalescing, admission, replica, query timeout and spectrum cache counters."""
+    return await web.metrics_api()
+
+
+@app.get("/api/exports")
+async def exports_api_endpoint(version: str | None = None):
+    """API endpoint listing the files of the latest (or a given) catalog export."""
+    return await web.exports_api(version)
+
+
+@app.get("/exports/{version}/{file_path:path}")
+async def export_file_endpoint(version: str, file_path: str):
+    """Download a Parquet or Arrow file from a versioned catalog export."""
+    return await web.export_file(version, file_path)
+
+
+@app.get("/thumbnails/{file_name}")
+async def thumbnail_endpoint(file_name: str):
+    """Serve a pre-rendered spectrum thumbnail with immutable cache headers."""
+    return await web.thumbnail(file_name)
 
 
 @app.get("/{path:path}", response_class=HTMLResponse)
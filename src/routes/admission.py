@@ -0,0 +1,190 @@
+"""
+Cost-aware admission control for expensive requests.
+
+Each request is classified into a pool by its estimated cost:
+
+- cheap: inventory pages and small tables
+- heavy: spectra pages, name searches and cone searches
+- bulk: whole-table pages and cone searches expected to return many rows
+
+Every pool has its own concurrency limit and a bounded wait queue. When the
+queue of a pool is full the request is rejected with 429 and a Retry-After
+header, so a handful of heavy requests cannot push cheap page loads into
+multi-second latency.
+
+The classify_* functions read table row counts and the browse view, which
+blocks; endpoints call them through run_in_threadpool.
+"""
+
+import asyncio
+import math
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from src.config import (
+    ADMISSION_BULK_ROWS,
+    ADMISSION_ENABLED,
+    ADMISSION_HEAVY_ROWS,
+    ADMISSION_POOLS,
+    ADMISSION_RETRY_AFTER,
+    PRIMARY_DATATYPE,
+    PRIMARY_TABLE,
+)
+from src.database.browse_view import count_column_name, get_browse_summaries
+from src.database.changes import get_table_row_count
+
+SPECTRA_TABLE = "Spectra"
+
+_pools = {}
+
+
+def _get_pool(name):
+    """Return the state of a pool, creating it on first use."""
+    if name not in _pools:
+        concurrency, queue_size = ADMISSION_POOLS[name]
+        _pools[name] = {
+            "semaphore": asyncio.Semaphore(concurrency),
+            "concurrency": concurrency,
+            "queue_size": queue_size,
+            "active": 0,
+            "waiting": 0,
+            "admitted": 0,
+            "rejected": 0,
+        }
+    return _pools[name]
+
+
+async def acquire(pool_name):
+    """
+    Wait for a slot in a pool, or reject the request when the pool's queue is full.
+
+    Use this instead of admit() when the slot must outlive the route handler,
+    for example while a streamed response is being sent.
+
+    Args:
+        pool_name (str): "cheap", "heavy" or "bulk"
+
+    Returns:
+        callable: Function releasing the slot; must be called exactly once
+
+    Raises:
+        HTTPException: 429 with a Retry-After header when the queue is full
+    """
+    if not ADMISSION_ENABLED:
+        return lambda: None
+
+    pool = _get_pool(pool_name)
+    if pool["semaphore"].locked() and pool["waiting"] >= pool["queue_size"]:
+        pool["rejected"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server is busy with {pool_name} requests. Please retry later.",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+        )
+
+    pool["waiting"] += 1
+    try:
+        await pool["semaphore"].acquire()
+    finally:
+        pool["waiting"] -= 1
+
+    pool["admitted"] += 1
+    pool["active"] += 1
+
+    def release():
+        pool["active"] -= 1
+        pool["semaphore"].release()
+
+    return release
+
+
+@asynccontextmanager
+async def admit(pool_name):
+    """
+    Hold a slot in a pool for the duration of a block (see acquire).
+
+    Args:
+        pool_name (str): "cheap", "heavy" or "bulk"
+
+    Raises:
+        HTTPException: 429 with a Retry-After header when the queue is full
+    """
+    release = await acquire(pool_name)
+    try:
+        yield
+    finally:
+        release()
+
+
+def pool_for_rows(estimated_rows):
+    """
+    Choose a pool from an estimated number of result rows.
+
+    Args:
+        estimated_rows (float): Estimated rows, or None when unknown
+
+    Returns:
+        str: Pool name
+    """
+    if estimated_rows is None or estimated_rows >= ADMISSION_BULK_ROWS:
+        return "bulk"
+    if estimated_rows >= ADMISSION_HEAVY_ROWS:
+        return "heavy"
+    return "cheap"
+
+
+def classify_browse():
+    """Classify a browse request by the number of rows in the primary table."""
+    return pool_for_rows(get_table_row_count(PRIMARY_TABLE))
+
+
+def classify_cone_search(radius_deg):
+    """
+    Classify a cone search by the expected number of matches.
+
+    Assumes sources are spread uniformly over the sky: the cone covers a
+    fraction (1 - cos(radius)) / 2 of the sphere. Cone searches are never
+    classified as cheap since they scan the whole table.
+
+    Args:
+        radius_deg (float): Search radius in degrees
+
+    Returns:
+        str: Pool name
+    """
+    total_rows = get_table_row_count(PRIMARY_TABLE)
+    if total_rows is None:
+        return "heavy"
+    sky_fraction = (1 - math.cos(math.radians(radius_deg))) / 2
+    pool = pool_for_rows(total_rows * sky_fraction)
+    return "heavy" if pool == "cheap" else pool
+
+
+def classify_spectra(source_name):
+    """
+    Classify a spectra page by the number of spectra to download and plot.
+
+    Args:
+        source_name (str): Source identifier
+
+    Returns:
+        str: "cheap" when the source has no spectra, otherwise "heavy"
+    """
+    try:
+        source_name = PRIMARY_DATATYPE(source_name)
+    except ValueError:
+        return "cheap"
+    summaries = get_browse_summaries([source_name]) or {}
+    spectra_count = summaries.get(source_name, {}).get(count_column_name(SPECTRA_TABLE))
+    return "cheap" if spectra_count == 0 else "heavy"
+
+
+def get_admission_stats():
+    """
+    Return concurrency and queue counters per pool.
+
+    Returns:
+        dict: Pool name -> counters
+    """
+    return {name: {key: value for key, value in pool.items() if key != "semaphore"} for name, pool in _pools.items()}
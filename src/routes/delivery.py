@@ -0,0 +1,265 @@
+"""
+Response delivery: compression and cacheable static assets.
+
+- CompressionMiddleware compresses large HTML/JSON/CSS/JS responses with
+  brotli (when the optional `brotli` package is installed) or gzip, including
+  streamed responses. Responses that are already encoded (for example from the
+  page cache) are passed through unchanged.
+- FingerprintedStaticFiles serves `name.<hash>.ext` URLs produced by
+  static_url() with immutable Cache-Control headers, so repeat views only
+  transfer dynamic content.
+- Bokeh JS is served from the installed bokeh package and jQuery/DataTables
+  from src/static/vendor. Download the vendor bundles once with:
+
+    python -m src.routes.delivery --fetch-vendor
+
+  Until they are downloaded, vendor_url() falls back to the public CDN.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import urllib.request
+import zlib
+
+from bokeh.util.paths import bokehjs_path
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.config import BROTLI_QUALITY, COMPRESSION_MIN_SIZE, GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "src/static"
+VENDOR_DIR = os.path.join(STATIC_DIR, "vendor")
+BOKEH_DIR = str(bokehjs_path())
+
+# Pinned third-party bundles: local file name -> CDN URL
+VENDOR_BUNDLES = {
+    "jquery-3.7.1.min.js": "https://code.jquery.com/jquery-3.7.1.min.js",
+    "jquery.dataTables.min.js": "https://cdn.datatables.net/1.13.7/js/jquery.dataTables.min.js",
+    "jquery.dataTables.min.css": "https://cdn.datatables.net/1.13.7/css/jquery.dataTables.min.css",
+}
+
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+_FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[^./]+)$")
+_hashes = {}
+
+
+def _file_hash(full_path):
+    """Return a short content hash for a file, cached by modification time."""
+    mtime = os.stat(full_path).st_mtime
+    cached = _hashes.get(full_path)
+    if cached is None or cached[0] != mtime:
+        with open(full_path, "rb") as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        _hashes[full_path] = cached
+    return cached[1]
+
+
+def _fingerprinted_url(prefix, directory, path):
+    """Build a content-hashed URL for a file, or the plain URL if the file does not exist."""
+    full_path = os.path.join(directory, path)
+    if not os.path.isfile(full_path):
+        return f"{prefix}/{path}"
+    stem, ext = os.path.splitext(path)
+    return f"{prefix}/{stem}.{_file_hash(full_path)}{ext}"
+
+
+def static_url(path):
+    """
+    Return the fingerprinted URL of a file in src/static (Jinja global).
+
+    Args:
+        path (str): Path relative to src/static, e.g. "style.css"
+
+    Returns:
+        str: URL such as /static/style.3fa2b1c4d5e6.css
+    """
+    return _fingerprinted_url("/static", STATIC_DIR, path)
+
+
+def bokeh_url(file_name):
+    """
+    Return the fingerprinted URL of a BokehJS bundle served from the bokeh package (Jinja global).
+
+    Args:
+        file_name (str): Bundle name, e.g. "bokeh.min.js"
+
+    Returns:
+        str: URL under /static/bokeh
+    """
+    return _fingerprinted_url("/static/bokeh", BOKEH_DIR, f"js/{file_name}")
+
+
+def vendor_url(file_name):
+    """
+    Return the URL of a third-party bundle (Jinja global).
+
+    Args:
+        file_name (str): Key of VENDOR_BUNDLES
+
+    Returns:
+        str: Fingerprinted local URL when the bundle has been downloaded, otherwise the CDN URL
+    """
+    if os.path.isfile(os.path.join(VENDOR_DIR, file_name)):
+        return static_url(f"vendor/{file_name}")
+    return VENDOR_BUNDLES[file_name]
+
+
+def fetch_vendor_bundles():
+    """Download the pinned jQuery and DataTables bundles into src/static/vendor."""
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    for file_name, url in VENDOR_BUNDLES.items():
+        with urllib.request.urlopen(url) as response:
+            content = response.read()
+        with open(os.path.join(VENDOR_DIR, file_name), "wb") as f:
+            f.write(content)
+        print(f"Downloaded {url} -> {VENDOR_DIR}/{file_name}")
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """StaticFiles that resolves content-hashed file names and sets long-lived cache headers."""
+
+    async def get_response(self, path, scope):
+        immutable = False
+        match = _FINGERPRINTED.match(path)
+        if match:
+            plain_path = match["stem"] + match["ext"]
+            full_path, _ = self.lookup_path(plain_path)
+            if full_path and _file_hash(full_path) == match["hash"]:
+                path, immutable = plain_path, True
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE if immutable else REVALIDATE
+        return response
+
+
+def choose_encoding(accept_encoding):
+    """Pick brotli or gzip from an Accept-Encoding header, or None."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = params.strip()[2:] if params.strip().startswith("q=") else "1"
+        try:
+            if float(quality) > 0:
+                accepted.add(name.strip())
+        except ValueError:
+            continue
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Incremental gzip or brotli compressor that can flush after each streamed chunk."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, final):
+        if self.encoding == "br":
+            return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing text responses larger than COMPRESSION_MIN_SIZE.
+
+    Args:
+        app: ASGI application
+        minimum_size (int): Smallest single-message body to compress; streamed bodies are always compressed
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                if state["start"] is not None:
+                    start, state["start"] = state["start"], None
+                    await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["start"] is not None:
+                start, state["start"] = state["start"], None
+                headers = MutableHeaders(raw=start["headers"])
+                compressible = (
+                    start["status"] == 200
+                    and "content-encoding" not in headers
+                    and headers.get("content-type", "").split(";")[0].strip() in COMPRESSIBLE_TYPES
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if not compressible:
+                    state["passthrough"] = True
+                    await send(start)
+                else:
+                    state["compressor"] = _Compressor(encoding)
+                    del headers["content-length"]
+                    headers["content-encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    await send(start)
+
+            if state["passthrough"]:
+                await send(message)
+                return
+
+            compressed = state["compressor"].compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Static asset delivery helpers.")
+    parser.add_argument(
+        "--fetch-vendor", action="store_true", help="Download jQuery and DataTables into src/static/vendor"
+    )
+    args = parser.parse_args()
+    if args.fetch_vendor:
+        fetch_vendor_bundles()
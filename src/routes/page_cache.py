@@ -0,0 +1,248 @@
+"""
+Rendered page cache for read-mostly catalog pages.
+
+Successful HTML responses are stored once per route and parameters, together
+with the database version they were rendered from. Each entry is compressed
+once (gzip, plus brotli when the optional `brotli` package is installed, at
+GZIP_LEVEL and BROTLI_QUALITY) and served pre-compressed according to the
+client's Accept-Encoding.
+
+Entries are fresh for PAGE_CACHE_TTL_SECONDS while the database version is
+unchanged. Afterwards they are served stale for up to
+PAGE_CACHE_STALE_SECONDS while a background task renders a replacement, so
+hot pages are not rendered on the request path.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+
+from src.config import (
+    BROTLI_QUALITY,
+    GZIP_LEVEL,
+    PAGE_CACHE_DIR,
+    PAGE_CACHE_ENABLED,
+    PAGE_CACHE_MAX_ENTRIES,
+    PAGE_CACHE_STALE_SECONDS,
+    PAGE_CACHE_TTL_SECONDS,
+)
+from src.database.changes import get_database_version
+from src.database.timeouts import watch_disconnect
+from src.routes.delivery import brotli, choose_encoding
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_revalidating = set()
+# Background revalidation tasks, referenced until they finish so they are not garbage collected
+_tasks = set()
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "revalidations": 0}
+
+
+def cache_key(route, **params):
+    """
+    Build a cache key from a route name and its parameters.
+
+    Args:
+        route (str): Route name, e.g. "inventory"
+        **params: Route, query or form parameters that affect the rendered page
+
+    Returns:
+        str: Cache key
+    """
+    return route + "?" + "&".join(f"{name}={params[name]}" for name in sorted(params))
+
+
+def _disk_path(key):
+    """Return the on-disk file for a cache key."""
+    return os.path.join(PAGE_CACHE_DIR, hashlib.sha256(key.encode()).hexdigest() + ".pickle")
+
+
+def _get(key):
+    """Look up an entry in memory, then on disk."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+
+    if PAGE_CACHE_DIR:
+        try:
+            with open(_disk_path(key), "rb") as f:
+                entry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        _put_memory(key, entry)
+        return entry
+    return None
+
+
+def _put_memory(key, entry):
+    """Insert an entry into the in-memory LRU, evicting the least recently used entries."""
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > PAGE_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def _store(key, body, status_code, media_type, version):
+    """Compress a rendered page body and store it in memory and, if configured, on disk."""
+    entry = {
+        "body": body,
+        "gzip": gzip.compress(body, compresslevel=GZIP_LEVEL),
+        "br": brotli.compress(body, quality=BROTLI_QUALITY) if brotli is not None else None,
+        "status_code": status_code,
+        "media_type": media_type or "text/html",
+        "version": version,
+        "created": time.time(),
+    }
+    _put_memory(key, entry)
+
+    if PAGE_CACHE_DIR:
+        try:
+            os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+            path = _disk_path(key)
+            with open(f"{path}.tmp", "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Error writing page cache entry to disk: {e}")
+    return entry
+
+
+def _is_cacheable(response):
+    """Only successful responses not marked no-store are cached."""
+    return response.status_code == 200 and "no-store" not in response.headers.get("cache-control", "")
+
+
+def _cached_response(request, entry, cache_status):
+    """Build a response from a cache entry using the best encoding the client accepts."""
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding", "X-Cache": cache_status}
+
+    if encoding == "br" and entry["br"] is not None:
+        content = entry["br"]
+        headers["Content-Encoding"] = "br"
+    elif encoding is not None:
+        content = entry["gzip"]
+        headers["Content-Encoding"] = "gzip"
+    else:
+        content = entry["body"]
+
+    return Response(content=content, status_code=entry["status_code"], media_type=entry["media_type"], headers=headers)
+
+
+async def _read_body(response):
+    """Return the complete body of a rendered response, consuming streamed bodies."""
+    if not isinstance(response, StreamingResponse):
+        return bytes(response.body)
+    chunks = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    return b"".join(chunks)
+
+
+def _tee_streaming(key, response, version):
+    """Pass a streamed response through to the client and store its body once it is complete."""
+    body_iterator = response.body_iterator
+
+    async def tee():
+        chunks = []
+        async for chunk in body_iterator:
+            chunks.append(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            yield chunk
+        await run_in_threadpool(_store, key, b"".join(chunks), response.status_code, response.media_type, version)
+
+    response.body_iterator = tee()
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+
+async def _revalidate(key, render):
+    """Render a replacement for a stale entry in the background."""
+    # The client that triggered the revalidation has already been served
+    watch_disconnect.set(False)
+    try:
+        version = await run_in_threadpool(get_database_version)
+        response = await render()
+        if _is_cacheable(response):
+            body = await _read_body(response)
+            await run_in_threadpool(_store, key, body, response.status_code, response.media_type, version)
+            _stats["revalidations"] += 1
+    except Exception:
+        logger.exception(f"Error revalidating cached page {key}")
+    finally:
+        _revalidating.discard(key)
+
+
+async def serve_cached(request: Request, key, render):
+    """
+    Serve a page from the cache, rendering it on a miss.
+
+    Args:
+        request (Request): Incoming request (used for Accept-Encoding)
+        key (str): Cache key from cache_key()
+        render (callable): Coroutine function returning the rendered Response
+
+    Returns:
+        Response: Cached or freshly rendered response; streamed responses are
+                  passed through and stored when the last chunk has been sent
+    """
+    if not PAGE_CACHE_ENABLED:
+        return await render()
+
+    # The first version check scans every table and the entry may be read from disk
+    version = await run_in_threadpool(get_database_version)
+    entry = await run_in_threadpool(_get, key)
+    if entry is not None:
+        age = time.time() - entry["created"]
+        if entry["version"] == version and age < PAGE_CACHE_TTL_SECONDS:
+            _stats["hits"] += 1
+            return _cached_response(request, entry, "HIT")
+        if age < PAGE_CACHE_TTL_SECONDS + PAGE_CACHE_STALE_SECONDS:
+            _stats["stale_hits"] += 1
+            if key not in _revalidating:
+                _revalidating.add(key)
+                task = asyncio.create_task(_revalidate(key, render))
+                _tasks.add(task)
+                task.add_done_callback(_tasks.discard)
+            return _cached_response(request, entry, "STALE")
+
+    _stats["misses"] += 1
+    response = await render()
+    if not _is_cacheable(response):
+        return response
+    if isinstance(response, StreamingResponse):
+        return _tee_streaming(key, response, version)
+    entry = await run_in_threadpool(
+        _store, key, bytes(response.body), response.status_code, response.media_type, version
+    )
+    return _cached_response(request, entry, "MISS")
+
+
+def clear_page_cache():
+    """Remove all entries from the in-memory cache (the disk store expires by version and age)."""
+    with _lock:
+        _entries.clear()
+
+
+def get_page_cache_stats():
+    """
+    Return page cache counters.
+
+    Returns:
+        dict: Hit, stale hit, miss and revalidation counts plus the number of in-memory entries
+    """
+    return {**_stats, "entries": len(_entries)}
@@ -4,21 +4,88 @@ Web page routes for Hello World website.
 This module contains all HTML page routes including homepage and error pages.
 """
 
-from urllib.parse import unquote
+import asyncio
+import json
+import logging
 from datetime import datetime
+from urllib.parse import unquote
 
-from fastapi import Request, Form, HTTPException
+import numpy as np
+from fastapi import Form, HTTPException, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from src.database.sources import get_all_sources, get_source_inventory, get_source_spectra
-from src.database.query import search_objects, parse_coordinates_string, convert_radius_to_degrees, cone_search
+from src.config import (
+    ADMISSION_RETRY_AFTER,
+    COMPARE_GRID_POINTS,
+    COMPARE_NORM_BAND,
+    JOB_POLL_SECONDS,
+    SIMILAR_DEFAULT_K,
+    SOURCE_COLUMN,
+    SPECTRA_URL_COLUMN,
+    STREAM_HTML,
+    source_link,
+)
+from src.database.browse_view import iter_browse_view, iter_with_browse_summaries
+from src.database.catalog_store import get_catalog_store_stats
+from src.database.columnar import iter_records, records_json
+from src.database.connection import get_replica_stats
+from src.database.export import get_export_file, get_export_manifest, get_latest_version
+from src.database.jobs import (
+    FINISHED_STATUSES,
+    JOB_KINDS,
+    get_job,
+    get_job_stats,
+    get_result_file,
+    notify_job_runner,
+    submit_job,
+)
+from src.database.prefetch import get_prefetch_stats
+from src.database.query import (
+    CONE_SEARCH_LIMIT,
+    cone_search,
+    convert_radius_to_degrees,
+    parse_coordinates_string,
+    search_objects,
+)
+from src.database.similar import get_similar_index, get_similar_stats, similar_sources
+from src.database.singleflight import get_single_flight_stats
+from src.database.sources import autocomplete_source_names, get_all_sources, get_source_inventory, get_source_spectra
+from src.database.spatial import get_spatial_stats
+from src.database.spectrum_cache import get_spectrum_cache_stats, record_access, register_source
+from src.database.timeouts import QueryInterrupted, QueryTimeout, get_timeout_stats, run_with_timeout
+from src.routes.admission import (
+    acquire,
+    admit,
+    classify_browse,
+    classify_cone_search,
+    classify_spectra,
+    get_admission_stats,
+)
+from src.routes.page_cache import cache_key, get_page_cache_stats, serve_cached
+from src.visualizations.compare import compare_spectra, generate_comparison_plot, get_compare_stats, parse_band
+from src.visualizations.diagrams import create_diagram_plot, diagram_data, get_diagram_columns, get_diagram_stats
 from src.visualizations.scatter import create_scatter_plot
 from src.visualizations.spectra import generate_spectra_plot
-from src.config import get_source_url
+from src.visualizations.thumbnails import get_thumbnail_file, get_thumbnail_keys
+
+logger = logging.getLogger(__name__)
 
 # Templates instance - will be imported from main
 templates = None
 
+# Headers for error pages that must not be stored by the page cache
+NO_STORE = {"Cache-Control": "no-store"}
+
+# Headers for content-addressed files that never change
+IMMUTABLE = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+# Streamed pages send every template chunk until the first STREAM_HEAD_BYTES
+# (page header and navigation), then batch rows into STREAM_CHUNK_BYTES chunks
+STREAM_HEAD_BYTES = 4 * 1024
+STREAM_CHUNK_BYTES = 16 * 1024
+
 
 def set_templates(templates_instance: Jinja2Templates):
     """Set the templates instance from main module."""
@@ -26,6 +93,111 @@ def set_templates(templates_instance: Jinja2Templates):
     templates = templates_instance
 
 
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls on_close even if the client disconnects before the body is sent."""
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+
+def _buffered(pieces):
+    """Encode rendered template pieces and group them into network-sized chunks."""
+    sent = 0
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        data = piece.encode("utf-8")
+        buffer.append(data)
+        buffered += len(data)
+        if sent < STREAM_HEAD_BYTES or buffered >= STREAM_CHUNK_BYTES:
+            chunk = b"".join(buffer)
+            sent += len(chunk)
+            buffer, buffered = [], 0
+            yield chunk
+    if buffer:
+        yield b"".join(buffer)
+
+
+def stream_template(name, context, status_code=200, on_close=None):
+    """
+    Render a template incrementally with Jinja's generate() and stream it to the client.
+
+    Lazy values in the context (for example row generators reading from a
+    database cursor) are consumed while the page is sent, so the header and
+    navigation reach the browser before the rows are fetched. Falls back to a
+    regular TemplateResponse when ASTRO_WEB_STREAM_HTML is disabled.
+
+    Args:
+        name (str): Template name
+        context (dict): Template context, including the request
+        status_code (int): HTTP status code
+        on_close (callable): Called once when the response is finished or aborted
+
+    Returns:
+        Response: StreamingResponse, or TemplateResponse when streaming is disabled
+    """
+    closed = []
+
+    def close():
+        if on_close is not None and not closed:
+            closed.append(True)
+            on_close()
+
+    if not STREAM_HTML:
+        try:
+            return templates.TemplateResponse(name, context, status_code=status_code)
+        finally:
+            close()
+
+    pieces = _buffered(templates.get_template(name).generate(context))
+
+    async def body():
+        try:
+            async for chunk in iterate_in_threadpool(pieces):
+                yield chunk
+        finally:
+            close()
+
+    return ClosingStreamingResponse(body(), on_close=close, status_code=status_code, media_type="text/html")
+
+
+def _link_sources(rows):
+    """Convert SOURCE_COLUMN of each streamed row to a link to the source detail page."""
+    for row in rows:
+        if SOURCE_COLUMN in row:
+            row[SOURCE_COLUMN] = source_link(row[SOURCE_COLUMN])
+        yield row
+
+
+def records_response(results, **fields):
+    """
+    Build a JSON response with a DataFrame serialized as the "results" array.
+
+    The records are encoded one row at a time with records_json(), so only one
+    row's dictionary exists at once rather than a list of every row.
+
+    Args:
+        results (pandas.DataFrame): Query results
+        **fields: Additional JSON-serializable response fields
+
+    Returns:
+        Response: application/json response
+    """
+    body = '{"results": ' + records_json(results)
+    if fields:
+        body += ", " + json.dumps(fields)[1:]
+    else:
+        body += "}"
+    return Response(content=body, media_type="application/json")
+
+
 def create_navigation_context(current_page="/"):
     """
     Generate navigation items with active state for the navigation bar.
@@ -59,38 +231,61 @@ async def homepage(request: Request):
 
 
 async def browse(request: Request):
-    """Render the browse database page with Sources table."""
-
-    # Get all Sources from database
-    sources_data = get_all_sources()
+    """Render the browse database page with Sources table, streaming rows as they are read."""
 
-    # Apply source URL conversion
-    sources_data = get_source_url(sources_data)
+    # Classification reads row counts (and may check for database changes), so it runs off the event loop
+    release = await acquire(await run_in_threadpool(classify_browse))
+    try:
+        # Stream all Sources from the materialized browse view, falling back to the Sources table
+        sources_data = await run_in_threadpool(iter_browse_view)
+        if sources_data is None:
+            sources = await run_with_timeout("browse", request, get_all_sources)
+            if sources is not None:
+                sources_data = (list(sources.columns), iter_records(sources))
+    except Exception:
+        release()
+        raise
 
     # Handle errors
     has_error = sources_data is None
     error_message = "Sources data could not be loaded at this time." if has_error else None
+    columns, rows = sources_data if not has_error else ([], iter([]))
 
     # Create navigation context with active page
     nav_context = create_navigation_context(current_page="/browse")
 
-    return templates.TemplateResponse(
+    return stream_template(
         "browse.html",
         {
             "request": request,
-            "sources_data": sources_data if not has_error else [],
+            "columns": columns,
+            "rows": _link_sources(rows),
             "has_error": has_error,
             "error_message": error_message,
             **nav_context,
         },
+        on_close=release,
     )
 
 
-async def plot(request: Request):
-    """Render the plots page with scatter visualization."""
+async def plot(request: Request, x=None, x_minus=None, y=None, y_minus=None):
+    """Render the plots page with the sky scatter plot and a color-magnitude or parameter diagram."""
     # Generate scatter plot
     plot = create_scatter_plot()
 
+    diagram, error_message = None, None
+    try:
+        async with admit("cheap"):
+            diagram = await run_in_threadpool(
+                create_diagram_plot, x or None, x_minus or None, y or None, y_minus or None
+            )
+    except ValueError as e:
+        error_message = str(e)
+    if diagram:
+        diagram_columns = diagram["columns"]
+    else:
+        diagram_columns = [column["name"] for column in await run_in_threadpool(get_diagram_columns)]
+
     # Create navigation context with active page
     nav_context = create_navigation_context(current_page="/plots")
 
@@ -100,22 +295,41 @@ async def plot(request: Request):
             "request": request,
             "plot_script": plot["script"],
             "plot_div": plot["div"],
+            "diagram": diagram,
+            "diagram_columns": diagram_columns,
+            "axes": diagram or {"x": x, "x_minus": x_minus, "y": y, "y_minus": y_minus},
+            "error_message": error_message,
             **nav_context,
         },
+        status_code=400 if error_message else 200,
+        headers=NO_STORE if error_message else None,
     )
 
 
 async def inventory(request: Request, source_name: str):
+    """Serve the source inventory page from the page cache."""
+    key = cache_key("inventory", source_name=source_name)
+    response = await serve_cached(request, key, lambda: _render_inventory(request, source_name))
+    # Counted for cached pages too; only sources registered by a successful render are tracked
+    if response.status_code == 200:
+        record_access(unquote(source_name))
+    return response
+
+
+async def _render_inventory(request: Request, source_name: str):
     """Render the source inventory page."""
 
     # Get decoded source name for display
     decoded_source_name = unquote(source_name)
 
-    # Get inventory data
-    inventory_data = get_source_inventory(source_name)
+    async with admit("cheap"):
+        # Get inventory data
+        inventory_data = await run_with_timeout("inventory", request, get_source_inventory, source_name)
 
-    # Check if spectra exist for this source
-    spectra_df = get_source_spectra(source_name, convert_to_spectrum=False)
+        # Check if spectra exist for this source
+        spectra_df = await run_with_timeout(
+            "inventory", request, get_source_spectra, source_name, convert_to_spectrum=False
+        )
     if spectra_df is None:
         has_spectra = False
     else:
@@ -129,6 +343,29 @@ async def inventory(request: Request, source_name: str):
     else:
         has_error = False
         error_message = None
+        register_source(decoded_source_name)
+
+    # Previews of the spectra rendered by the thumbnail pipeline
+    spectra_rows = (inventory_data or {}).get("Spectra", [])
+    thumbnail_keys = await run_in_threadpool(get_thumbnail_keys, [row.get(SPECTRA_URL_COLUMN) for row in spectra_rows])
+    spectra_thumbnails = [
+        {
+            "url": f"/thumbnails/{thumbnail_keys[row[SPECTRA_URL_COLUMN]]}.svg",
+            "label": f"{row.get('observation_date', '-')} | {row.get('regime', '-')} | "
+            f"{row.get('telescope', '-')}/{row.get('instrument', '-')}",
+        }
+        for row in spectra_rows
+        if row.get(SPECTRA_URL_COLUMN) in thumbnail_keys
+    ]
+
+    # Nearest neighbours in photometry, spectral type and modeled parameters
+    # An optional panel: never build the index on this path, and never fail the page over it
+    similar = None
+    if not has_error:
+        try:
+            similar = await run_in_threadpool(similar_sources, decoded_source_name, SIMILAR_DEFAULT_K, wait=False)
+        except Exception:
+            logger.exception(f"Error finding similar sources for {decoded_source_name}")
 
     # Create navigation context with active page
     nav_context = create_navigation_context(current_page=f"/source/{source_name}")
@@ -142,6 +379,8 @@ async def inventory(request: Request, source_name: str):
             "has_error": has_error,
             "error_message": error_message,
             "has_spectra": has_spectra,
+            "spectra_thumbnails": spectra_thumbnails,
+            "similar": similar,
             **nav_context,
         },
         status_code=404 if has_error else 200,
@@ -149,16 +388,28 @@ async def inventory(request: Request, source_name: str):
 
 
 async def spectra_display(request: Request, source_name: str):
+    """Serve the spectra visualization page from the page cache."""
+    key = cache_key("spectra", source_name=source_name)
+    response = await serve_cached(request, key, lambda: _render_spectra_display(request, source_name))
+    if response.status_code == 200:
+        record_access(unquote(source_name))
+    return response
+
+
+async def _render_spectra_display(request: Request, source_name: str):
     """Render the spectra visualization page for a specific source."""
 
     # Get decoded source name for display
     decoded_source_name = unquote(source_name)
 
-    # Get spectra data from database
-    spectra_df = get_source_spectra(source_name, convert_to_spectrum=True)
+    async with admit(await run_in_threadpool(classify_spectra, source_name)):
+        # Get spectra data from database
+        spectra_df = await run_with_timeout(
+            "spectra", request, get_source_spectra, source_name, convert_to_spectrum=True
+        )
 
-    # Generate the plot
-    plot_data = generate_spectra_plot(spectra_df)
+        # Generate the plot
+        plot_data = generate_spectra_plot(spectra_df)
 
     # Handle errors
     has_error = spectra_df is None
@@ -166,6 +417,8 @@ async def spectra_display(request: Request, source_name: str):
         error_message = f"Could not load spectra for: {decoded_source_name}"
     else:
         error_message = None
+    if not has_error and not spectra_df.empty:
+        register_source(decoded_source_name)
 
     # Create navigation context with active page
     nav_context = create_navigation_context(current_page=f"/source/{source_name}/spectra")
@@ -188,6 +441,145 @@ async def spectra_display(request: Request, source_name: str):
     )
 
 
+def compare_arguments(sources, access_urls, points=None, wavelength_min=None, wavelength_max=None, band=None):
+    """
+    Validate the parameters of a spectra comparison.
+
+    Args:
+        sources (list): Source identifiers
+        access_urls (list): Access URLs of individual spectra
+        points (int): Grid points (default COMPARE_GRID_POINTS)
+        wavelength_min (float): Start of the grid in μm (default: combined coverage)
+        wavelength_max (float): End of the grid in μm (default: combined coverage)
+        band (str): Normalization band (default COMPARE_NORM_BAND), see parse_band()
+
+    Returns:
+        dict: Keyword arguments for compare_spectra()
+
+    Raises:
+        ValueError: If the parameters are invalid
+    """
+    wavelength_range = None
+    if wavelength_min is not None or wavelength_max is not None:
+        if wavelength_min is None or wavelength_max is None or wavelength_min >= wavelength_max:
+            raise ValueError("Both min and max wavelengths are required, with min < max")
+        wavelength_range = (wavelength_min, wavelength_max)
+    return {
+        "sources": list(dict.fromkeys(name.strip() for name in sources if name.strip())),
+        "access_urls": list(dict.fromkeys(url.strip() for url in access_urls if url.strip())),
+        "points": points or COMPARE_GRID_POINTS,
+        "wavelength_range": wavelength_range,
+        "band": parse_band(COMPARE_NORM_BAND if band is None else band),
+    }
+
+
+async def compare_page(request: Request, sources: list, access_urls: list, points=None, band=None):
+    """Serve the spectra comparison page from the page cache."""
+    key = cache_key(
+        "compare", sources=json.dumps(sources), access_urls=json.dumps(access_urls), points=points, band=band
+    )
+    return await serve_cached(request, key, lambda: _render_compare_page(request, sources, access_urls, points, band))
+
+
+async def _render_compare_page(request: Request, sources: list, access_urls: list, points, band):
+    """Render an overlay of the resampled spectra of several sources."""
+    nav_context = create_navigation_context(current_page="/spectra/compare")
+    comparison, plot_data, error_message = None, {"script": "", "div": ""}, None
+    try:
+        arguments = compare_arguments(sources, access_urls, points, band=band)
+        if arguments["sources"] or arguments["access_urls"]:
+            async with admit("heavy"):
+                comparison = await run_with_timeout("compare", request, compare_spectra, **arguments)
+                plot_data = generate_comparison_plot(comparison)
+    except ValueError as e:
+        error_message = str(e)
+
+    return templates.TemplateResponse(
+        "compare.html",
+        {
+            "request": request,
+            "sources": [name.strip() for name in sources if name.strip()],
+            "access_urls": [url for url in access_urls if url.strip()],
+            "points": points or COMPARE_GRID_POINTS,
+            "band": COMPARE_NORM_BAND if band is None else band,
+            "plot_script": plot_data["script"],
+            "plot_div": plot_data["div"],
+            "spectra": comparison["spectra"] if comparison else [],
+            "error_message": error_message,
+            **nav_context,
+        },
+        status_code=400 if error_message else 200,
+        headers=NO_STORE if error_message else None,
+    )
+
+
+def _nullable(values):
+    """Convert an array to a list with NaN replaced by None, for JSON."""
+    return [value if np.isfinite(value) else None for value in values.tolist()]
+
+
+async def compare_api(
+    request: Request,
+    sources: list,
+    access_urls: list,
+    points: int | None = None,
+    wavelength_min: float | None = None,
+    wavelength_max: float | None = None,
+    band: str | None = None,
+):
+    """API endpoint returning spectra resampled onto a common wavelength grid and normalized"""
+    try:
+        arguments = compare_arguments(sources, access_urls, points, wavelength_min, wavelength_max, band)
+        async with admit("heavy"):
+            comparison = await run_with_timeout("compare", request, compare_spectra, **arguments)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    fluxes = iter(comparison["flux"])
+    spectra = [
+        {**spectrum, "flux": _nullable(next(fluxes)) if spectrum["status"] == "displayed" else None}
+        for spectrum in comparison["spectra"]
+    ]
+    band = comparison["band"]
+    return {
+        "grid": comparison["grid"].tolist(),
+        "unit": "um",
+        "normalization": "none" if band is None else "median" if band == () else {"min": band[0], "max": band[1]},
+        "spectra": spectra,
+        "retrieval_time": datetime.now().isoformat(),
+    }
+
+
+async def diagrams_api():
+    """API endpoint listing the quantities available as diagram axes"""
+    async with admit("cheap"):
+        columns = await run_in_threadpool(get_diagram_columns)
+    return {
+        "version": get_diagram_stats()["version"],
+        "columns": columns,
+        "retrieval_time": datetime.now().isoformat(),
+    }
+
+
+async def diagram_data_api(x: str, x_minus: str | None = None, y: str | None = None, y_minus: str | None = None):
+    """API endpoint returning the points of a color-magnitude or parameter diagram"""
+    try:
+        async with admit("cheap"):
+            data = await run_in_threadpool(diagram_data, x, x_minus or None, y, y_minus or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return {
+        "x_label": data["x_label"],
+        "y_label": data["y_label"],
+        "y_inverted": bool(data["y_inverted"]),
+        "sources": data["sources"].tolist(),
+        "x": data["x"].tolist(),
+        "y": data["y"].tolist(),
+        "retrieval_time": datetime.now().isoformat(),
+    }
+
+
 async def search_form(request: Request):
     """Display search form page"""
     # Create navigation context with active page
@@ -197,39 +589,48 @@ async def search_form(request: Request):
 
 
 async def search_results(request: Request, query: str = Form(...)):
+    """Serve search results from the page cache"""
+    key = cache_key("search", query=query.strip())
+    return await serve_cached(request, key, lambda: _render_search_results(request, query))
+
+
+async def _render_search_results(request: Request, query: str):
     """Process search query and display results"""
     try:
         # Validate query
         if not query.strip():
             nav_context = create_navigation_context(current_page="/search")
             return templates.TemplateResponse(
-                "search.html", {"request": request, "error": "Please enter a search term", **nav_context}
+                "search.html",
+                {"request": request, "error": "Please enter a search term", **nav_context},
+                headers=NO_STORE,
             )
 
         # Execute search using astrodbkit
-        results, execution_time = search_objects(query.strip())
-
-        # Format results for display - convert pandas DataFrame to list of dicts
-        formatted_results = results.to_dict("records")
+        async with admit("heavy"):
+            results, execution_time = await run_with_timeout("search", request, search_objects, query.strip())
 
-        # Apply source URL conversion
-        formatted_results = get_source_url(formatted_results)
+        # Stream results for display, with browse view summary columns when available
+        columns, rows = await run_in_threadpool(iter_with_browse_summaries, results)
 
         # Create navigation context with active page
         nav_context = create_navigation_context(current_page="/search")
 
-        return templates.TemplateResponse(
+        return stream_template(
             "search_results.html",
             {
                 "request": request,
                 "query_text": query.strip(),
-                "results": formatted_results,
-                "total_count": len(formatted_results),
+                "columns": columns,
+                "results": _link_sources(rows),
+                "total_count": len(results),
                 "execution_time": f"{execution_time:.3f}",
                 **nav_context,
             },
         )
 
+    except (HTTPException, QueryInterrupted):
+        raise
     except Exception as e:
         # Handle astrodbkit errors
         nav_context = create_navigation_context(current_page="/search")
@@ -244,28 +645,29 @@ async def search_results(request: Request, query: str = Form(...)):
                 "execution_time": "0.000",
                 **nav_context,
             },
+            headers=NO_STORE,
         )
 
 
-async def search_api(query: str = Form(...)):
+async def search_api(query: str = Form(...), request: Request = None):
     """API endpoint for programmatic search access"""
     try:
         if not query.strip():
             raise HTTPException(status_code=400, detail="Query parameter is required")
 
-        results, execution_time = search_objects(query.strip())
+        async with admit("heavy"):
+            results, execution_time = await run_with_timeout("search", request, search_objects, query.strip())
 
-        # Convert pandas DataFrame to list of dicts
-        formatted_results = results.to_dict("records")
-
-        return {
-            "results": formatted_results,
-            "total_count": len(formatted_results),
-            "query_text": query.strip(),
-            "search_time": datetime.now().isoformat(),
-            "execution_time": execution_time,
-        }
+        return records_response(
+            results,
+            total_count=len(results),
+            query_text=query.strip(),
+            search_time=datetime.now().isoformat(),
+            execution_time=execution_time,
+        )
 
+    except (HTTPException, QueryInterrupted):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during search: {e}")
 
@@ -273,6 +675,14 @@ async def search_api(query: str = Form(...)):
 async def cone_search_results(
     request: Request, coordinates: str = Form(...), radius: str = Form(...), radius_unit: str = Form(...)
 ):
+    """Serve cone search results from the page cache"""
+    key = cache_key("cone", coordinates=coordinates.strip(), radius=radius.strip(), radius_unit=radius_unit)
+    return await serve_cached(
+        request, key, lambda: _render_cone_search_results(request, coordinates, radius, radius_unit)
+    )
+
+
+async def _render_cone_search_results(request: Request, coordinates: str, radius: str, radius_unit: str):
     """Process cone search query and display results"""
 
     # Create navigation context
@@ -286,26 +696,27 @@ async def cone_search_results(
         radius_degrees = convert_radius_to_degrees(radius, radius_unit)
 
         # Execute cone search
-        results, execution_time = cone_search(ra_decimal, dec_decimal, radius_degrees)
+        async with admit(await run_in_threadpool(classify_cone_search, radius_degrees)):
+            results, execution_time = await run_with_timeout(
+                "cone", request, cone_search, ra_decimal, dec_decimal, radius_degrees
+            )
 
         # Check if results were truncated
         warning = None
-        if len(results) >= 10000:
+        if len(results) >= CONE_SEARCH_LIMIT:
             warning = "Results limited to 10,000 objects. Refine search to see all results."
 
-        # Format results for display
-        formatted_results = results.to_dict("records")
-
-        # Apply source URL conversion
-        formatted_results = get_source_url(formatted_results)
+        # Stream results for display, with browse view summary columns when available
+        columns, rows = await run_in_threadpool(iter_with_browse_summaries, results)
 
-        return templates.TemplateResponse(
+        return stream_template(
             "search_results.html",
             {
                 "request": request,
                 "query_text": f"Coords={coordinates}, Radius={radius} {radius_unit}",
-                "results": formatted_results,
-                "total_count": len(formatted_results),
+                "columns": columns,
+                "results": _link_sources(rows),
+                "total_count": len(results),
                 "execution_time": f"{execution_time:.3f}",
                 "warning": warning,
                 "coordinates_input": coordinates,
@@ -315,9 +726,13 @@ async def cone_search_results(
             },
         )
 
+    except (HTTPException, QueryInterrupted):
+        raise
     except ValueError as e:
         # Validation errors - return to search page with error
-        return templates.TemplateResponse("search.html", {"request": request, "error": str(e), **nav_context})
+        return templates.TemplateResponse(
+            "search.html", {"request": request, "error": str(e), **nav_context}, headers=NO_STORE
+        )
     except Exception as e:
         # Database errors - return results page with error
         return templates.TemplateResponse(
@@ -331,10 +746,13 @@ async def cone_search_results(
                 "execution_time": "0.000",
                 **nav_context,
             },
+            headers=NO_STORE,
         )
 
 
-async def cone_search_api(coordinates: str = Form(...), radius: str = Form(...), radius_unit: str = Form(...)):
+async def cone_search_api(
+    coordinates: str = Form(...), radius: str = Form(...), radius_unit: str = Form(...), request: Request = None
+):
     """API endpoint for programmatic cone search access"""
     try:
         # Parse and validate inputs
@@ -342,40 +760,46 @@ async def cone_search_api(coordinates: str = Form(...), radius: str = Form(...),
         radius_degrees = convert_radius_to_degrees(radius, radius_unit)
 
         # Execute search
-        results, execution_time = cone_search(ra_decimal, dec_decimal, radius_degrees)
+        async with admit(await run_in_threadpool(classify_cone_search, radius_degrees)):
+            results, execution_time = await run_with_timeout(
+                "cone", request, cone_search, ra_decimal, dec_decimal, radius_degrees
+            )
 
         # Check for truncation
         warning = None
-        if len(results) >= 10000:
-            warning = "Results limited to 10,000 objects. Refine search to see all results."
-
-        # Format results
-        formatted_results = results.to_dict("records")
+        if len(results) >= CONE_SEARCH_LIMIT:
+            warning = (
+                "Results limited to 10,000 objects. Refine search, or submit a cone_search job to /api/jobs "
+                "for all results."
+            )
 
-        return {
-            "results": formatted_results,
-            "total_count": len(formatted_results),
-            "coordinates_input": coordinates,
-            "radius_value": radius,
-            "radius_unit": radius_unit,
-            "search_time": datetime.now().isoformat(),
-            "execution_time": execution_time,
-            "warning": warning,
-        }
+        return records_response(
+            results,
+            total_count=len(results),
+            coordinates_input=coordinates,
+            radius_value=radius,
+            radius_unit=radius_unit,
+            search_time=datetime.now().isoformat(),
+            execution_time=execution_time,
+            warning=warning,
+        )
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except (HTTPException, QueryInterrupted):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during search: {e}")
 
 
-async def inventory_api(source_name: str = Form(...)):
+async def inventory_api(source_name: str = Form(...), request: Request = None):
     """API endpoint for programmatic inventory access"""
     try:
         if not source_name.strip():
             raise HTTPException(status_code=400, detail="source_name parameter is required")
 
-        inventory_data = get_source_inventory(source_name.strip())
+        async with admit("cheap"):
+            inventory_data = await run_with_timeout("inventory", request, get_source_inventory, source_name.strip())
 
         if inventory_data is None:
             raise HTTPException(status_code=404, detail=f"Source not found: {source_name.strip()}")
@@ -386,12 +810,234 @@ async def inventory_api(source_name: str = Form(...)):
             "retrieval_time": datetime.now().isoformat(),
         }
 
-    except HTTPException:
+    except (HTTPException, QueryInterrupted):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
 
+async def similar_api(source: str, k: int | None = None):
+    """API endpoint returning the sources nearest to a source in photometry, spectral type and modeled parameters"""
+    if not source.strip():
+        raise HTTPException(status_code=400, detail="source parameter is required")
+    # Building a missing or outdated index pivots whole tables, so it is admitted as heavy work
+    pool = "cheap" if await run_in_threadpool(get_similar_index, False) is not None else "heavy"
+    try:
+        async with admit(pool):
+            similar = await run_in_threadpool(similar_sources, source.strip(), SIMILAR_DEFAULT_K if k is None else k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    if similar is None:
+        raise HTTPException(
+            status_code=404, detail=f"Source not found or without enough photometry and parameters: {source.strip()}"
+        )
+    return {**similar, "retrieval_time": datetime.now().isoformat()}
+
+
+async def autocomplete_api(q: str, limit: int = 10):
+    """API endpoint suggesting source names that start with the given text"""
+    if not q.strip():
+        return {"query": q, "names": []}
+    limit = max(1, min(limit, 50))
+    names = await run_in_threadpool(autocomplete_source_names, q.strip(), limit)
+    return {"query": q.strip(), "names": names}
+
+
+def _iso(timestamp):
+    """Format a job timestamp (seconds since the epoch) for JSON responses."""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+def job_response(job):
+    """
+    Describe a background job for the job API.
+
+    Args:
+        job (dict): Job from src.database.jobs.get_job()
+
+    Returns:
+        dict: Job status, progress, timestamps and the URLs to follow it and download its result
+    """
+    base_url = f"/api/jobs/{job['id']}"
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "params": job["params"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "message": job["message"],
+        "result_rows": job["result_rows"],
+        "database_version": job["database_version"],
+        "created": _iso(job["created"]),
+        "started": _iso(job["started"]),
+        "finished": _iso(job["finished"]),
+        "expires": _iso(job["expires"]),
+        "status_url": base_url,
+        "events_url": f"{base_url}/events",
+        "result_url": f"{base_url}/result" if job["status"] == "done" else None,
+    }
+
+
+async def submit_job_api(
+    kind: str = Form(...),
+    coordinates: str = Form(None),
+    radius: str = Form(None),
+    radius_unit: str = Form("degrees"),
+    sources: str = Form(None),
+):
+    """API endpoint queuing a background job (cone search, bulk inventory or catalog export)"""
+    try:
+        if kind == "cone_search":
+            if not coordinates or not radius:
+                raise ValueError("coordinates and radius are required for a cone search job")
+            ra_decimal, dec_decimal = parse_coordinates_string(coordinates)
+            radius_deg = convert_radius_to_degrees(radius, radius_unit)
+            params = {"ra": ra_decimal, "dec": dec_decimal, "radius_deg": radius_deg}
+        elif kind == "inventory":
+            # One source per line
+            names = list(dict.fromkeys(name.strip() for name in (sources or "").splitlines() if name.strip()))
+            if not names:
+                raise ValueError("sources (one per line) are required for an inventory job")
+            params = {"sources": names}
+        elif kind == "export":
+            params = {}
+        else:
+            raise ValueError(f"Unknown job kind: {kind}. Must be one of {', '.join(JOB_KINDS)}")
+
+        job, deduplicated = await run_in_threadpool(submit_job, kind, params)
+        if not deduplicated:
+            notify_job_runner()
+        return JSONResponse(
+            status_code=200 if deduplicated else 202,
+            content={**job_response(job), "deduplicated": deduplicated},
+            headers={"Location": f"/api/jobs/{job['id']}"},
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred submitting the job: {e}") from e
+
+
+async def _get_job_or_404(job_id: str):
+    """Look up a job, raising 404 if it does not exist"""
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+async def job_status_api(job_id: str):
+    """API endpoint reporting the status and progress of a background job"""
+    return job_response(await _get_job_or_404(job_id))
+
+
+async def job_events(request: Request, job_id: str):
+    """Stream the progress of a background job as server-sent events until it finishes"""
+    job = await _get_job_or_404(job_id)
+
+    async def events(job):
+        last = None
+        while True:
+            state = (job["status"], job["progress"], job["message"])
+            if state != last:
+                last = state
+                yield f"event: {job['status']}\ndata: {json.dumps(job_response(job))}\n\n"
+            if job["status"] in FINISHED_STATUSES or await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            job = await run_in_threadpool(get_job, job_id)
+
+    return StreamingResponse(
+        events(job), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def job_result(job_id: str):
+    """Download the result file of a finished background job"""
+    job = await _get_job_or_404(job_id)
+    full_path = get_result_file(job)
+    if full_path is None:
+        # Expired results are gone for good; other jobs may still produce one
+        status_code = 410 if job["status"] == "expired" else 404
+        raise HTTPException(status_code=status_code, detail=f"Job {job_id} has no result ({job['status']})")
+    extension, media_type = JOB_KINDS[job["kind"]]
+    return FileResponse(full_path, media_type=media_type, filename=f"{job['kind']}-{job_id}.{extension}")
+
+
+async def exports_api(version: str | None = None):
+    """API endpoint describing a catalog export, with download URLs for each table"""
+    version = version or get_latest_version()
+    manifest = get_export_manifest(version) if version else None
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No catalog export is available")
+
+    base_url = f"/exports/{manifest['version']}"
+    for table_data in manifest["tables"].values():
+        table_data["parquet_urls"] = [f"{base_url}/{file_name}" for file_name in table_data["parquet"]]
+        table_data["arrow_url"] = f"{base_url}/{table_data['arrow']}"
+    return manifest
+
+
+async def export_file(version: str, file_path: str):
+    """Serve a file from a versioned catalog export, with HTTP range support"""
+    full_path = get_export_file(version, file_path)
+    if full_path is None:
+        raise HTTPException(status_code=404, detail=f"Export file not found: {version}/{file_path}")
+
+    # Export directories never change once written, so downloads can be cached indefinitely
+    return FileResponse(
+        full_path,
+        media_type="application/vnd.apache.arrow.file" if full_path.endswith(".arrow") else "application/octet-stream",
+        headers=IMMUTABLE,
+    )
+
+
+async def thumbnail(file_name: str):
+    """Serve a pre-rendered spectrum thumbnail; thumbnails are content-addressed, so they never change"""
+    full_path = get_thumbnail_file(file_name)
+    if full_path is None:
+        raise HTTPException(status_code=404, detail=f"Thumbnail not found: {file_name}")
+    return FileResponse(full_path, media_type="image/svg+xml", headers=IMMUTABLE)
+
+
+async def metrics_api():
+    """API endpoint reporting cache, coalescing, admission, replica, query timeout and spectrum cache counters"""
+    return {
+        "single_flight": get_single_flight_stats(),
+        "page_cache": get_page_cache_stats(),
+        "admission": get_admission_stats(),
+        "replicas": get_replica_stats(),
+        "query_timeouts": get_timeout_stats(),
+        "spatial": get_spatial_stats(),
+        "spectra_compare": get_compare_stats(),
+        "diagrams": get_diagram_stats(),
+        "similar": get_similar_stats(),
+        "catalog_store": get_catalog_store_stats(),
+        "jobs": await run_in_threadpool(get_job_stats),
+        "spectrum_cache": {**get_spectrum_cache_stats(), "prefetch": get_prefetch_stats()},
+        "retrieval_time": datetime.now().isoformat(),
+    }
+
+
+async def query_interrupted_handler(request: Request, exc: QueryInterrupted):
+    """Return a structured 504 (time limit exceeded) or 503 (cancelled) response for an interrupted query"""
+    headers = {**NO_STORE, "Retry-After": str(ADMISSION_RETRY_AFTER)} if exc.status_code == 503 else NO_STORE
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "detail": exc.message,
+            "error": "timeout" if isinstance(exc, QueryTimeout) else "cancelled",
+            "endpoint": exc.name,
+            "timeout_seconds": exc.seconds,
+        },
+        headers=headers,
+    )
+
+
 async def not_found(request: Request, path: str):
     """Render 404 error page for non-existent routes."""
     return templates.TemplateResponse("404.html", {"request": request, "path": path}, status_code=404)
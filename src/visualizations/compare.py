@@ -0,0 +1,361 @@
+"""
+Multi-source spectrum comparison.
+
+Spectra of several sources (or individual spectra by access URL) are loaded
+concurrently through the parsed spectrum cache, resampled onto a common
+wavelength grid in μm with NumPy interpolation, normalized by the median
+flux in a wavelength band, and returned as a stacked array or drawn as an
+overlay plot.
+
+Resampled fluxes are cached per spectrum and grid, and the wavelength
+coverage of each spectrum is remembered, so repeating a comparison does not
+read or interpolate any spectrum again. Normalization is applied to the
+cached fluxes on every request, so changing the band is also cheap.
+"""
+
+import contextvars
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import astropy.units as u
+import numpy as np
+from bokeh.embed import components
+from bokeh.plotting import figure
+from sqlalchemy import or_, select
+
+from src.config import (
+    COMPARE_CACHE_ENTRIES,
+    COMPARE_CONCURRENCY,
+    COMPARE_GRID_POINTS,
+    COMPARE_MAX_SPECTRA,
+    FOREIGN_KEY,
+    PRIMARY_DATATYPE,
+    SPECTRA_URL_COLUMN,
+)
+from src.database.connection import get_database
+from src.database.spectrum_cache import get_spectrum
+from src.database.timeouts import QueryInterrupted, check_budget
+
+# Upper limit on grid points requested by clients
+MAX_GRID_POINTS = 20000
+
+# Line colors, as in the spectra plot
+COLORS = ["#6366f1", "#8b5cf6", "#ec4899", "#f59e0b", "#10b981", "#3b82f6", "#ef4444", "#06b6d4", "#84cc16", "#f97316"]
+
+_lock = threading.Lock()
+_resampled = OrderedDict()
+_coverage = {}
+_stats = {"comparisons": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+
+def parse_band(value):
+    """
+    Parse a normalization band such as "1.2-1.3" or "1.2,1.3" (μm).
+
+    Args:
+        value (str): Band limits, or "" / "median" for the median over each spectrum, or "none"
+
+    Returns:
+        tuple: (low, high) in μm, None for no normalization, or () for the median over each spectrum
+
+    Raises:
+        ValueError: If the band cannot be parsed
+    """
+    value = (value or "").strip().lower()
+    if value in ("", "median"):
+        return ()
+    if value == "none":
+        return None
+    parts = value.replace(",", " ").replace("-", " ").split()
+    if len(parts) != 2:
+        raise ValueError(f"Invalid normalization band: {value}. Use e.g. 1.2-1.3 (μm), median or none")
+    low, high = sorted(float(part) for part in parts)
+    return low, high
+
+
+def get_comparison_rows(sources=(), access_urls=()):
+    """
+    Look up the Spectra table rows of sources and of individual spectra.
+
+    Only spectra listed in the Spectra table can be compared, so clients cannot
+    make the server fetch arbitrary URLs.
+
+    Args:
+        sources (list): Source identifiers
+        access_urls (list): Access URLs of individual spectra
+
+    Returns:
+        list: Spectra table rows as dictionaries, in request order without duplicates
+    """
+    db = get_database()
+    spectra = db.metadata.tables["Spectra"]
+    keys = [PRIMARY_DATATYPE(source) for source in sources]
+    query = select(spectra).where(
+        or_(spectra.c[FOREIGN_KEY].in_(keys), spectra.c[SPECTRA_URL_COLUMN].in_(list(access_urls)))
+    )
+    with db.engine.connect() as conn:
+        rows = [dict(row._mapping) for row in conn.execute(query)]
+
+    position = {}
+    for requested in [*map(str, keys), *access_urls]:
+        position.setdefault(requested, len(position))
+    rows.sort(
+        key=lambda row: min(
+            position.get(str(row[FOREIGN_KEY]), len(position)), position.get(row[SPECTRA_URL_COLUMN], len(position))
+        )
+    )
+    return list({row[SPECTRA_URL_COLUMN]: row for row in rows if row[SPECTRA_URL_COLUMN]}.values())
+
+
+def _spectrum_in_microns(access_url):
+    """Return the finite (wavelength in μm, flux) samples of a spectrum, sorted by wavelength."""
+    spectrum = get_spectrum(access_url)
+    wavelength = np.asarray(spectrum.spectral_axis.to(u.um, equivalencies=u.spectral()).value, dtype=float)
+    flux = np.asarray(spectrum.flux.value, dtype=float)
+    finite = np.isfinite(wavelength) & np.isfinite(flux)
+    order = np.argsort(wavelength[finite], kind="stable")
+    wavelength, flux = wavelength[finite][order], flux[finite][order]
+    if len(wavelength) < 2:
+        raise ValueError("Spectrum has fewer than two valid points")
+    with _lock:
+        _coverage[access_url] = (float(wavelength[0]), float(wavelength[-1]))
+    return wavelength, flux
+
+
+def make_grid(low, high, points):
+    """
+    Return an evenly spaced wavelength grid.
+
+    Args:
+        low (float): First wavelength in μm
+        high (float): Last wavelength in μm
+        points (int): Number of grid points
+
+    Returns:
+        numpy.ndarray: Grid wavelengths
+    """
+    return np.linspace(low, high, points)
+
+
+def resample(wavelength, flux, grid):
+    """
+    Linearly interpolate a spectrum onto a grid, with NaN outside its coverage.
+
+    Args:
+        wavelength (numpy.ndarray): Sorted wavelengths
+        flux (numpy.ndarray): Flux at each wavelength
+        grid (numpy.ndarray): Grid wavelengths
+
+    Returns:
+        numpy.ndarray: Flux on the grid
+    """
+    return np.interp(grid, wavelength, flux, left=np.nan, right=np.nan)
+
+
+def normalize(stack, grid, band):
+    """
+    Divide each resampled spectrum by its median flux in a band.
+
+    Args:
+        stack (numpy.ndarray): Resampled fluxes, one row per spectrum
+        grid (numpy.ndarray): Grid wavelengths
+        band (tuple): (low, high) in μm, () for the median over the whole grid, or None to skip
+
+    Returns:
+        tuple: (normalized stack, normalization factor per spectrum; NaN where the band has no flux)
+    """
+    if band is None or len(stack) == 0:
+        return stack, np.ones(len(stack))
+    in_band = np.ones(len(grid), dtype=bool) if band == () else (grid >= band[0]) & (grid <= band[1])
+    values = stack[:, in_band]
+    factors = np.full(len(stack), np.nan)
+    covered = np.isfinite(values).any(axis=1)
+    factors[covered] = np.nanmedian(values[covered], axis=1)
+    factors[factors == 0] = np.nan
+    # Spectra without flux in the band are left as they are
+    return stack / np.where(np.isfinite(factors), factors, 1.0)[:, None], factors
+
+
+def _cached(key):
+    """Return a cached resampled flux, counting a hit or miss."""
+    with _lock:
+        flux = _resampled.get(key)
+        if flux is not None:
+            _resampled.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+        return flux
+
+
+def _store(key, flux):
+    """Cache a resampled flux, evicting the least recently used beyond COMPARE_CACHE_ENTRIES."""
+    if COMPARE_CACHE_ENTRIES <= 0:
+        return
+    flux.setflags(write=False)
+    with _lock:
+        _resampled[key] = flux
+        while len(_resampled) > COMPARE_CACHE_ENTRIES:
+            _resampled.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def compare_spectra(sources=(), access_urls=(), points=COMPARE_GRID_POINTS, wavelength_range=None, band=()):
+    """
+    Resample the spectra of sources onto a common grid and normalize them.
+
+    Args:
+        sources (list): Source identifiers whose spectra are compared
+        access_urls (list): Access URLs of additional individual spectra
+        points (int): Number of grid points
+        wavelength_range (tuple): (low, high) of the grid in μm; defaults to the combined coverage
+        band (tuple): Normalization band from parse_band()
+
+    Returns:
+        dict: "grid" (μm), "flux" (one row per loaded spectrum), "band", and "spectra" with the
+              metadata, status and normalization factor of every requested spectrum
+
+    Raises:
+        ValueError: If nothing is requested, or too many spectra or grid points are requested
+    """
+    if not sources and not access_urls:
+        raise ValueError("At least one source or spectrum is required")
+    if not 2 <= points <= MAX_GRID_POINTS:
+        raise ValueError(f"Grid points must be between 2 and {MAX_GRID_POINTS}")
+
+    rows = get_comparison_rows(sources, access_urls)
+    if len(rows) > COMPARE_MAX_SPECTRA:
+        raise ValueError(f"{len(rows)} spectra requested; at most {COMPARE_MAX_SPECTRA} can be compared")
+    with _lock:
+        _stats["comparisons"] += 1
+    urls = [row[SPECTRA_URL_COLUMN] for row in rows]
+
+    # Read the spectra whose coverage is unknown, or that are needed for a grid that is not cached
+    loaded, errors = {}, {}
+
+    def load(url):
+        # Stop before each download once the comparison has timed out or been cancelled
+        check_budget()
+        try:
+            return url, _spectrum_in_microns(url), None
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            return url, None, str(e)
+
+    def load_all(pending):
+        # Each download runs in a copy of this context, so it sees the caller's time budget
+        with ThreadPoolExecutor(max_workers=max(1, COMPARE_CONCURRENCY)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, load, url) for url in pending]
+            try:
+                for future in futures:
+                    url, arrays, error = future.result()
+                    if error is None:
+                        loaded[url] = arrays
+                    else:
+                        errors[url] = error
+            except QueryInterrupted:
+                for future in futures:
+                    future.cancel()
+                raise
+        check_budget()
+
+    with _lock:
+        unknown = [url for url in urls if url not in _coverage]
+    load_all(unknown)
+
+    with _lock:
+        coverage = {url: _coverage[url] for url in urls if url in _coverage and url not in errors}
+    if wavelength_range is None and coverage:
+        wavelength_range = (min(low for low, _ in coverage.values()), max(high for _, high in coverage.values()))
+    grid = make_grid(*wavelength_range, points) if coverage else np.array([])
+    grid_key = (round(wavelength_range[0], 9), round(wavelength_range[1], 9), points) if coverage else None
+
+    fluxes = {url: _cached((url, grid_key)) for url in coverage}
+    load_all([url for url, flux in fluxes.items() if flux is None and url not in loaded])
+    for url, flux in fluxes.items():
+        if flux is None and url in loaded:
+            fluxes[url] = resample(*loaded[url], grid)
+            _store((url, grid_key), fluxes[url])
+
+    displayed = [url for url in urls if fluxes.get(url) is not None]
+    stack = np.vstack([fluxes[url] for url in displayed]) if displayed else np.empty((0, len(grid)))
+    stack, factors = normalize(stack, grid, band)
+    factor_by_url = dict(zip(displayed, factors, strict=True))
+
+    spectra = []
+    for row in rows:
+        url = row[SPECTRA_URL_COLUMN]
+        factor = factor_by_url.get(url)
+        spectra.append(
+            {
+                "source": str(row[FOREIGN_KEY]),
+                "access_url": url,
+                "observation_date": str(row.get("observation_date", "-")),
+                "regime": str(row.get("regime", "-")),
+                "telescope": str(row.get("telescope", "-")),
+                "instrument": str(row.get("instrument", "-")),
+                "status": "displayed" if url in factor_by_url else "failed",
+                "error": errors.get(url),
+                "normalization": float(factor) if factor is not None and np.isfinite(factor) else None,
+            }
+        )
+
+    return {"grid": grid, "flux": stack, "band": band, "spectra": spectra}
+
+
+def generate_comparison_plot(comparison):
+    """
+    Draw the resampled spectra of a comparison as an overlay plot.
+
+    Args:
+        comparison (dict): Output of compare_spectra()
+
+    Returns:
+        dict: 'script' and 'div' components for embedding in HTML, empty if no spectrum was loaded
+    """
+    if len(comparison["flux"]) == 0:
+        return {"script": "", "div": ""}
+
+    normalized = comparison["band"] is not None
+    p = figure(
+        width=900,
+        height=500,
+        title="Spectra Comparison",
+        x_axis_label="Wavelength (μm)",
+        y_axis_label="Normalized Flux" if normalized else "Flux",
+        tools="pan,box_zoom,wheel_zoom,reset,save",
+    )
+    displayed = [spectrum for spectrum in comparison["spectra"] if spectrum["status"] == "displayed"]
+    for index, (spectrum, flux) in enumerate(zip(displayed, comparison["flux"], strict=True)):
+        p.line(
+            comparison["grid"],
+            flux,
+            legend_label=(
+                f"{spectrum['source']} | {spectrum['observation_date']} | "
+                f"{spectrum['telescope']}/{spectrum['instrument']}"
+            ),
+            line_width=2,
+            color=COLORS[index % len(COLORS)],
+            alpha=0.8,
+        )
+
+    p.background_fill_color = "#f5f5f7"
+    p.border_fill_color = "white"
+    p.legend.location = "top_left"
+    p.legend.click_policy = "hide"
+
+    script, div = components(p)
+    return {"script": script, "div": div}
+
+
+def get_compare_stats():
+    """
+    Return counters of the resampled spectrum cache.
+
+    Returns:
+        dict: Comparisons, cached resampled spectra, hits, misses and evictions
+    """
+    with _lock:
+        return {"entries": len(_resampled), "max_entries": COMPARE_CACHE_ENTRIES, **_stats}
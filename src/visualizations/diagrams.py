@@ -0,0 +1,356 @@
+"""
+Color-magnitude and parameter diagrams.
+
+The Photometry table is pivoted once per database version into a columnar
+table with one row per source and one column per band (mean magnitude),
+joined with the adopted spectral type code and adopted modeled parameters.
+The table is kept in memory and saved under DIAGRAM_DIR as a compressed
+NumPy archive named after the database version, so other workers and
+restarts load it instead of repeating the join.
+
+Each diagram axis is a column, or the difference of two columns (a color
+such as 2MASS.J - 2MASS.Ks), computed with vectorized NumPy arithmetic on
+the cached table and drawn with Bokeh's WebGL backend.
+
+Build the table for the current database version ahead of the first request with:
+
+    python -m src.visualizations.diagrams
+"""
+
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from bokeh.embed import components
+from bokeh.models import ColumnDataSource
+from bokeh.plotting import figure
+from sqlalchemy import select
+
+from src.config import DIAGRAM_DIR, FOREIGN_KEY
+from src.database.changes import get_database_version
+from src.database.connection import HEAVY_ROLE, get_database
+from src.database.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+PHOTOMETRY_TABLE = "Photometry"
+SPECTRAL_TYPES_TABLE = "SpectralTypes"
+PARAMETERS_TABLE = "ModeledParameters"
+
+# Column kinds; magnitude axes are drawn inverted (brighter is up)
+BAND = "band"
+SPECTRAL_TYPE = "spectral_type"
+PARAMETER = "parameter"
+
+SPECTRAL_TYPE_COLUMN = "Spectral type"
+
+_lock = threading.Lock()
+_table = {"version": None, "sources": None, "columns": [], "kinds": [], "values": None}
+_stats = {"built": 0, "loaded": 0, "diagrams": 0}
+
+
+def _read_table(conn, db, table_name, columns):
+    """Read columns of a table into a DataFrame, or return None if the table does not exist."""
+    table = db.metadata.tables.get(table_name)
+    if table is None or any(name not in table.c for name in columns):
+        return None
+    result = conn.execute(select(*(table.c[name] for name in columns)))
+    return pd.DataFrame(result.fetchall(), columns=columns)
+
+
+def _adopted_first(frame, keys):
+    """Keep one row per key, preferring adopted rows."""
+    if "adopted" in frame:
+        frame = frame.sort_values("adopted", ascending=False, na_position="last", kind="stable")
+    return frame.drop_duplicates(keys)
+
+
+def pivot_diagram_table(photometry, spectral_types=None, parameters=None):
+    """
+    Pivot per-source band magnitudes and join spectral types and parameters.
+
+    Args:
+        photometry (pandas.DataFrame): FOREIGN_KEY, band and magnitude columns
+        spectral_types (pandas.DataFrame): FOREIGN_KEY, spectral_type_code and adopted columns
+        parameters (pandas.DataFrame): FOREIGN_KEY, parameter, value and adopted columns
+
+    Returns:
+        tuple: (table, kinds) where table is a float DataFrame indexed by source and kinds maps
+               each column to BAND, SPECTRAL_TYPE or PARAMETER
+    """
+    frames, kinds = [], {}
+    if photometry is not None and not photometry.empty:
+        photometry = photometry.assign(magnitude=pd.to_numeric(photometry["magnitude"], errors="coerce"))
+        bands = photometry.pivot_table(index=FOREIGN_KEY, columns="band", values="magnitude", aggfunc="mean")
+        frames.append(bands)
+        kinds.update(dict.fromkeys(bands.columns, BAND))
+    if spectral_types is not None and not spectral_types.empty:
+        adopted = _adopted_first(spectral_types, [FOREIGN_KEY]).set_index(FOREIGN_KEY)
+        codes = pd.to_numeric(adopted["spectral_type_code"], errors="coerce")
+        frames.append(codes.rename(SPECTRAL_TYPE_COLUMN).to_frame())
+        kinds[SPECTRAL_TYPE_COLUMN] = SPECTRAL_TYPE
+    if parameters is not None and not parameters.empty:
+        adopted = _adopted_first(parameters, [FOREIGN_KEY, "parameter"])
+        adopted = adopted.assign(value=pd.to_numeric(adopted["value"], errors="coerce"))
+        values = adopted.pivot(index=FOREIGN_KEY, columns="parameter", values="value")
+        # Parameters named like a band keep the band column
+        values = values[[name for name in values.columns if name not in kinds]]
+        frames.append(values)
+        kinds.update(dict.fromkeys(values.columns, PARAMETER))
+
+    if not frames:
+        return pd.DataFrame(dtype=float), {}
+    table = pd.concat(frames, axis=1, join="outer").astype(float)
+    table.index = table.index.astype(str)
+    table.columns = [str(name) for name in table.columns]
+    return table, {str(name): kind for name, kind in kinds.items()}
+
+
+def _archive_path(version):
+    """Return the saved table file of a database version."""
+    return os.path.join(DIAGRAM_DIR, f"{version}.npz")
+
+
+def _save(version, sources, columns, kinds, values):
+    """Atomically save a diagram table and delete the tables of other versions."""
+    os.makedirs(DIAGRAM_DIR, exist_ok=True)
+    path = _archive_path(version)
+    with open(f"{path}.tmp-{os.getpid()}", "wb") as f:
+        np.savez_compressed(
+            f, sources=sources, columns=np.array(columns, dtype=str), kinds=np.array(kinds, dtype=str), values=values
+        )
+    os.replace(f"{path}.tmp-{os.getpid()}", path)
+    for entry in os.scandir(DIAGRAM_DIR):
+        if entry.name.endswith(".npz") and entry.path != path:
+            os.remove(entry.path)
+
+
+def _load(version):
+    """Load a saved diagram table, or return None if it does not exist."""
+    try:
+        with np.load(_archive_path(version)) as archive:
+            return (
+                archive["sources"],
+                archive["columns"].tolist(),
+                archive["kinds"].tolist(),
+                np.asfortranarray(archive["values"]),
+            )
+    except FileNotFoundError:
+        return None
+
+
+@single_flight("diagram_table")
+def build_diagram_table(version):
+    """
+    Pivot the Photometry, SpectralTypes and ModeledParameters tables for a database version.
+
+    Args:
+        version (str): Database version the table is saved under
+
+    Returns:
+        tuple: (sources, columns, kinds, values) with values as a column-major float array
+    """
+    saved = _load(version)
+    if saved is not None:
+        with _lock:
+            _stats["loaded"] += 1
+        return saved
+
+    db = get_database(HEAVY_ROLE)
+    with db.engine.connect() as conn:
+        photometry = _read_table(conn, db, PHOTOMETRY_TABLE, [FOREIGN_KEY, "band", "magnitude"])
+        spectral_types = _read_table(conn, db, SPECTRAL_TYPES_TABLE, [FOREIGN_KEY, "spectral_type_code", "adopted"])
+        parameters = _read_table(conn, db, PARAMETERS_TABLE, [FOREIGN_KEY, "parameter", "value", "adopted"])
+    table, kinds = pivot_diagram_table(photometry, spectral_types, parameters)
+
+    sources = table.index.to_numpy(dtype=str)
+    columns = list(table.columns)
+    values = np.asfortranarray(table.to_numpy(dtype=float))
+    _save(version, sources, columns, [kinds[name] for name in columns], values)
+    with _lock:
+        _stats["built"] += 1
+    logger.info(f"Built diagram table of {len(sources)} sources and {len(columns)} columns for version {version}")
+    return sources, columns, [kinds[name] for name in columns], values
+
+
+def get_diagram_table():
+    """
+    Return the diagram table of the current database version, building it when the version has changed.
+
+    Returns:
+        dict: "version", "sources", "columns", "kinds" and "values" (sources x columns)
+    """
+    version = get_database_version()
+    with _lock:
+        if _table["version"] == version:
+            return dict(_table)
+    sources, columns, kinds, values = build_diagram_table(version)
+    with _lock:
+        _table.update(version=version, sources=sources, columns=columns, kinds=kinds, values=values)
+        return dict(_table)
+
+
+def get_diagram_columns():
+    """
+    List the quantities available as diagram axes.
+
+    Returns:
+        list: {"name", "kind", "count"} for every column, count being the sources with a value
+    """
+    table = get_diagram_table()
+    counts = np.isfinite(table["values"]).sum(axis=0) if len(table["columns"]) else []
+    return [
+        {"name": name, "kind": kind, "count": int(count)}
+        for name, kind, count in zip(table["columns"], table["kinds"], counts, strict=True)
+    ]
+
+
+def axis_values(table, column, minus=None):
+    """
+    Compute an axis: a column, or the difference of two columns.
+
+    Args:
+        table (dict): Diagram table from get_diagram_table()
+        column (str): Column name
+        minus (str): Column subtracted from the first one, e.g. a second band for a color
+
+    Returns:
+        numpy.ndarray: Axis value per source (NaN where either column is missing)
+
+    Raises:
+        ValueError: If a column does not exist
+    """
+    names = [column] if not minus else [column, minus]
+    for name in names:
+        if name not in table["columns"]:
+            raise ValueError(f"Unknown diagram column: {name}")
+    values = table["values"][:, table["columns"].index(column)]
+    if minus:
+        values = values - table["values"][:, table["columns"].index(minus)]
+    return values
+
+
+def axis_label(column, minus=None):
+    """Return the label of an axis."""
+    return f"{column} − {minus}" if minus else column
+
+
+def default_axes(table):
+    """
+    Choose a color-magnitude diagram (first band minus last band vs. last band) when there are two bands.
+
+    Returns:
+        tuple: (x, x_minus, y, y_minus), with None for unused parts
+    """
+    bands = [name for name, kind in zip(table["columns"], table["kinds"], strict=True) if kind == BAND]
+    others = [name for name, kind in zip(table["columns"], table["kinds"], strict=True) if kind != BAND]
+    if len(bands) >= 2:
+        return bands[0], bands[-1], bands[-1], None
+    if SPECTRAL_TYPE_COLUMN in table["columns"] and len(table["columns"]) >= 2:
+        y = next(name for name in table["columns"] if name != SPECTRAL_TYPE_COLUMN)
+        return SPECTRAL_TYPE_COLUMN, None, y, None
+    columns = bands + others
+    if len(columns) >= 2:
+        return columns[0], None, columns[1], None
+    return None, None, None, None
+
+
+def diagram_data(x, x_minus=None, y=None, y_minus=None):
+    """
+    Compute the points of a diagram.
+
+    Args:
+        x (str): X axis column
+        x_minus (str): Column subtracted from the x column
+        y (str): Y axis column
+        y_minus (str): Column subtracted from the y column
+
+    Returns:
+        dict: "sources", "x" and "y" arrays for sources with both values, and the axis labels
+
+    Raises:
+        ValueError: If a column does not exist
+    """
+    table = get_diagram_table()
+    with _lock:
+        _stats["diagrams"] += 1
+    x_values = axis_values(table, x, x_minus)
+    y_values = axis_values(table, y, y_minus)
+    valid = np.isfinite(x_values) & np.isfinite(y_values)
+    return {
+        "sources": table["sources"][valid],
+        "x": x_values[valid],
+        "y": y_values[valid],
+        "x_label": axis_label(x, x_minus),
+        "y_label": axis_label(y, y_minus),
+        # Magnitudes are plotted with brighter (smaller) values up
+        "y_inverted": not y_minus and table["kinds"][table["columns"].index(y)] == BAND,
+    }
+
+
+def create_diagram_plot(x=None, x_minus=None, y=None, y_minus=None):
+    """
+    Create a WebGL scatter plot of two diagram axes.
+
+    Args:
+        x (str): X axis column (default: see default_axes)
+        x_minus (str): Column subtracted from the x column
+        y (str): Y axis column
+        y_minus (str): Column subtracted from the y column
+
+    Returns:
+        dict: 'script', 'div', the selected axes, available 'columns' and 'points' plotted
+
+    Raises:
+        ValueError: If a column does not exist
+    """
+    table = get_diagram_table()
+    if x is None or y is None:
+        x, x_minus, y, y_minus = default_axes(table)
+    axes = {"x": x, "x_minus": x_minus, "y": y, "y_minus": y_minus}
+    if x is None:
+        return {"script": "", "div": "", "columns": table["columns"], "points": 0, **axes}
+
+    data = diagram_data(x, x_minus, y, y_minus)
+    p = figure(
+        width=800,
+        height=500,
+        title=f"{data['y_label']} vs {data['x_label']}",
+        x_axis_label=data["x_label"],
+        y_axis_label=data["y_label"],
+        tools="hover,pan,box_zoom,wheel_zoom,reset,save",
+        output_backend="webgl",
+    )
+    source = ColumnDataSource({"x": data["x"], "y": data["y"], "source": data["sources"].astype(object)})
+    p.scatter("x", "y", size=6, alpha=0.6, color="#6366f1", marker="circle", source=source)
+    p.hover.tooltips = [("Source", "@source"), (data["x_label"], "@x"), (data["y_label"], "@y")]
+    p.y_range.flipped = data["y_inverted"]
+    p.background_fill_color = "#f5f5f7"
+    p.border_fill_color = "white"
+
+    script, div = components(p)
+    return {"script": script, "div": div, "columns": table["columns"], "points": len(data["x"]), **axes}
+
+
+def get_diagram_stats():
+    """
+    Return the cached diagram table and how often it was built, loaded and read.
+
+    Returns:
+        dict: Cached version, source and column counts, tables built and loaded from disk, diagrams computed
+    """
+    with _lock:
+        return {
+            "version": _table["version"],
+            "sources": len(_table["sources"]) if _table["sources"] is not None else 0,
+            "columns": len(_table["columns"]),
+            **_stats,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    table = get_diagram_table()
+    print(f"Diagram table for version {table['version']}: {len(table['sources'])} sources, columns {table['columns']}")
@@ -7,8 +7,35 @@ coordinates from the Sources table.
 
 from bokeh.plotting import figure
 from bokeh.embed import components
+import numpy as np
+from src.database.catalog_store import get_current_catalog, source_names
 from src.database.sources import get_all_sources
-from src.config import RA_COLUMN, DEC_COLUMN
+from src.config import RA_COLUMN, DEC_COLUMN, SOURCE_COLUMN
+
+
+def _catalog_positions():
+    """
+    Return the positions and names of sources with valid coordinates.
+
+    Reads the shared catalog arrays when they are current, and the Sources table otherwise.
+
+    Returns:
+        tuple: (ras, decs, source_ids) arrays, or None if no data is available
+    """
+    catalog = get_current_catalog()
+    if catalog is not None:
+        valid = np.flatnonzero(np.isfinite(catalog["ra"]) & np.isfinite(catalog["dec"]))
+        return catalog["ra"][valid], catalog["dec"][valid], np.array(source_names(catalog, valid), dtype=object)
+
+    sources_data = get_all_sources()
+    if sources_data is None:
+        return None
+    valid_sources = sources_data.dropna(subset=[RA_COLUMN, DEC_COLUMN])
+    return (
+        valid_sources[RA_COLUMN].to_numpy(),
+        valid_sources[DEC_COLUMN].to_numpy(),
+        valid_sources[SOURCE_COLUMN].astype(str).to_numpy(),
+    )
 
 
 def create_scatter_plot():
@@ -18,17 +45,10 @@ def create_scatter_plot():
     Returns:
         dict: Dictionary with 'script' and 'div' components for embedding in HTML.
     """
-    # Get Sources data from database
-    sources_data = get_all_sources()
-
-    # Filter sources with valid ra and dec coordinates
-    valid_sources = [
-        s
-        for s in sources_data
-        if sources_data is not None and s.get(RA_COLUMN) is not None and s.get(DEC_COLUMN) is not None
-    ]
+    # Get coordinates of sources with valid ra and dec
+    positions = _catalog_positions()
 
-    if not valid_sources:
+    if positions is None or len(positions[0]) == 0:
         # Return empty plot if no valid data
         p = figure(
             width=800,
@@ -39,10 +59,7 @@ def create_scatter_plot():
             tools="pan,box_zoom,wheel_zoom,reset,save",
         )
     else:
-        # Extract ra and dec values
-        ras = [s[RA_COLUMN] for s in valid_sources]
-        decs = [s[DEC_COLUMN] for s in valid_sources]
-        source_ids = [s.get("source", "") for s in valid_sources]
+        ras, decs, source_ids = positions
 
         # Create figure
         p = figure(
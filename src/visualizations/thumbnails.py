@@ -0,0 +1,315 @@
+"""
+Pre-rendered spectrum thumbnails.
+
+Every row of the Spectra table gets a small SVG sparkline of its decimated
+spectrum. Thumbnails are stored in a content-addressed cache under
+THUMBNAIL_DIR: the file name is a hash of the access URL and of the spectrum
+file, so a thumbnail never changes once written and is served with immutable
+cache headers. An index maps each access URL to its current thumbnail.
+
+Thumbnails are only rendered by this background pipeline, never while a page
+is served. Render the missing thumbnails with:
+
+    python -m src.visualizations.thumbnails
+
+or let the application render them for each new database version with
+ASTRO_WEB_THUMBNAIL_INTERVAL_SECONDS.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from html import escape
+
+import astropy.units as u
+import numpy as np
+from astropy.utils.data import download_file
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from src.config import SPECTRA_URL_COLUMN, THUMBNAIL_DIR, THUMBNAIL_POINTS
+from src.database.changes import get_database_version
+from src.database.connection import HEAVY_ROLE, get_database
+from src.database.spectrum_cache import read_spectrum
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+
+# Thumbnail size in pixels and line color (indigo, as in the spectra plot)
+WIDTH = 160
+HEIGHT = 48
+PADDING = 2
+COLOR = "#6366f1"
+
+_THUMBNAIL_NAME = re.compile(r"[0-9a-f]{32}\.svg")
+
+_lock = threading.Lock()
+_index = {"mtime": None, "version": None, "thumbnails": {}}
+
+
+def _file_hash(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def thumbnail_key(access_url, file_hash):
+    """
+    Return the content address of a thumbnail.
+
+    Args:
+        access_url (str): Access URL of the spectrum
+        file_hash (str): SHA-256 hex digest of the spectrum file
+
+    Returns:
+        str: 32 character hex key
+    """
+    return hashlib.sha256(f"{access_url}\n{file_hash}".encode()).hexdigest()[:32]
+
+
+def decimate(wavelength, flux, points=THUMBNAIL_POINTS):
+    """
+    Reduce a spectrum to at most `points` points by averaging consecutive samples.
+
+    Non-finite values are dropped and the result is sorted by wavelength.
+
+    Args:
+        wavelength (numpy.ndarray): Spectral axis values
+        flux (numpy.ndarray): Flux values
+        points (int): Maximum number of points to keep
+
+    Returns:
+        tuple: (wavelength, flux) arrays
+    """
+    wavelength = np.asarray(wavelength, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    finite = np.isfinite(wavelength) & np.isfinite(flux)
+    order = np.argsort(wavelength[finite], kind="stable")
+    wavelength, flux = wavelength[finite][order], flux[finite][order]
+    if len(flux) <= points:
+        return wavelength, flux
+
+    starts = np.linspace(0, len(flux), points + 1).astype(int)[:-1]
+    counts = np.diff(np.append(starts, len(flux)))
+    return np.add.reduceat(wavelength, starts) / counts, np.add.reduceat(flux, starts) / counts
+
+
+def render_sparkline(wavelength, flux, unit=""):
+    """
+    Render a decimated spectrum as an SVG sparkline.
+
+    The flux axis is scaled between its 1st and 99th percentiles so single
+    spikes do not flatten the line.
+
+    Args:
+        wavelength (numpy.ndarray): Decimated spectral axis values
+        flux (numpy.ndarray): Decimated flux values
+        unit (str): Spectral axis unit for the title
+
+    Returns:
+        str: SVG document, or None if there are fewer than two points
+    """
+    if len(flux) < 2:
+        return None
+
+    low, high = np.percentile(flux, [1, 99])
+    scale = (high - low) or 1.0
+    x = PADDING + (wavelength - wavelength[0]) / ((wavelength[-1] - wavelength[0]) or 1.0) * (WIDTH - 2 * PADDING)
+    y = PADDING + (1 - np.clip((flux - low) / scale, 0, 1)) * (HEIGHT - 2 * PADDING)
+    points = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y, strict=True))
+    title = escape(f"{wavelength[0]:.3g}–{wavelength[-1]:.3g} {unit}".strip())
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}">'
+        f"<title>{title}</title>"
+        f'<polyline fill="none" stroke="{COLOR}" stroke-width="1.2" stroke-linejoin="round" points="{points}"/>'
+        "</svg>"
+    )
+
+
+def _spectrum_arrays(spectrum):
+    """Return the spectral axis (in μm when possible), flux and axis unit of a spectrum."""
+    try:
+        spectral_axis = spectrum.spectral_axis.to(u.um, equivalencies=u.spectral())
+    except u.UnitConversionError:
+        spectral_axis = spectrum.spectral_axis
+    return spectral_axis.value, np.asarray(spectrum.flux.value), spectral_axis.unit.to_string()
+
+
+def render_thumbnail(access_url, refresh=False):
+    """
+    Render the thumbnail of one spectrum file into the cache, unless it already exists.
+
+    Args:
+        access_url (str): Access URL of the spectrum
+        refresh (bool): Download the file again instead of hashing the copy in the download cache
+
+    Returns:
+        tuple: (key, rendered) where rendered is False when the cached thumbnail was reused
+
+    Raises:
+        ValueError: If the spectrum has too few valid points to plot
+    """
+    # Remote files are downloaded once into astropy's download cache; refreshing replaces the cached copy
+    path = download_file(access_url, cache="update" if refresh else True)
+    key = thumbnail_key(access_url, _file_hash(path))
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{key}.svg")
+    if os.path.exists(thumbnail_path):
+        return key, False
+
+    wavelength, flux, unit = _spectrum_arrays(read_spectrum(path))
+    svg = render_sparkline(*decimate(wavelength, flux), unit=unit)
+    if svg is None:
+        raise ValueError(f"Spectrum {access_url} has no valid points to plot")
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    with open(f"{thumbnail_path}.tmp", "w") as f:
+        f.write(svg)
+    os.replace(f"{thumbnail_path}.tmp", thumbnail_path)
+    return key, True
+
+
+def _load_index():
+    """Return the thumbnail index, re-reading the index file when it has changed."""
+    index_path = os.path.join(THUMBNAIL_DIR, INDEX_FILE)
+    try:
+        mtime = os.stat(index_path).st_mtime_ns
+    except FileNotFoundError:
+        return {"version": None, "thumbnails": {}}
+
+    with _lock:
+        if _index["mtime"] != mtime:
+            try:
+                with open(index_path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading thumbnail index: {e}")
+                return {"version": None, "thumbnails": {}}
+            _index.update(mtime=mtime, version=data.get("version"), thumbnails=data.get("thumbnails", {}))
+        return {"version": _index["version"], "thumbnails": _index["thumbnails"]}
+
+
+def _save_index(version, thumbnails):
+    """Atomically write the thumbnail index."""
+    index_path = os.path.join(THUMBNAIL_DIR, INDEX_FILE)
+    with open(f"{index_path}.tmp", "w") as f:
+        json.dump({"version": version, "thumbnails": thumbnails}, f)
+    os.replace(f"{index_path}.tmp", index_path)
+
+
+def get_thumbnail_keys(access_urls):
+    """
+    Look up the cached thumbnails of spectra.
+
+    Args:
+        access_urls (list): Access URLs of spectra
+
+    Returns:
+        dict: Access URL -> thumbnail key, for the spectra that have a thumbnail
+    """
+    thumbnails = _load_index()["thumbnails"]
+    return {url: thumbnails[url] for url in access_urls if url in thumbnails}
+
+
+def get_thumbnail_file(file_name):
+    """
+    Resolve a thumbnail file in the cache.
+
+    Args:
+        file_name (str): Thumbnail file name ("<key>.svg")
+
+    Returns:
+        str: Path to the file, or None if the name is invalid or the thumbnail does not exist
+    """
+    if not _THUMBNAIL_NAME.fullmatch(file_name):
+        return None
+    path = os.path.join(THUMBNAIL_DIR, file_name)
+    return path if os.path.isfile(path) else None
+
+
+def build_thumbnails(refresh=False):
+    """
+    Render the thumbnails of every row of the Spectra table.
+
+    Spectra already in the index are skipped unless `refresh` is set, in which
+    case their files are downloaded and hashed again and re-rendered if they changed.
+    Thumbnails no longer referenced by the index are deleted.
+
+    Args:
+        refresh (bool): Re-check spectra that already have a thumbnail
+
+    Returns:
+        dict: Counts of "spectra", "rendered", "reused" and "failed" thumbnails
+    """
+    version = get_database_version()
+    db = get_database(HEAVY_ROLE)
+    url_column = db.metadata.tables["Spectra"].c[SPECTRA_URL_COLUMN]
+    with db.engine.connect() as conn:
+        access_urls = [url for url in conn.execute(select(url_column).distinct()).scalars() if url]
+
+    previous = _load_index()["thumbnails"]
+    thumbnails = {}
+    counts = {"spectra": len(access_urls), "rendered": 0, "reused": 0, "failed": 0}
+    for access_url in access_urls:
+        if not refresh and access_url in previous and get_thumbnail_file(f"{previous[access_url]}.svg"):
+            thumbnails[access_url] = previous[access_url]
+            counts["reused"] += 1
+            continue
+        try:
+            key, rendered = render_thumbnail(access_url, refresh=refresh)
+        except Exception:
+            logger.exception(f"Error rendering thumbnail for {access_url}")
+            counts["failed"] += 1
+            continue
+        thumbnails[access_url] = key
+        counts["rendered" if rendered else "reused"] += 1
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    _save_index(version, thumbnails)
+
+    # Remove thumbnails of spectra that were deleted or whose files changed
+    keep = {f"{key}.svg" for key in thumbnails.values()}
+    for entry in os.scandir(THUMBNAIL_DIR):
+        if _THUMBNAIL_NAME.fullmatch(entry.name) and entry.name not in keep:
+            os.remove(entry.path)
+
+    logger.info(f"Thumbnails for database version {version}: {counts}")
+    return counts
+
+
+async def schedule_thumbnails(interval):
+    """
+    Render thumbnails whenever the database version has changed, checking periodically until cancelled.
+
+    Args:
+        interval (float): Seconds between checks
+    """
+    while True:
+        try:
+            if _load_index()["version"] != await run_in_threadpool(get_database_version):
+                await run_in_threadpool(build_thumbnails)
+        except Exception:
+            logger.exception("Error rendering thumbnails")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render spectrum thumbnails for the Spectra table.")
+    parser.add_argument("--refresh", action="store_true", help="Re-check spectra that already have a thumbnail")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    counts = build_thumbnails(refresh=args.refresh)
+    print(
+        f"Rendered {counts['rendered']}, reused {counts['reused']}, failed {counts['failed']} "
+        f"of {counts['spectra']} spectra"
+    )
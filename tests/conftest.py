@@ -0,0 +1,87 @@
+"""Shared fixtures."""
+
+import pytest
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, MetaData, String, Table, create_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import DEC_COLUMN, FOREIGN_KEY, PRIMARY_TABLE, RA_COLUMN, SOURCE_COLUMN
+from src.database import changes, connection
+
+metadata = MetaData()
+sources_table = Table(
+    PRIMARY_TABLE,
+    metadata,
+    Column(SOURCE_COLUMN, String, primary_key=True),
+    Column(RA_COLUMN, Float),
+    Column(DEC_COLUMN, Float),
+    # A primary table column that looks like one of the browse view's row counts
+    Column("visit_count", Integer),
+)
+names_table = Table(
+    "Names",
+    metadata,
+    Column(FOREIGN_KEY, String, ForeignKey(f"{PRIMARY_TABLE}.{SOURCE_COLUMN}"), primary_key=True),
+    Column("other_name", String, primary_key=True),
+)
+spectral_types_table = Table(
+    "SpectralTypes",
+    metadata,
+    Column(FOREIGN_KEY, String, ForeignKey(f"{PRIMARY_TABLE}.{SOURCE_COLUMN}"), primary_key=True),
+    Column("spectral_type_string", String, primary_key=True),
+    Column("adopted", Boolean),
+)
+photometry_table = Table(
+    "Photometry",
+    metadata,
+    Column(FOREIGN_KEY, String, ForeignKey(f"{PRIMARY_TABLE}.{SOURCE_COLUMN}"), primary_key=True),
+    Column("band", String, primary_key=True),
+    Column("magnitude", Float),
+)
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """
+    Serve a small SQLite catalog as the primary database, without read replicas.
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine for writing to the catalog
+    """
+    url = f"sqlite:///{tmp_path / 'catalog.sqlite'}"
+    engine = create_engine(url, poolclass=NullPool)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            sources_table.insert(),
+            [
+                {SOURCE_COLUMN: "A", RA_COLUMN: 10.0, DEC_COLUMN: -5.0, "visit_count": 7},
+                {SOURCE_COLUMN: "B", RA_COLUMN: 20.0, DEC_COLUMN: 5.0, "visit_count": 0},
+                {SOURCE_COLUMN: "C", RA_COLUMN: 30.0, DEC_COLUMN: 15.0, "visit_count": None},
+            ],
+        )
+        conn.execute(
+            names_table.insert(),
+            [{FOREIGN_KEY: "A", "other_name": "A"}, {FOREIGN_KEY: "A", "other_name": "Alias A"}],
+        )
+        conn.execute(
+            spectral_types_table.insert(),
+            [
+                {FOREIGN_KEY: "A", "spectral_type_string": "L5", "adopted": True},
+                {FOREIGN_KEY: "A", "spectral_type_string": "L4", "adopted": False},
+            ],
+        )
+        conn.execute(
+            photometry_table.insert(),
+            [
+                {FOREIGN_KEY: "A", "band": "J", "magnitude": 14.5},
+                {FOREIGN_KEY: "A", "band": "H", "magnitude": 13.9},
+                {FOREIGN_KEY: "B", "band": "J", "magnitude": 16.1},
+            ],
+        )
+
+    monkeypatch.setattr(connection, "CONNECTION_STRING", url)
+    monkeypatch.setattr(connection, "_replicas", [])
+    monkeypatch.setattr(changes, "_state", {key: None for key in changes._state} | {"source_counts": {}})
+    monkeypatch.setattr(changes, "_subscribers", [])
+    yield engine
+    engine.dispose()
@@ -0,0 +1,102 @@
+"""Tests for cost-aware admission control."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.database.browse_view import count_column_name
+from src.routes import admission
+from src.routes.admission import admit, classify_cone_search, classify_spectra, pool_for_rows
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Use empty pools that admit one request at a time and queue one more."""
+    monkeypatch.setattr(admission, "_pools", {})
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "ADMISSION_POOLS", {"cheap": (2, 2), "heavy": (1, 1), "bulk": (1, 1)})
+    return admission._pools
+
+
+def test_full_queue_is_rejected(pools):
+    async def run():
+        order = []
+        release = asyncio.Event()
+
+        async def request(name):
+            async with admit("heavy"):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(request("first"))
+        queued = asyncio.create_task(request("queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            await request("rejected")
+
+        # Other pools are not affected by the busy heavy pool
+        async with admit("cheap"):
+            pass
+
+        release.set()
+        await asyncio.gather(first, queued)
+        return order, rejected.value
+
+    order, rejected = asyncio.run(run())
+    assert order == ["first", "queued"]
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == str(admission.ADMISSION_RETRY_AFTER)
+    stats = admission.get_admission_stats()
+    assert stats["heavy"] == {
+        "concurrency": 1,
+        "queue_size": 1,
+        "active": 0,
+        "waiting": 0,
+        "admitted": 2,
+        "rejected": 1,
+    }
+    assert stats["cheap"]["admitted"] == 1
+
+
+def test_disabled_admission_admits_everything(pools, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+
+    async def run():
+        releases = [await admission.acquire("bulk") for _ in range(5)]
+        for release in releases:
+            release()
+
+    asyncio.run(run())
+    assert pools == {}
+
+
+def test_pool_for_rows(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_HEAVY_ROWS", 100)
+    monkeypatch.setattr(admission, "ADMISSION_BULK_ROWS", 1000)
+    assert pool_for_rows(10) == "cheap"
+    assert pool_for_rows(100) == "heavy"
+    assert pool_for_rows(1000) == "bulk"
+    assert pool_for_rows(None) == "bulk"
+
+
+def test_classify_cone_search(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_HEAVY_ROWS", 100)
+    monkeypatch.setattr(admission, "ADMISSION_BULK_ROWS", 1000)
+    monkeypatch.setattr(admission, "get_table_row_count", lambda table: 100_000)
+    # A 1 degree cone covers about 0.008% of the sky, a 30 degree cone about 7%
+    assert classify_cone_search(1.0) == "heavy"
+    assert classify_cone_search(30.0) == "bulk"
+    monkeypatch.setattr(admission, "get_table_row_count", lambda table: None)
+    assert classify_cone_search(1.0) == "heavy"
+
+
+def test_classify_spectra(monkeypatch):
+    summaries = {"with": {count_column_name("Spectra"): 3}, "without": {count_column_name("Spectra"): 0}}
+    monkeypatch.setattr(
+        admission, "get_browse_summaries", lambda names: {name: summaries[name] for name in names if name in summaries}
+    )
+    assert classify_spectra("with") == "heavy"
+    assert classify_spectra("without") == "cheap"
+    # Sources missing from the browse view are assumed to have spectra
+    assert classify_spectra("unknown") == "heavy"
@@ -0,0 +1,108 @@
+"""Tests for the materialized browse view and its incremental refresh."""
+
+import pytest
+from conftest import photometry_table, sources_table
+
+from src.config import FOREIGN_KEY, SOURCE_COLUMN
+from src.database import browse_view, changes
+
+
+@pytest.fixture
+def view_path(catalog, tmp_path):
+    path = str(tmp_path / "browse_view.sqlite")
+    yield path
+    browse_view._forget_reader(path)
+
+
+def _rows(path):
+    columns, rows = browse_view.iter_browse_view(path)
+    return columns, {row[SOURCE_COLUMN]: row for row in rows}
+
+
+def test_full_build(view_path):
+    assert browse_view.build_browse_view(path=view_path) == 3
+    columns, rows = _rows(view_path)
+
+    assert columns[:4] == [SOURCE_COLUMN, "ra", "dec", "visit_count"]
+    assert rows["A"]["photometry_count"] == 2
+    assert rows["A"]["names_count"] == 2
+    assert rows["A"]["aliases"] == "Alias A"
+    assert rows["A"]["adopted_spectral_type"] == "L5"
+    assert rows["B"]["photometry_count"] == 1
+    assert rows["C"]["photometry_count"] == 0
+    assert rows["C"]["aliases"] is None
+
+
+def test_summaries_only_contain_summary_columns(view_path):
+    browse_view.build_browse_view(path=view_path)
+    summaries = browse_view.get_browse_summaries(["A", "B", "missing"], view_path)
+
+    assert set(summaries) == {"A", "B"}
+    # visit_count is a primary table column, not a row count added by the view
+    assert set(summaries["A"]) == {
+        "aliases",
+        "adopted_spectral_type",
+        "names_count",
+        "photometry_count",
+        "spectraltypes_count",
+    }
+
+
+def test_summary_column_names():
+    assert browse_view.summary_column_names({"Photometry": None}) == {
+        "aliases",
+        "adopted_spectral_type",
+        "photometry_count",
+    }
+
+
+def test_incremental_refresh(view_path, catalog):
+    browse_view.build_browse_view(path=view_path)
+    with catalog.begin() as conn:
+        conn.execute(photometry_table.insert(), [{FOREIGN_KEY: "C", "band": "K", "magnitude": 12.0}])
+        conn.execute(sources_table.update().where(sources_table.c[SOURCE_COLUMN] == "B").values(visit_count=3))
+
+    assert browse_view.build_browse_view(sources=["C"], path=view_path) == 1
+    _, rows = _rows(view_path)
+    assert rows["C"]["photometry_count"] == 1
+    # Only the refreshed sources are recomputed
+    assert rows["B"]["visit_count"] == 0
+
+
+def test_refresh_of_removed_source(view_path, catalog):
+    browse_view.build_browse_view(path=view_path)
+    with catalog.begin() as conn:
+        conn.execute(photometry_table.delete().where(photometry_table.c[FOREIGN_KEY] == "B"))
+        conn.execute(sources_table.delete().where(sources_table.c[SOURCE_COLUMN] == "B"))
+
+    assert browse_view.build_browse_view(sources=["B"], path=view_path) == 0
+    _, rows = _rows(view_path)
+    assert set(rows) == {"A", "C"}
+
+
+def test_rebuild_replaces_cached_reader(view_path):
+    browse_view.build_browse_view(path=view_path)
+    first = browse_view._reader(view_path)
+    assert browse_view._reader(view_path) is first
+    browse_view.build_browse_view(path=view_path)
+    assert browse_view._reader(view_path) is not first
+
+
+def test_change_detection_finds_affected_sources(view_path, catalog):
+    browse_view.build_browse_view(path=view_path)
+    assert changes.check_for_changes() is None
+    version = changes.get_database_version()
+
+    with catalog.begin() as conn:
+        conn.execute(photometry_table.insert(), [{FOREIGN_KEY: "B", "band": "H", "magnitude": 15.5}])
+    change = changes.check_for_changes()
+
+    assert change["tables"] == ["Photometry"]
+    assert change["sources"] == {"B"}
+    assert change["previous_version"] == version
+    assert changes.get_database_version() != version
+    assert changes.check_for_changes() is None
+
+    browse_view.build_browse_view(sources=sorted(change["sources"]), path=view_path)
+    _, rows = _rows(view_path)
+    assert rows["B"]["photometry_count"] == 2
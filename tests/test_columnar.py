@@ -0,0 +1,50 @@
+"""Tests for compact columnar query results."""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.database.columnar import compact_dataframe, iter_records, records_json
+
+
+def test_compact_dataframe_makes_repeated_strings_categorical():
+    df = pd.DataFrame({"reference": ["A", "A", "B", "A"], "source": ["s1", "s2", "s3", "s4"], "mag": [1.0] * 4})
+    compact = compact_dataframe(df)
+    assert isinstance(compact["reference"].dtype, pd.CategoricalDtype)
+    assert not isinstance(compact["source"].dtype, pd.CategoricalDtype)
+    assert compact["mag"].dtype == np.float64
+    assert compact["source"].tolist() == df["source"].tolist()
+
+
+def test_iter_records_returns_missing_values_as_none():
+    df = pd.DataFrame(
+        {
+            "mag": [1.5, np.nan],
+            "date": pd.to_datetime(["2020-01-01", None]),
+            "name": pd.Series(["a", None], dtype="category"),
+        }
+    )
+    records = list(iter_records(df))
+    assert records[0]["mag"] == 1.5
+    assert records[1] == {"mag": None, "date": None, "name": None}
+
+
+def test_records_json_is_valid_json():
+    df = pd.DataFrame(
+        {
+            "value": [0.1 + 0.2, np.inf, -np.inf, np.nan],
+            "single": np.array([1.5, np.inf, 2.5, 3.5], dtype=np.float32),
+            "count": np.array([1, 2, 3, 4], dtype=np.int64),
+            "date": pd.to_datetime(["2020-01-01", None, None, None]),
+        }
+    )
+    records = json.loads(records_json(df))
+    # Full float precision, and non-finite values as null instead of the invalid tokens Infinity and NaN
+    assert records[0] == {"value": 0.30000000000000004, "single": 1.5, "count": 1, "date": "2020-01-01T00:00:00"}
+    assert [record["value"] for record in records[1:]] == [None, None, None]
+    assert records[1]["single"] is None
+
+
+def test_records_json_empty():
+    assert records_json(pd.DataFrame({"a": []})) == "[]"
@@ -0,0 +1,75 @@
+"""Tests for coordinate string parsing."""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.database.coordinates import parse_coordinate, parse_coordinates
+
+
+@pytest.mark.parametrize(
+    "coords_str, expected",
+    [
+        ("209.30 14.48", (209.30, 14.48)),
+        ("209.30, -14.48", (209.30, -14.48)),
+        ("  209.30d 14.48d  ", (209.30, 14.48)),
+        (".5 -.5", (0.5, -0.5)),
+        ("13h57m12s +14d28m39s", (209.3, 14 + 28 / 60 + 39 / 3600)),
+        ("13h 57m 12s -14° 28′ 39″", (209.3, -(14 + 28 / 60 + 39 / 3600))),
+        ("209d18m00s +14d28m39s", (209.3, 14 + 28 / 60 + 39 / 3600)),
+        ("13:57:12 +14:28:39", (209.3, 14 + 28 / 60 + 39 / 3600)),
+        ("13 57 12 -14 28 39", (209.3, -(14 + 28 / 60 + 39 / 3600))),
+        # The sign applies to the whole declination, also when its degrees are zero
+        ("00:00:00 -00:30:00", (0.0, -0.5)),
+        ("0 0", (0.0, 0.0)),
+        ("360 90", (360.0, 90.0)),
+        ("0 -90", (0.0, -90.0)),
+    ],
+)
+def test_parse_coordinate(coords_str, expected):
+    ra, dec = parse_coordinate(coords_str)
+    assert ra == pytest.approx(expected[0])
+    assert dec == pytest.approx(expected[1])
+
+
+@pytest.mark.parametrize(
+    "coords_str, message",
+    [
+        ("13h60m00s +14d28m39s", "minutes and seconds must be below 60"),
+        ("13:57:12 +14:28:60", "minutes and seconds must be below 60"),
+        ("360.1 0", "RA must be between 0 and 360"),
+        ("-0.1 0", "RA must be between 0 and 360"),
+        ("209.30 90.5", "Dec must be between -90 and"),
+        ("209.30", "Expected two space-separated values"),
+        ("209.30 14.48 1", "Expected two space-separated values"),
+    ],
+)
+def test_parse_coordinate_errors(coords_str, message):
+    with pytest.raises(ValueError, match=message):
+        parse_coordinate(coords_str)
+
+
+def test_parse_coordinate_rejects_text():
+    with pytest.raises(ValueError):
+        parse_coordinate("not a coordinate")
+
+
+def test_parse_coordinates_matches_single_parser():
+    values = ["209.30 14.48", "13h57m12s +14d28m39s", "13:57:12 -14:28:39", "00:00:00 -00:30:00"]
+    ra, dec, errors = parse_coordinates(values)
+    assert errors == [None] * len(values)
+    for row, value in enumerate(values):
+        assert (ra[row], dec[row]) == pytest.approx(parse_coordinate(value))
+
+
+def test_parse_coordinates_reports_errors_per_row():
+    ra, dec, errors = parse_coordinates(["209.30 14.48", "13h60m00s +14d28m39s", "209.30 91", None, "garbage"])
+    assert ra[0] == pytest.approx(209.30)
+    assert errors[0] is None
+    assert "below 60" in errors[1]
+    assert "Dec must be between" in errors[2]
+    assert errors[3] is not None
+    assert errors[4] is not None
+    assert np.isnan(ra[1:]).all()
+    assert all(math.isnan(value) for value in dec[1:])
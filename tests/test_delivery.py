@@ -0,0 +1,104 @@
+"""Tests for response compression and fingerprinted static files."""
+
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.routes import delivery
+from src.routes.delivery import IMMUTABLE, REVALIDATE, CompressionMiddleware, FingerprintedStaticFiles, choose_encoding
+
+PAGE = "<p>" + "compressible " * 200 + "</p>"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "style.css").write_text("body { color: black; }")
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/page")
+    def page():
+        return HTMLResponse(PAGE)
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"a": 1})
+
+    @app.get("/encoded")
+    def encoded():
+        return HTMLResponse(gzip.compress(PAGE.encode()), headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["<p>", "streamed", "</p>"]), media_type="text/html")
+
+    app.mount("/static", FingerprintedStaticFiles(directory=str(tmp_path)), name="static")
+    monkeypatch.setattr(delivery, "STATIC_DIR", str(tmp_path))
+    return TestClient(app)
+
+
+def _get(client, path, accept_encoding):
+    # Read the raw body, as sent, instead of letting httpx decode it
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_choose_encoding(monkeypatch):
+    assert choose_encoding("gzip, deflate, br") == ("br" if delivery.brotli else "gzip")
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("br;q=bad, gzip") == "gzip"
+    assert choose_encoding("identity") is None
+    monkeypatch.setattr(delivery, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+
+
+def test_brotli_and_gzip(client):
+    brotli = pytest.importorskip("brotli")
+    response, body = _get(client, "/page", "br")
+    assert response.headers["Content-Encoding"] == "br"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert brotli.decompress(body).decode() == PAGE
+
+    response, body = _get(client, "/page", "gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == PAGE
+
+
+def test_responses_left_uncompressed(client):
+    response, body = _get(client, "/page", "identity")
+    assert "Content-Encoding" not in response.headers
+    assert body.decode() == PAGE
+
+    response, body = _get(client, "/small", "gzip")
+    assert "Content-Encoding" not in response.headers
+    assert body == b'{"a":1}'
+
+    # Already encoded responses (such as from the page cache) pass through unchanged
+    response, body = _get(client, "/encoded", "gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == PAGE
+
+
+def test_streamed_responses_are_compressed(client):
+    response, body = _get(client, "/stream", "gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(body) == b"<p>streamed</p>"
+
+
+def test_fingerprinted_static_files(client):
+    url = delivery.static_url("style.css")
+    assert url.startswith("/static/style.") and url.endswith(".css") and url != "/static/style.css"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.text == "body { color: black; }"
+    assert response.headers["Cache-Control"] == IMMUTABLE
+
+    assert client.get("/static/style.css").headers["Cache-Control"] == REVALIDATE
+    # A hash that does not match the file's content is not resolved
+    assert client.get("/static/style.000000000000.css").status_code == 404
+    assert delivery.static_url("missing.css") == "/static/missing.css"
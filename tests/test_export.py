@@ -0,0 +1,65 @@
+"""Tests for the columnar catalog export."""
+
+import os
+
+import pytest
+
+from src.database import changes, export
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def export_dir(catalog, tmp_path, monkeypatch):
+    path = tmp_path / "exports"
+    monkeypatch.setattr(export, "EXPORT_DIR", str(path))
+    return path
+
+
+def test_export_catalog(export_dir, monkeypatch):
+    monkeypatch.setattr(export, "ROWS_PER_PART", 2)
+    manifest = export.export_catalog()
+    version = changes.get_database_version()
+
+    assert manifest["version"] == version
+    assert export.get_latest_version() == version
+    assert export.get_export_manifest(version) == manifest
+    assert set(manifest["tables"]) == {"Sources", "Names", "SpectralTypes", "Photometry"}
+
+    photometry = manifest["tables"]["Photometry"]
+    assert photometry["rows"] == 3
+    assert photometry["parquet"] == ["Photometry/part-00000.parquet", "Photometry/part-00001.parquet"]
+    table = pq.read_table([str(export_dir / version / part) for part in photometry["parquet"]])
+    assert table.column("magnitude").to_pylist() == [14.5, 13.9, 16.1]
+    assert table.schema.field("magnitude").type == pa.float64()
+
+    with pa.ipc.open_file(str(export_dir / version / photometry["arrow"])) as reader:
+        assert reader.read_all().num_rows == 3
+
+    sources = pq.read_table(export_dir / version / "Sources/part-00000.parquet")
+    assert sources.schema.field("visit_count").type == pa.int64()
+    assert not [name for name in os.listdir(export_dir) if ".build" in name]
+
+
+def test_export_is_reused(export_dir):
+    first = export.export_catalog()
+    assert export.export_catalog() == first
+
+
+def test_old_exports_are_removed(export_dir, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_KEEP_VERSIONS", 1)
+    export.export_catalog("old")
+    export.export_catalog("new")
+    assert sorted(os.listdir(export_dir)) == ["LATEST", "new"]
+    assert export.get_export_manifest("old") is None
+
+
+def test_export_files_stay_inside_the_version(export_dir):
+    version = export.export_catalog()["version"]
+    assert export.get_export_file(version, "Photometry.arrow") == os.path.realpath(
+        export_dir / version / "Photometry.arrow"
+    )
+    assert export.get_export_file(version, "../LATEST") is None
+    assert export.get_export_file(version, "missing.arrow") is None
+    assert export.get_export_file("../exports", "LATEST") is None
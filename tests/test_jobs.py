@@ -0,0 +1,111 @@
+"""Tests for background job deduplication and the inline job runner."""
+
+import asyncio
+
+import pytest
+
+from src.database import jobs
+
+
+@pytest.fixture
+def job_dir(tmp_path, monkeypatch):
+    """Keep the job table in a temporary directory, against a fixed database version."""
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path))
+    monkeypatch.setitem(jobs._state, "engine", None)
+    monkeypatch.setattr(jobs, "get_database_version", lambda: "v1")
+    yield tmp_path
+    if jobs._state["engine"] is not None:
+        jobs._state["engine"].dispose()
+
+
+def test_dedup_key_ignores_parameter_order():
+    first = jobs.dedup_key("cone_search", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.1}, "v1")
+    second = jobs.dedup_key("cone_search", {"radius_deg": 0.1, "dec": 2.0, "ra": 1.0}, "v1")
+    assert first == second
+
+
+@pytest.mark.parametrize(
+    "kind, params, version",
+    [
+        ("inventory", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.1}, "v1"),
+        ("cone_search", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.2}, "v1"),
+        ("cone_search", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.1}, "v2"),
+    ],
+)
+def test_dedup_key_differs(kind, params, version):
+    assert jobs.dedup_key(kind, params, version) != jobs.dedup_key(
+        "cone_search", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.1}, "v1"
+    )
+
+
+def test_identical_job_is_deduplicated(job_dir):
+    job, deduplicated = jobs.submit_job("cone_search", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.1})
+    assert not deduplicated
+    assert job["status"] == "queued"
+    assert job["database_version"] == "v1"
+
+    again, deduplicated = jobs.submit_job("cone_search", {"radius_deg": 0.1, "dec": 2.0, "ra": 1.0})
+    assert deduplicated
+    assert again["id"] == job["id"]
+
+    other, deduplicated = jobs.submit_job("cone_search", {"ra": 1.0, "dec": 2.0, "radius_deg": 0.2})
+    assert not deduplicated
+    assert other["id"] != job["id"]
+
+
+def test_done_job_is_deduplicated(job_dir):
+    job, _ = jobs.submit_job("inventory", {"sources": ["A", "B"]})
+    jobs._update_job(job["id"], status="done")
+    again, deduplicated = jobs.submit_job("inventory", {"sources": ["A", "B"]})
+    assert deduplicated
+    assert again["id"] == job["id"]
+
+
+@pytest.mark.parametrize("status", ["failed", "expired"])
+def test_finished_job_can_be_submitted_again(job_dir, status):
+    job, _ = jobs.submit_job("inventory", {"sources": ["A"]})
+    jobs._update_job(job["id"], status=status)
+    again, deduplicated = jobs.submit_job("inventory", {"sources": ["A"]})
+    assert not deduplicated
+    assert again["id"] != job["id"]
+
+
+def test_new_database_version_gets_a_new_job(job_dir, monkeypatch):
+    job, _ = jobs.submit_job("export", {})
+    monkeypatch.setattr(jobs, "get_database_version", lambda: "v2")
+    again, deduplicated = jobs.submit_job("export", {})
+    assert not deduplicated
+    assert again["database_version"] == "v2"
+    assert again["id"] != job["id"]
+
+
+def test_unknown_job_kind(job_dir):
+    with pytest.raises(ValueError, match="Unknown job kind"):
+        jobs.submit_job("browse", {})
+
+
+def test_inline_runner_runs_queued_jobs(job_dir, monkeypatch):
+    def fake_export(params, path, report):
+        with open(path, "w") as f:
+            f.write("{}")
+        return 3
+
+    monkeypatch.setitem(jobs._RUNNERS, "export", fake_export)
+    job, _ = jobs.submit_job("export", {})
+
+    async def run_until_done():
+        runner = asyncio.create_task(jobs.run_jobs(workers=0, poll_seconds=0.05))
+        try:
+            for _ in range(200):
+                if jobs.get_job(job["id"])["status"] == "done":
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            runner.cancel()
+
+    asyncio.run(run_until_done())
+    done = jobs.get_job(job["id"])
+    assert done["status"] == "done"
+    assert done["result_rows"] == 3
+    with open(jobs.get_result_file(done)) as f:
+        assert f.read() == "{}"
@@ -0,0 +1,126 @@
+"""Tests for the rendered page cache."""
+
+import asyncio
+import gzip
+
+import pytest
+from fastapi import Request
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+from src.routes import page_cache
+from src.routes.page_cache import cache_key, serve_cached
+
+
+def _request(accept_encoding="gzip"):
+    return Request({"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+
+class Renderer:
+    """Render function counting its calls."""
+
+    def __init__(self, body="<p>page</p>", status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return HTMLResponse(f"{self.body} {self.calls}", status_code=self.status_code)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Use an empty in-memory cache against a database version the test can change."""
+    version = {"value": "v1"}
+    monkeypatch.setattr(page_cache, "get_database_version", lambda: version["value"])
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_DIR", "")
+    monkeypatch.setattr(page_cache, "_stats", dict.fromkeys(page_cache._stats, 0))
+    page_cache.clear_page_cache()
+    yield version
+    page_cache.clear_page_cache()
+
+
+def test_cache_key_ignores_parameter_order():
+    assert cache_key("inventory", source="A", page=2) == cache_key("inventory", page=2, source="A")
+    assert cache_key("inventory", source="A") != cache_key("spectra", source="A")
+
+
+def test_miss_then_hit(cache):
+    render = Renderer()
+    first = asyncio.run(serve_cached(_request(), "page", render))
+    second = asyncio.run(serve_cached(_request(), "page", render))
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert render.calls == 1
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(second.body) == b"<p>page</p> 1"
+
+
+def test_identity_encoding(cache):
+    render = Renderer()
+    asyncio.run(serve_cached(_request(), "page", render))
+    response = asyncio.run(serve_cached(_request(""), "page", render))
+    assert "Content-Encoding" not in response.headers
+    assert response.body == b"<p>page</p> 1"
+
+
+def test_errors_are_not_cached(cache):
+    render = Renderer(status_code=500)
+    asyncio.run(serve_cached(_request(), "page", render))
+    response = asyncio.run(serve_cached(_request(), "page", render))
+    assert "X-Cache" not in response.headers
+    assert render.calls == 2
+
+
+def test_new_version_serves_stale_page_and_revalidates(cache):
+    render = Renderer()
+
+    async def serve_twice():
+        await serve_cached(_request(), "page", render)
+        cache["value"] = "v2"
+        stale = await serve_cached(_request(""), "page", render)
+        # Let the background revalidation finish
+        while page_cache._tasks:
+            await asyncio.sleep(0.01)
+        fresh = await serve_cached(_request(""), "page", render)
+        return stale, fresh
+
+    stale, fresh = asyncio.run(serve_twice())
+    assert stale.headers["X-Cache"] == "STALE"
+    assert stale.body == b"<p>page</p> 1"
+    assert fresh.headers["X-Cache"] == "HIT"
+    assert fresh.body == b"<p>page</p> 2"
+    assert render.calls == 2
+    assert page_cache.get_page_cache_stats()["revalidations"] == 1
+
+
+def test_streamed_page_is_stored_when_complete(cache):
+    async def render():
+        async def chunks():
+            yield "<p>"
+            yield b"streamed</p>"
+
+        return StreamingResponse(chunks(), media_type="text/html")
+
+    async def stream_then_hit():
+        response = await serve_cached(_request(), "stream", render)
+        body = "".join([chunk if isinstance(chunk, str) else chunk.decode() async for chunk in response.body_iterator])
+        return response, body, await serve_cached(_request(""), "stream", render)
+
+    response, body, cached = asyncio.run(stream_then_hit())
+    assert response.headers["X-Cache"] == "MISS"
+    assert body == "<p>streamed</p>"
+    assert cached.headers["X-Cache"] == "HIT"
+    assert cached.body == b"<p>streamed</p>"
+
+
+def test_disk_entries_survive_memory_eviction(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_DIR", str(tmp_path))
+    render = Renderer()
+    asyncio.run(serve_cached(_request(), "page", render))
+    page_cache.clear_page_cache()
+    response = asyncio.run(serve_cached(_request(""), "page", render))
+    assert response.headers["X-Cache"] == "HIT"
+    assert render.calls == 1
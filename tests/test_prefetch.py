@@ -0,0 +1,66 @@
+"""Tests for spectrum prefetching and the saved view statistics."""
+
+import json
+import time
+
+import pytest
+from astropy.config.paths import set_temp_cache
+from astropy.utils.data import CacheMissingWarning, download_file, is_url_in_cache
+
+from src.database import prefetch, spectrum_cache
+
+
+@pytest.fixture
+def access(monkeypatch):
+    """Start from empty in-memory view statistics."""
+    monkeypatch.setattr(spectrum_cache, "_access", {})
+    return spectrum_cache._access
+
+
+def test_saving_merges_statistics_of_other_workers(access, tmp_path):
+    path = str(tmp_path / "access.json")
+    now = time.time()
+    with open(path, "w") as f:
+        json.dump({"A": {"score": 5.0, "last": now}, "B": {"score": 1.0, "last": now}}, f)
+
+    for source in ("B", "C"):
+        spectrum_cache.register_source(source)
+    for _ in range(3):
+        spectrum_cache.record_access("B")
+    spectrum_cache.record_access("C")
+    spectrum_cache.save_access_stats(path)
+
+    with open(path) as f:
+        saved = json.load(f)
+    assert set(saved) == {"A", "B", "C"}
+    assert saved["A"]["score"] == 5.0
+    assert saved["B"]["score"] == pytest.approx(3.0, rel=1e-3)
+    assert spectrum_cache.get_access_ranking() == ["A", "B", "C"]
+
+
+@pytest.mark.filterwarnings("ignore", category=CacheMissingWarning)
+def test_download_is_throttled_between_chunks(tmp_path, monkeypatch):
+    spectrum = tmp_path / "spectrum.fits"
+    spectrum.write_bytes(b"x" * (prefetch.DOWNLOAD_CHUNK_BYTES * 2 + 10))
+    throttled = []
+    monkeypatch.setattr(prefetch, "_throttle", throttled.append)
+
+    with set_temp_cache(tmp_path / "astropy"):
+        url = spectrum.as_uri()
+        assert prefetch._download(url) == spectrum.stat().st_size
+        assert throttled == [prefetch.DOWNLOAD_CHUNK_BYTES, prefetch.DOWNLOAD_CHUNK_BYTES, 10]
+        assert is_url_in_cache(url)
+        with open(download_file(url, cache=True), "rb") as f:
+            assert f.read() == spectrum.read_bytes()
+        # Cached files are not downloaded again
+        assert prefetch._download(url) == 0
+
+
+def test_throttle_paces_to_the_bandwidth(monkeypatch):
+    monkeypatch.setattr(prefetch, "PREFETCH_BANDWIDTH_KBPS", 1024)
+    monkeypatch.setattr(prefetch, "_bandwidth", {"next": 0.0})
+    start = time.monotonic()
+    for _ in range(3):
+        prefetch._throttle(64 * 1024)
+    # Three 64 KiB chunks at 1 MiB/s take 3/16 s
+    assert time.monotonic() - start == pytest.approx(3 / 16, abs=0.05)
@@ -0,0 +1,102 @@
+"""Tests for the similar source feature index."""
+
+import numpy as np
+import pytest
+
+from src.database import similar
+from src.database.similar import scaled_distance, standardize
+
+
+def test_standardize():
+    values = np.array([[1.0, 10.0], [2.0, 10.0], [3.0, np.nan]])
+    result = standardize(values)
+    assert result[:, 0] == pytest.approx([-1.224745, 0.0, 1.224745], rel=1e-5)
+    # A constant column is centered but not divided by zero; missing values stay missing
+    assert result[:2, 1].tolist() == [0.0, 0.0]
+    assert np.isnan(result[2, 1])
+
+
+def test_standardize_ignores_missing_values():
+    values = np.array([[1.0], [np.nan], [3.0]])
+    result = standardize(values)
+    assert result[[0, 2], 0].tolist() == [-1.0, 1.0]
+    assert np.isnan(result[1, 0])
+
+
+def test_scaled_distance():
+    assert scaled_distance(2.0, 4, 4) == 2.0
+    assert scaled_distance(1.0, 1, 4) == 2.0
+    assert scaled_distance(np.array([1.0, 3.0]), 2, 8).tolist() == [2.0, 6.0]
+
+
+@pytest.fixture
+def diagram_table(monkeypatch):
+    """Serve a random diagram table with missing values to the index."""
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(300, 5))
+    values[rng.random(values.shape) < 0.3] = np.nan
+    table = {
+        "version": "test",
+        "columns": ["J", "H", "Ks", "SpT", "Teff"],
+        "sources": np.array([f"S{row}" for row in range(len(values))], dtype=object),
+        "values": values,
+    }
+    monkeypatch.setattr(similar, "get_diagram_table", lambda: table)
+    monkeypatch.setattr(similar, "get_database_version", lambda: "test")
+    monkeypatch.setattr(similar, "SIMILAR_MIN_FEATURES", 2)
+    monkeypatch.setitem(similar._current, "index", None)
+    return table
+
+
+def _brute_force(features, observed, row, k, min_features):
+    """Nearest neighbours over co-measured features, scanning every source."""
+    measured = observed[row]
+    min_shared = min(min_features, measured.sum())
+    found = []
+    for other in range(len(features)):
+        shared = measured & observed[other]
+        if other == row or shared.sum() < min_shared:
+            continue
+        distance = np.sqrt(np.sum((features[row, shared] - features[other, shared]) ** 2))
+        found.append((scaled_distance(distance, shared.sum(), len(measured)), other))
+    return sorted(found)[:k]
+
+
+def test_similar_sources_match_brute_force(diagram_table):
+    index = similar.get_similar_index()
+    for source in ["S0", "S1", "S17", "S123", "S299"]:
+        row = index["rows"].get(source)
+        if row is None:
+            continue
+        result = similar.similar_sources(source, k=8)
+        expected = _brute_force(index["features"], index["observed"], row, 8, 2)
+        assert [neighbour["distance"] for neighbour in result["neighbours"]] == pytest.approx(
+            [distance for distance, _ in expected]
+        )
+        for neighbour in result["neighbours"]:
+            assert neighbour["source"] != source
+            assert neighbour["shared"] >= min(2, len(result["features"]))
+
+
+def test_similar_sources_skip_sparse_sources(diagram_table):
+    diagram_table["values"][5] = [1.0, np.nan, np.nan, np.nan, np.nan]
+    assert similar.similar_sources("S5") is None
+    assert similar.similar_sources("unknown") is None
+
+
+def test_similar_sources_rejects_k(diagram_table):
+    with pytest.raises(ValueError, match="k must be at least 1"):
+        similar.similar_sources("S0", k=0)
+
+
+def test_group_trees_are_bounded(diagram_table, monkeypatch):
+    monkeypatch.setattr(similar, "SIMILAR_MAX_TREES", 3)
+    monkeypatch.setattr(similar, "_stats", dict.fromkeys(similar._stats, 0))
+    index = similar.get_similar_index()
+    expected = {source: similar.similar_sources(source, k=5) for source in ["S0", "S1", "S2"]}
+    assert len(index["trees"]) == 3
+    # Evicted trees are rebuilt with the same results
+    for source, result in expected.items():
+        assert similar.similar_sources(source, k=5) == result
+    assert len(index["trees"]) == 3
+    assert similar.get_similar_stats()["tree_evictions"] > 0
@@ -0,0 +1,171 @@
+"""Tests for single-flight coalescing of identical concurrent calls."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.database.singleflight import get_single_flight_stats, single_flight
+from src.database.timeouts import QueryCancelled, run_with_timeout
+
+WAIT_SECONDS = 10
+
+
+class DisconnectedRequest:
+    """Request whose client has already disconnected."""
+
+    async def is_disconnected(self):
+        return True
+
+
+def _wait_for(condition):
+    """Wait until a condition holds, failing the test after WAIT_SECONDS."""
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the condition"
+        time.sleep(0.01)
+
+
+def _stats(name):
+    return get_single_flight_stats().get(name, {})
+
+
+def _start(target, outcomes, key):
+    """Run a call in a thread, storing its result or exception under a key."""
+
+    def run():
+        try:
+            outcomes[key] = target()
+        except ValueError as e:
+            outcomes[key] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_concurrent_calls_share_the_result():
+    release = threading.Event()
+    calls = []
+
+    @single_flight("test_result")
+    def slow(value):
+        calls.append(value)
+        release.wait(WAIT_SECONDS)
+        return {"value": value}
+
+    outcomes = {}
+    leader = _start(lambda: slow(1), outcomes, "leader")
+    _wait_for(lambda: calls)
+    follower = _start(lambda: slow(1), outcomes, "follower")
+    _wait_for(lambda: _stats("test_result").get("coalesced") == 1)
+    release.set()
+    leader.join(WAIT_SECONDS)
+    follower.join(WAIT_SECONDS)
+
+    assert calls == [1]
+    assert outcomes["leader"] is outcomes["follower"]
+    assert _stats("test_result")["executed"] == 1
+    assert _stats("test_result")["in_flight"] == 0
+
+
+def test_concurrent_calls_share_the_error():
+    release = threading.Event()
+    calls = []
+
+    @single_flight("test_error")
+    def failing(value):
+        calls.append(value)
+        release.wait(WAIT_SECONDS)
+        raise ValueError(f"bad value {value}")
+
+    outcomes = {}
+    leader = _start(lambda: failing(1), outcomes, "leader")
+    _wait_for(lambda: calls)
+    follower = _start(lambda: failing(1), outcomes, "follower")
+    _wait_for(lambda: _stats("test_error").get("coalesced") == 1)
+    release.set()
+    leader.join(WAIT_SECONDS)
+    follower.join(WAIT_SECONDS)
+
+    assert calls == [1]
+    assert isinstance(outcomes["leader"], ValueError)
+    assert outcomes["follower"] is outcomes["leader"]
+    assert _stats("test_error")["retried"] == 0
+
+
+def test_different_arguments_are_not_coalesced():
+    @single_flight("test_arguments")
+    def double(value):
+        return value * 2
+
+    assert double(1) == 2
+    assert double(2) == 4
+    assert _stats("test_arguments")["executed"] == 2
+    assert _stats("test_arguments")["coalesced"] == 0
+
+
+def test_cancelled_leader_is_not_shared():
+    release = threading.Event()
+    calls = []
+
+    @single_flight("test_cancelled")
+    def search(value):
+        calls.append(value)
+        # The first call outlives its cancelled caller; the retried call returns at once
+        if len(calls) == 1:
+            release.wait(WAIT_SECONDS)
+            return "stale"
+        return "fresh"
+
+    outcomes = {}
+    leader_done = threading.Event()
+
+    async def lead():
+        try:
+            outcomes["leader"] = await run_with_timeout("cone", DisconnectedRequest(), search, 1)
+        except QueryCancelled as e:
+            outcomes["leader"] = e
+        finally:
+            leader_done.set()
+
+    leader = threading.Thread(target=asyncio.run, args=(lead(),))
+    leader.start()
+    _wait_for(lambda: calls)
+    follower = _start(lambda: search(1), outcomes, "follower")
+    _wait_for(lambda: _stats("test_cancelled").get("coalesced") == 1)
+
+    # The leader's client disconnects while the follower waits
+    assert leader_done.wait(WAIT_SECONDS)
+    assert isinstance(outcomes["leader"], QueryCancelled)
+    release.set()
+    follower.join(WAIT_SECONDS)
+    leader.join(WAIT_SECONDS)
+
+    assert outcomes["follower"] == "fresh"
+    assert calls == [1, 1]
+    assert _stats("test_cancelled")["retried"] == 1
+    assert _stats("test_cancelled")["executed"] == 2
+
+
+def test_waiting_caller_keeps_its_own_budget():
+    release = threading.Event()
+    calls = []
+
+    @single_flight("test_follower_budget")
+    def search(value):
+        calls.append(value)
+        release.wait(WAIT_SECONDS)
+        return "done"
+
+    outcomes = {}
+    leader = _start(lambda: search(1), outcomes, "leader")
+    _wait_for(lambda: calls)
+    with pytest.raises(QueryCancelled):
+        asyncio.run(run_with_timeout("cone", DisconnectedRequest(), search, 1))
+    release.set()
+    leader.join(WAIT_SECONDS)
+
+    assert outcomes["leader"] == "done"
+    assert calls == [1]
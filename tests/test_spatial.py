@@ -0,0 +1,69 @@
+"""Tests for the SQL of native cone searches."""
+
+import math
+
+import pytest
+from sqlalchemy import Column, Float, MetaData, String, Table
+from sqlalchemy.dialects import postgresql
+
+from src.config import DEC_COLUMN, PRIMARY_TABLE, RA_COLUMN
+from src.database.spatial import POSTGIS_SPHERE_RADIUS, position_expression, radial_condition
+
+sources = Table(
+    PRIMARY_TABLE,
+    MetaData(),
+    Column("source", String, primary_key=True),
+    Column(RA_COLUMN, Float),
+    Column(DEC_COLUMN, Float),
+)
+
+
+def _sql(clause):
+    """Compile a clause for PostgreSQL with its parameters inline."""
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _columns():
+    return f'"{PRIMARY_TABLE}".{RA_COLUMN}', f'"{PRIMARY_TABLE}".{DEC_COLUMN}'
+
+
+def test_q3c_condition():
+    ra, dec = _columns()
+    assert _sql(radial_condition("q3c", sources, 209.3, 14.48, 0.5)) == (
+        f"q3c_radial_query({ra}, {dec}, 209.3, 14.48, 0.5)"
+    )
+
+
+def test_pg_sphere_condition():
+    ra, dec = _columns()
+    assert _sql(radial_condition("pg_sphere", sources, 209.3, 14.48, 0.5)) == (
+        f"spoint(radians({ra}), radians({dec})) <@ scircle(spoint(radians(209.3), radians(14.48)), radians(0.5))"
+    )
+
+
+def test_postgis_condition():
+    ra, dec = _columns()
+    meters = math.radians(0.5) * POSTGIS_SPHERE_RADIUS
+    sql = _sql(radial_condition("postgis", sources, 209.3, 14.48, 0.5))
+    assert sql.startswith(f"ST_DWithin(geography(ST_SetSRID(ST_MakePoint({ra} - 180, {dec}), 4326)), ")
+    # The center is shifted like the positions, and the spheroid is not used
+    assert "ST_MakePoint(29.30000000000001, 14.48)" in sql
+    assert sql.endswith(f", {meters!r}, false)")
+
+
+@pytest.mark.parametrize("backend", ["q3c", "pg_sphere", "postgis"])
+def test_condition_uses_indexed_expression(backend):
+    # The query planner only uses the spatial index when the condition contains its expression
+    ra_column, dec_column = sources.c[RA_COLUMN], sources.c[DEC_COLUMN]
+    indexed = _sql(position_expression(backend, ra_column, dec_column))
+    condition = _sql(radial_condition(backend, sources, 10.0, -20.0, 0.1))
+    if backend == "q3c":
+        # q3c_radial_query is rewritten by the extension to use the q3c_ang2ipix index
+        assert indexed == f"q3c_ang2ipix({', '.join(_columns())})"
+    else:
+        assert indexed in condition
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown spatial backend"):
+        radial_condition("healpix", sources, 0.0, 0.0, 1.0)